@@ -0,0 +1,100 @@
+# Scaling benchmark for the timetable engine
+#
+# Generates synthetic instances at multiples of the sample data size (synthetic_instances.py),
+# schedules both halves the way main.py does (all years on one calendar) and records wall time
+# and unscheduled counts per scale and feasibility backend.
+#
+#   python benchmark.py                         # 1x, 10x, 100x with the default backend
+#   python benchmark.py --scales 1 10 --backends intervals bitmask --attempts 5
+import os
+import json
+import time
+import argparse
+from main import load_settings, load_all_year_inputs, schedule_all_years
+from synthetic_instances import write_instance, load_manifest, manifest_params, MANIFEST
+
+DEFAULT_MIN_GAP = 5
+DEFAULT_FACULTY_GAP = 180
+
+def instance_for_scale(root, scale, seed=0, **params):
+    # scale N = N departments per year (scale 1 is the size of data/); reused if already written
+    outdir = os.path.join(root, f"scale_{scale}")
+    params = dict(params, departments=scale, seed=seed)
+    if os.path.exists(os.path.join(outdir, MANIFEST)) and manifest_params(outdir) == params:
+        return load_manifest(outdir)
+    print(f"Generating scale {scale}x instance in {outdir} ...")
+    return write_instance(outdir, **params)
+
+def count_requests(year_inputs, half):
+    slots = sum(len(v) for yi in year_inputs.values() for v in yi[f"normals_{half}"].values())
+    baskets = sum(len(yi[f"baskets_{half}"]) for yi in year_inputs.values())
+    return slots, baskets
+
+def benchmark_half(year_inputs, half, settings, min_gap, faculty_gap, max_attempts, workers, repair_seconds):
+    # no ScheduleProfile here: its rejection counting walks every candidate and would skew the timings
+    t0 = time.perf_counter()
+    results = schedule_all_years({y: yi[f"normals_{half}"] for y, yi in year_inputs.items()}, {y: yi[f"baskets_{half}"] for y, yi in year_inputs.items()},
+                                 settings, min_gap, faculty_gap, max_attempts=max_attempts, workers=workers, repair_seconds=repair_seconds)
+    seconds = time.perf_counter() - t0
+    return {
+        "seconds": round(seconds, 3),
+        "unscheduled": sum(len(r[1]) for r in results.values()),
+        "placements": sum(len(lst) for r in results.values() for days in r[0].values() for lst in days.values()),
+    }
+
+def run_benchmark(scales, backends, root, ordering="kind", max_attempts=20, workers=1, load_workers=8, repair_seconds=0, min_gap=DEFAULT_MIN_GAP, faculty_gap=DEFAULT_FACULTY_GAP, seed=0, **params):
+    rows = []
+    base_settings = load_settings("settings.json")
+    for scale in scales:
+        inputs_per_year = instance_for_scale(root, scale, seed, **params)
+        t0 = time.perf_counter()
+        year_inputs = load_all_year_inputs(inputs_per_year, base_settings, load_workers)
+        load_seconds = time.perf_counter() - t0
+        n_divs = sum(len(d) for d in inputs_per_year.values())
+        for backend in backends:
+            settings = dict(base_settings, feasibility_backend=backend, ordering=ordering)
+            for half in ("first", "second"):
+                slots, baskets = count_requests(year_inputs, half)
+                print(f"\nScale {scale}x ({n_divs} divisions), {backend}, {half} half: {slots} slot requests, {baskets} baskets ...")
+                res = benchmark_half(year_inputs, half, settings, min_gap, faculty_gap, max_attempts, workers, repair_seconds)
+                row = {"scale": scale, "divisions": n_divs, "backend": backend, "ordering": ordering, "half": half, "slot_requests": slots, "baskets": baskets,
+                       "load_seconds": round(load_seconds, 3), **res}
+                print(f"  {row['seconds']}s, {row['unscheduled']} unscheduled")
+                rows.append(row)
+    return rows
+
+def print_table(rows):
+    cols = ["scale", "divisions", "backend", "half", "slot_requests", "baskets", "seconds", "unscheduled"]
+    widths = [max(len(c), *(len(str(r[c])) for r in rows)) for c in cols]
+    print("\n" + "  ".join(c.ljust(w) for c, w in zip(cols, widths)))
+    for r in rows:
+        print("  ".join(str(r[c]).ljust(w) for c, w in zip(cols, widths)))
+
+def main():
+    ap = argparse.ArgumentParser(description="Time schedule_globally on synthetic instances at several scales")
+    ap.add_argument("--scales", type=int, nargs="+", default=[1, 10, 100], help="multiples of the data/ size (departments per year)")
+    ap.add_argument("--backends", nargs="+", default=["intervals"], choices=["intervals", "bitmask"])
+    ap.add_argument("--ordering", default="kind", choices=["kind", "mrv"], help="slot ordering (settings \"ordering\")")
+    ap.add_argument("--attempts", type=int, default=20, help="max randomized attempts per half (main.py uses 20)")
+    ap.add_argument("--workers", type=int, default=1, help="parallel attempt workers")
+    ap.add_argument("--load-workers", type=int, default=8)
+    ap.add_argument("--repair", type=float, default=0, help="repair time budget in seconds")
+    ap.add_argument("--min-gap", type=int, default=DEFAULT_MIN_GAP)
+    ap.add_argument("--faculty-gap", type=int, default=DEFAULT_FACULTY_GAP)
+    ap.add_argument("--faculty-sharing", type=float, default=2.0)
+    ap.add_argument("--merge-density", type=float, default=0.5)
+    ap.add_argument("--instances", default="synthetic", help="where generated instances are kept")
+    ap.add_argument("--out", default=os.path.join("timetable_outputs", "benchmark.json"))
+    ap.add_argument("--seed", type=int, default=0)
+    args = ap.parse_args()
+    rows = run_benchmark(args.scales, args.backends, args.instances, ordering=args.ordering, max_attempts=args.attempts, workers=args.workers, load_workers=args.load_workers,
+                         repair_seconds=args.repair, min_gap=args.min_gap, faculty_gap=args.faculty_gap, seed=args.seed,
+                         faculty_sharing=args.faculty_sharing, merge_density=args.merge_density)
+    print_table(rows)
+    os.makedirs(os.path.dirname(args.out) or ".", exist_ok=True)
+    with open(args.out, "w") as f:
+        json.dump(rows, f, indent=2)
+    print(f"\nBenchmark results: {args.out}")
+
+if __name__ == "__main__":
+    main()
@@ -1,16 +1,19 @@
 # seating_scheduler_final_seating_sessions.py
 import os
 import math
-import random
+import heapq
 from collections import defaultdict
 from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor, Future
 
+import numpy as np
 import pandas as pd
 from openpyxl import Workbook
 from openpyxl.utils import get_column_letter
 from openpyxl.styles import Alignment, Font, Border, Side, PatternFill
 
-random.seed(42)
+from input_cache import cached_parse, cache_lookup
+from table_export import write_tables, read_table
 
 # -------------------------
 # Helpers
@@ -24,6 +27,11 @@ def safe_int(v):
     except:
         return 0
 
+def safe_str(v):
+    # text of a parsed cell; "nan" / "none" (empty Excel cells read through str()) become ""
+    s = str(v).strip()
+    return "" if s.lower() in ("nan", "none") else s
+
 def base_slotname(slot_name):
     s = str(slot_name).strip().upper()
     if "_Y" in s:
@@ -66,52 +74,95 @@ divisions = {
 
 rooms_path = r"data\Rooms.xlsx"
 invig_path = r"data\invigilators_list.xlsx"
+# optional roll-number enrollments (ROLL NUMBER, COURSE CODE) for student-level clashes, see read_enrollments
+enrollments_path = None
+# invigilator duty rules (InvigilatorScheduler); unavailability: optional INVIGILATOR, DAY, SESSION, HALF table
+max_duties_per_day = 1
+no_back_to_back = True  # not both sessions of one day
+no_back_to_back_overnight = False  # also not AN followed by the next day's FN
+unavailability_path = None
 num_years = 4
 
 # -------------------------
 # Load courses
 # -------------------------
-def load_courses(divisions_dict):
+def parse_course_rows(year, div, path):
     rows = []
-    for year, divs in divisions_dict.items():
-        for div, path in divs.items():
-            df = pd.read_excel(path, engine="openpyxl")
-            df.columns = [str(c).strip() for c in df.columns]
-            for _, r in df.iterrows():
-                elective = str(r.get("ELECTIVE OR NOT", "")).strip().upper()
-                half_type = str(r.get("FULLSEM OR HALFSEM", "")).strip().upper()
-                course_code = str(r.get("COURSE CODE", "")).strip()
-                course_title = str(r.get("COURSE TITLE", "")).strip()
-                slot_raw = str(r.get("SLOT NAME", "")).strip().upper()
-                merge_raw = str(r.get("MERGE", "")).strip().upper()
-                no_students = safe_int(r.get("NO. OF STUDENTS", 0))
-
-                merge_list = [m.strip().upper() for m in merge_raw.split(",") if str(m).strip()]
-                if div not in merge_list:
-                    merge_list.append(div)
-
-                slot_name = slot_raw
-                if elective == "YES":
-                    slot_name = f"{slot_raw}_Y{year}"
-
-                rows.append({
-                    "YEAR": year,
-                    "DIVISION": div,
-                    "ELECTIVE": elective,
-                    "FULLSEM_TYPE": half_type,
-                    "SLOT": slot_name,
-                    "SLOT_RAW": slot_raw,
-                    "COURSE_CODE": course_code,
-                    "COURSE_TITLE": course_title,
-                    "MERGE": merge_list,
-                    "NO_STUDENTS": no_students
-                })
+    df = pd.read_excel(path, engine="openpyxl")
+    df.columns = [str(c).strip() for c in df.columns]
+    for _, r in df.iterrows():
+        elective = str(r.get("ELECTIVE OR NOT", "")).strip().upper()
+        half_type = str(r.get("FULLSEM OR HALFSEM", "")).strip().upper()
+        course_code = str(r.get("COURSE CODE", "")).strip()
+        course_title = str(r.get("COURSE TITLE", "")).strip()
+        slot_raw = str(r.get("SLOT NAME", "")).strip().upper()
+        merge_raw = str(r.get("MERGE", "")).strip().upper()
+        no_students = safe_int(r.get("NO. OF STUDENTS", 0))
+
+        merge_list = [m.strip().upper() for m in merge_raw.split(",") if str(m).strip()]
+        if div not in merge_list:
+            merge_list.append(div)
+
+        slot_name = slot_raw
+        if elective == "YES":
+            slot_name = f"{slot_raw}_Y{year}"
+
+        rows.append({
+            "YEAR": year,
+            "DIVISION": div,
+            "ELECTIVE": elective,
+            "FULLSEM_TYPE": half_type,
+            "SLOT": slot_name,
+            "SLOT_RAW": slot_raw,
+            "COURSE_CODE": course_code,
+            "COURSE_TITLE": course_title,
+            "MERGE": merge_list,
+            "NO_STUDENTS": no_students
+        })
+    return rows
+
+def load_course_file(year, div, path, use_cache=True):
+    # parsed rows are cached per workbook (keyed by file content and year/division), see input_cache.py
+    return cached_parse("exam_courses", path, {"year": year, "division": div},
+                        lambda: parse_course_rows(year, div, path), enabled=use_cache)
+
+def load_courses(divisions_dict, use_cache=True, pool=None):
+    # pool: optional executor; files are then read concurrently, rows kept in divisions order
+    jobs = [(year, div, path) for year, divs in divisions_dict.items() for div, path in divs.items()]
+    if pool is not None:
+        # cache hits are read here; only the misses go to the pool
+        parts = [cache_lookup("exam_courses", path, {"year": year, "division": div}) if use_cache else None for year, div, path in jobs]
+        parts = [part if part is not None else pool.submit(load_course_file, year, div, path, use_cache) for part, (year, div, path) in zip(parts, jobs)]
+        parts = [part.result() if isinstance(part, Future) else part for part in parts]
+    else:
+        parts = [load_course_file(year, div, path, use_cache) for year, div, path in jobs]
+    rows = [r for part in parts for r in part]
     df_all = pd.DataFrame(rows)
     for c in ["DIVISION", "SLOT", "SLOT_RAW"]:
         if c in df_all.columns:
             df_all[c] = df_all[c].astype(str).str.upper()
     return df_all
 
+def read_rooms(path):
+    rooms_df = pd.read_excel(path, engine="openpyxl")
+    rooms_df.columns = [str(c).strip() for c in rooms_df.columns]
+    return rooms_df
+
+def read_invigilators(path):
+    inv_df = pd.read_excel(path, engine="openpyxl", dtype=str)
+    inv_df.columns = [str(c).strip() for c in inv_df.columns]
+    return inv_df
+
+def load_inputs(divisions_dict, rooms_file, invig_file, workers=8, use_cache=True):
+    # division workbooks, Rooms.xlsx and invigilators_list.xlsx read together on one process pool
+    if not workers or workers <= 1:
+        return load_courses(divisions_dict, use_cache), read_rooms(rooms_file), read_invigilators(invig_file)
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        rooms_future = pool.submit(read_rooms, rooms_file)
+        invig_future = pool.submit(read_invigilators, invig_file)
+        df_courses = load_courses(divisions_dict, use_cache, pool)
+        return df_courses, rooms_future.result(), invig_future.result()
+
 # -------------------------
 # Split halves
 # -------------------------
@@ -120,10 +171,89 @@ def split_half(df):
     second = df[df["FULLSEM_TYPE"].isin(["FULLSEM", "HALFSEM-2"])].copy().reset_index(drop=True)
     return first, second
 
+# -------------------------
+# Student-level clashes (optional): a roll-number enrollment list as a sparse student x course matrix
+# -------------------------
+ENROLLMENT_COLUMNS = ("ROLL NUMBER", "COURSE CODE")
+
+def read_enrollments(path):
+    # one row per (student, course): ROLL NUMBER and COURSE CODE columns, .xlsx or any table_export format
+    if str(path).lower().endswith((".xlsx", ".xls")):
+        df = pd.read_excel(path, engine="openpyxl", dtype=str)
+    else:
+        df = pd.DataFrame(read_table(path))
+    df.columns = [str(c).strip().upper() for c in df.columns]
+    missing = [c for c in ENROLLMENT_COLUMNS if c not in df.columns]
+    if missing:
+        raise ValueError(f"Enrollment file {path} must contain {', '.join(ENROLLMENT_COLUMNS)} columns (missing {', '.join(missing)})")
+    out = pd.DataFrame({"ROLL": df["ROLL NUMBER"].map(safe_str).str.upper(), "COURSE_CODE": df["COURSE CODE"].map(safe_str).str.upper()})
+    return out[(out["ROLL"] != "") & (out["COURSE_CODE"] != "")].drop_duplicates().reset_index(drop=True)
+
+def enrollment_matrix(enroll_df):
+    """Sparse student x course incidence matrix in CSR form.
+
+    Returns {"students", "courses"} (sorted labels) and "indptr" / "indices": the courses of student i
+    are indices[indptr[i]:indptr[i + 1]].
+    """
+    students, student_idx = np.unique(enroll_df["ROLL"].to_numpy(dtype=str), return_inverse=True)
+    courses, course_idx = np.unique(enroll_df["COURSE_CODE"].to_numpy(dtype=str), return_inverse=True)
+    order = np.lexsort((course_idx, student_idx))
+    indptr = np.zeros(len(students) + 1, dtype=np.int64)
+    np.cumsum(np.bincount(student_idx, minlength=len(students)), out=indptr[1:])
+    return {"students": students, "courses": courses, "indptr": indptr, "indices": course_idx[order].astype(np.int64)}
+
+def course_clash_graph(matrix):
+    """Upper triangle of A^T A for the student x course matrix A: course pairs (a < b) sharing students.
+
+    The product is taken row by row as a self-join of each student's courses, so the work is the sum of
+    k * k over students with k courses, in numpy. Returns (a, b, shared students) arrays.
+    """
+    indptr, indices = matrix["indptr"], matrix["indices"]
+    counts = np.diff(indptr)
+    row_of = np.repeat(np.arange(len(counts)), counts)  # student of every nonzero
+    reps = counts[row_of]  # every nonzero pairs with each nonzero of its row
+    left = np.repeat(np.arange(len(indices)), reps)
+    offset = np.arange(len(left)) - np.repeat(np.cumsum(reps) - reps, reps)
+    right = indptr[row_of[left]] + offset
+    a, b = indices[left], indices[right]
+    keep = a < b
+    n = max(len(matrix["courses"]), 1)
+    pairs, shared = np.unique(a[keep] * n + b[keep], return_counts=True)
+    return pairs // n, pairs % n, shared
+
+def apply_student_clashes(slots, matrix):
+    """Set slot["clashes"]: the slot keys sharing a student with it, from the course clash graph.
+
+    Returns a report: students, courses, course and slot clash edges, enrolled courses not offered in
+    these slots, and students with two courses inside one slot (a clash no session split can fix).
+    """
+    course_pos = {c: i for i, c in enumerate(matrix["courses"])}
+    offered = {(course_pos[code], s["slot_key"]) for s in slots for code in {safe_str(r["COURSE_CODE"]).upper() for r in s["courses"]} if code in course_pos}
+    course_slot = pd.DataFrame(sorted(offered), columns=["course", "slot"])
+    a, b, shared = course_clash_graph(matrix)
+    edges = (pd.DataFrame({"a": a, "b": b, "shared": shared})
+             .merge(course_slot.rename(columns={"course": "a", "slot": "slot_a"}), on="a")
+             .merge(course_slot.rename(columns={"course": "b", "slot": "slot_b"}), on="b"))
+    within = edges[edges["slot_a"] == edges["slot_b"]].groupby("slot_a")["shared"].sum()
+    edges = edges.loc[edges["slot_a"] != edges["slot_b"], ["slot_a", "slot_b"]].drop_duplicates()
+    both = pd.concat([edges, edges.rename(columns={"slot_a": "slot_b", "slot_b": "slot_a"})])
+    neighbours = both.groupby("slot_a")["slot_b"].agg(set).to_dict()
+    for s in slots:
+        s["clashes"] = neighbours.get(s["slot_key"], set())
+    return {
+        "students": len(matrix["students"]),
+        "courses": len(matrix["courses"]),
+        "course_clash_edges": len(a),
+        "slot_clash_edges": len(both) // 2,
+        "unmatched_courses": len(matrix["courses"]) - course_slot["course"].nunique(),
+        "same_slot": within.to_dict(),
+    }
+
 # -------------------------
 # Allocate slots by seating capacity
 # -------------------------
-def allocate_slots_by_seating_capacity(courses_df, rooms_df):
+def build_exam_slots(courses_df):
+    # one exam slot per SLOT key: its courses, divisions and seats needed (a merged slot sits once)
     slot_map = {}
     for _, r in courses_df.iterrows():
         key = r["SLOT"]
@@ -147,12 +277,18 @@ def allocate_slots_by_seating_capacity(courses_df, rooms_df):
             "divisions": v["divisions"],
             "merged_flag": v["merged_flag"],
             "students": students,
+            "clashes": set(),
             "assigned": False
         })
+    return slots
 
-    total_students = sum(s["students"] for s in slots)
+def session_room_capacities(rooms_df):
     rooms_sorted = rooms_df.sort_values(by="Seating Capacity", ascending=False)
-    room_caps = [int(r["Seating Capacity"]) for _, r in rooms_sorted.iterrows()]
+    return [int(r["Seating Capacity"]) for _, r in rooms_sorted.iterrows()]
+
+def first_fit_assignments(slots, room_caps):
+    # the original packer: alphabetical first-fit into ceil(total / capacity) days; a slot that does not fit is left out
+    total_students = sum(s["students"] for s in slots)
     session_capacity = sum([cap // 2 for cap in room_caps])
     min_days = math.ceil(total_students / session_capacity) if session_capacity > 0 else 1
     sessions_per_day = [{"FN": True, "AN": True} for _ in range(min_days)]
@@ -176,6 +312,7 @@ def allocate_slots_by_seating_capacity(courses_df, rooms_df):
                 if slot["students"] > session_capacity:
                     continue
                 conflict = any(division_taken[(day_idx, sess)].get(div, False) for div in slot["divisions"])
+                conflict = conflict or not slot["clashes"].isdisjoint(p["slot_key"] for p in placed_slots)
                 if conflict:
                     continue
                 if slot["students"] <= remaining_capacity:
@@ -189,13 +326,222 @@ def allocate_slots_by_seating_capacity(courses_df, rooms_df):
         day_idx += 1
     return assignments
 
+# -------------------------
+# Exam-day minimizing packer: sessions are bins of session_capacity seats, slots sharing a division
+# (or a student, with enrollments) cannot share a session (bin packing with conflicts)
+# -------------------------
+class _Session:
+    def __init__(self):
+        self.slots = []
+        self.keys = set()
+        self.load = 0
+        self.divisions = defaultdict(int)
+
+    def fits(self, slot, capacity, ignore=None):
+        load = self.load - (ignore["students"] if ignore is not None else 0)
+        if load + slot["students"] > capacity:
+            return False
+        skip = ignore["divisions"] if ignore is not None else ()
+        if any(self.divisions[d] - (1 if d in skip else 0) > 0 for d in slot["divisions"]):
+            return False
+        # student-level clashes (apply_student_clashes)
+        clashes = slot["clashes"]
+        return not clashes or not any(k in clashes for k in self.keys if ignore is None or k != ignore["slot_key"])
+
+    def add(self, slot):
+        self.slots.append(slot)
+        self.keys.add(slot["slot_key"])
+        self.load += slot["students"]
+        for d in slot["divisions"]:
+            self.divisions[d] += 1
+
+    def remove(self, slot):
+        self.slots.remove(slot)
+        self.keys.discard(slot["slot_key"])
+        self.load -= slot["students"]
+        for d in slot["divisions"]:
+            self.divisions[d] -= 1
+
+def _clash_clique(slots, seeds=50):
+    # size of a greedy clique of pairwise clashing slots (shared division or student), grown from the
+    # best-connected slots; each of its slots needs a session of its own
+    by_division = defaultdict(set)
+    for s in slots:
+        for d in s["divisions"]:
+            by_division[d].add(s["slot_key"])
+    adjacent = {s["slot_key"]: set(s["clashes"]).union(*(by_division[d] for d in s["divisions"])) - {s["slot_key"]} for s in slots}
+    best = 0
+    for key in sorted(adjacent, key=lambda k: (-len(adjacent[k]), k))[:seeds]:
+        size, candidates = 1, set(adjacent[key])
+        while candidates:
+            nxt = max(sorted(candidates), key=lambda k: len(adjacent[k] & candidates))
+            size += 1
+            candidates &= adjacent[nxt]
+        best = max(best, size)
+    return best
+
+def session_lower_bound(slots, capacity):
+    # sessions needed by any packing: seats (an oversize slot fills a session alone) and the division
+    # with the most slots (its slots pairwise clash); with student clashes, a greedy clash clique
+    oversize = [s for s in slots if s["students"] > capacity]
+    rest = sum(s["students"] for s in slots if s["students"] <= capacity)
+    by_seats = len(oversize) + (math.ceil(rest / capacity) if capacity > 0 and rest else 0)
+    per_division = defaultdict(int)
+    for s in slots:
+        for d in s["divisions"]:
+            per_division[d] += 1
+    by_clashes = _clash_clique(slots) if any(s["clashes"] for s in slots) else 0
+    return max(by_seats, max(per_division.values(), default=0), by_clashes, 1 if slots else 0)
+
+def _first_fit_decreasing(slots, capacity):
+    sessions = []
+    for slot in sorted(slots, key=lambda s: (-s["students"], -len(s["divisions"]), s["slot_key"])):
+        target = next((sess for sess in sessions if sess.fits(slot, capacity)), None)
+        if target is None:
+            target = _Session()
+            sessions.append(target)
+        target.add(slot)
+    return sessions
+
+def _saturation_colouring(slots, capacity):
+    # DSatur-style: the slot with the fewest sessions it may still join goes next, into the fullest one it fits
+    sessions = []
+    unplaced = sorted(slots, key=lambda s: (-s["students"], s["slot_key"]))
+    feasible = {s["slot_key"]: 0 for s in unplaced}
+    while unplaced:
+        slot = min(unplaced, key=lambda s: (feasible[s["slot_key"]] if sessions else 0, -s["students"], -len(s["divisions"])))
+        unplaced.remove(slot)
+        options = [sess for sess in sessions if sess.fits(slot, capacity)]
+        if options:
+            # adding a slot only closes the session to slots clashing with it or no longer fitting in the seats
+            target = max(options, key=lambda sess: sess.load)
+            room_left = capacity - target.load - slot["students"]
+            for s in unplaced:
+                if (s["students"] > room_left or not slot["divisions"].isdisjoint(s["divisions"]) or s["slot_key"] in slot["clashes"]) and target.fits(s, capacity):
+                    feasible[s["slot_key"]] -= 1
+            target.add(slot)
+        else:
+            target = _Session()
+            sessions.append(target)
+            target.add(slot)
+            for s in unplaced:
+                if target.fits(s, capacity):
+                    feasible[s["slot_key"]] += 1
+    return sessions
+
+def _empty_session(sessions, victim, capacity):
+    # move every slot of victim elsewhere (directly, or by pushing one slot of the receiving session on);
+    # all-or-nothing: returns the list of moves made, or None after undoing them
+    others = [s for s in sessions if s is not victim]
+    moves = []
+
+    def move(slot, src, dst):
+        src.remove(slot)
+        dst.add(slot)
+        moves.append((slot, src, dst))
+
+    for slot in sorted(victim.slots, key=lambda s: -s["students"]):
+        direct = [s for s in others if s.fits(slot, capacity)]
+        if direct:
+            move(slot, victim, max(direct, key=lambda s: s.load))
+            continue
+        swapped = False
+        for dst in others:
+            for other in list(dst.slots):
+                if not dst.fits(slot, capacity, ignore=other):
+                    continue
+                onward = [s for s in others if s is not dst and s.fits(other, capacity)]
+                if onward:
+                    move(other, dst, max(onward, key=lambda s: s.load))
+                    move(slot, victim, dst)
+                    swapped = True
+                    break
+            if swapped:
+                break
+        if not swapped:
+            for slot_, src, dst in reversed(moves):
+                dst.remove(slot_)
+                src.add(slot_)
+            return None
+    return moves
+
+def improve_sessions(sessions, capacity, target=1):
+    # repeatedly try to empty the lightest session into the others (stops at target sessions)
+    improved = True
+    while improved and len(sessions) > max(target, 1):
+        improved = False
+        for victim in sorted(sessions, key=lambda s: s.load):
+            if _empty_session(sessions, victim, capacity) is not None:
+                sessions.remove(victim)
+                improved = True
+                break
+    return sessions
+
+def pack_exam_sessions(slots, capacity):
+    """Every slot in a session: FFD and saturation colouring, the better one improved by emptying sessions.
+
+    A slot larger than the session capacity gets a session of its own (reported as overflow).
+    Returns (sessions as lists of slots, heaviest first, report dict).
+    """
+    oversize = [s for s in slots if s["students"] > capacity]
+    packable = [s for s in slots if s["students"] <= capacity]
+    lower = session_lower_bound(slots, capacity)
+    # the later passes only run while the packing is above the lower bound
+    target = lower - len(oversize)
+    ffd = _first_fit_decreasing(packable, capacity)
+    ffd_sessions = len(ffd)
+    best = ffd
+    if len(best) > target:
+        best = min([ffd, _saturation_colouring(packable, capacity)], key=len)
+    if len(best) > target:
+        best = improve_sessions(best, capacity, target)
+    sessions = [[s] for s in oversize] + [sess.slots for sess in sorted(best, key=lambda s: -s.load)]
+    report = {
+        "slots": len(slots),
+        "sessions": len(sessions),
+        "days": math.ceil(len(sessions) / 2),
+        "lower_bound_sessions": lower,
+        "lower_bound_days": math.ceil(lower / 2),
+        "first_fit_decreasing_sessions": ffd_sessions + len(oversize),
+        "overflow": {s["slot_key"]: s["students"] - capacity for s in oversize},
+    }
+    return sessions, report
+
+def allocate_slots_by_seating_capacity(courses_df, rooms_df, packer="bin_packing", enrollments=None):
+    # packer "bin_packing" (default) places every slot in as few sessions as it can find;
+    # "first_fit" is the original alphabetical first-fit over a fixed number of days.
+    # enrollments: optional enrollment_matrix; slots sharing a student then never share a session
+    slots = build_exam_slots(courses_df)
+    if enrollments is not None:
+        report = apply_student_clashes(slots, enrollments)
+        print(f"Student clashes: {report['students']} students, {report['courses']} courses, {report['course_clash_edges']} clashing course pairs, "
+              f"{report['slot_clash_edges']} clashing slot pairs ({report['unmatched_courses']} enrolled courses not in this half)")
+        for key, students in report["same_slot"].items():
+            print(f"  WARNING: slot {key} holds two courses of the same student ({students} times); those students clash whatever the session")
+    room_caps = session_room_capacities(rooms_df)
+    if packer == "first_fit":
+        return first_fit_assignments(slots, room_caps)
+    session_capacity = sum(cap // 2 for cap in room_caps)
+    sessions, report = pack_exam_sessions(slots, session_capacity)
+    print(f"Exam slots: {report['slots']} slots in {report['sessions']} sessions / {report['days']} days "
+          f"(lower bound {report['lower_bound_days']} days, first-fit-decreasing alone {report['first_fit_decreasing_sessions']} sessions)")
+    for key, extra in report["overflow"].items():
+        print(f"  WARNING: slot {key} needs {extra} more seats than one session has (alternate seating, {session_capacity} seats); it has a session of its own")
+    assignments = []
+    for i, placed_slots in enumerate(sessions):
+        for slot in placed_slots:
+            slot["assigned"] = True
+        assignments.append({"day": i // 2 + 1, "session": "FN" if i % 2 == 0 else "AN", "slots": placed_slots})
+    return assignments
+
 # -------------------------
 # Seating allocation per session
 # -------------------------
 def make_grid(rows, cols):
     return [["" for _ in range(cols)] for __ in range(rows)]
 
-def allocate_seating_for_session(placed_slots, rooms_df, invigators):
+def seating_items(placed_slots):
+    # seat groups in fill order: a merged slot sits as one group, otherwise one group per division course
     parent_groups = {}
     for slot in placed_slots:
         parent = slot["slot_key"]
@@ -214,33 +560,32 @@ def allocate_seating_for_session(placed_slots, rooms_df, invigators):
     for parent, v in parent_groups.items():
         for it in v["items"]:
             active_items.append({"parent": parent, "base": v["base"], "label_prefix": it["label_prefix"], "remaining": it["remaining"]})
+    return active_items
 
+def session_rooms(rooms_df):
+    # rooms by capacity (6 rows, alternate seats usable); invigilators are added by InvigilatorScheduler.assign_day
     rooms_sorted = rooms_df.sort_values(by="Seating Capacity", ascending=False)
-    largest_room_cap = rooms_sorted["Seating Capacity"].max() if not rooms_sorted.empty else 0
 
     rooms = []
-    inv_pool = invigators.copy() if invigators else []
     for _, r in rooms_sorted.iterrows():
         cap = int(r["Seating Capacity"])
         rows = 6
         cols = max(1, math.ceil(cap / rows))
         usable = cap // 2
-
-        invs_needed = 2 if cap == largest_room_cap else 1
-        alloc_invs = []
-        if inv_pool and invs_needed > 0:
-            take = min(invs_needed, len(inv_pool))
-            for _ in range(take):
-                alloc_invs.append(inv_pool.pop(0))
         rooms.append({
             "name": str(r["Room"]),
             "capacity": cap,
             "rows": rows,
             "cols": cols,
             "usable": usable,
-            "grid": make_grid(rows, cols),
-            "invigilators": alloc_invs
+            "invigilators": []
         })
+    return rooms
+
+def _fill_string_grids(rooms, active_items):
+    # the original fill: nested lists of "<prefix>-<n>" labels
+    for room in rooms:
+        room["grid"] = make_grid(room["rows"], room["cols"])
 
     placed_counters = defaultdict(int)
     for room in rooms:
@@ -305,51 +650,226 @@ def allocate_seating_for_session(placed_slots, rooms_df, invigators):
                         already += 1
                         break
 
-    # ------------------------------------------------------------
-    # REDISTRIBUTE INVIGILATORS — DESCENDING CAPACITY LOGIC
-    # ------------------------------------------------------------
-    rooms_with_students = []
-    rooms_empty = []
+    for room in rooms:
+        room["occupied"] = sum(1 for row in room["grid"] for v in row if v)
+
+def _fill_seat_arrays(rooms, active_items):
+    # the same fill on integer grids: seat_ids (index into labels, -1 = empty) and seat_numbers per room;
+    # a column takes one item, so it is written as one slice
+    labels = list(dict.fromkeys(it["label_prefix"] for it in active_items))
+    label_pos = {label: i for i, label in enumerate(labels)}
+    item_label = [label_pos[it["label_prefix"]] for it in active_items]
+    remaining = [it["remaining"] for it in active_items]
+    placed_counters = [0] * len(labels)
+    left = sum(n for n in remaining if n > 0)
+
+    def place(room, rr, cc, idx, n):
+        lab = item_label[idx]
+        room["seat_ids"][rr, cc] = lab
+        room["seat_numbers"][rr, cc] = np.arange(placed_counters[lab] + 1, placed_counters[lab] + n + 1)
+        placed_counters[lab] += n
+        remaining[idx] -= n
+        room["occupied"] += n
 
     for room in rooms:
-        occupied = any(room["grid"][r][c] for r in range(room["rows"]) for c in range(room["cols"]))
-        if occupied:
-            rooms_with_students.append(room)
-        else:
-            rooms_empty.append(room)
+        room["labels"] = labels
+        room["seat_ids"] = np.full((room["rows"], room["cols"]), -1, dtype=np.int32)
+        room["seat_numbers"] = np.zeros((room["rows"], room["cols"]), dtype=np.int32)
+        room["occupied"] = 0
 
-    free_invigs = []
-    for room in rooms_empty:
-        free_invigs.extend(room["invigilators"])
-        room["invigilators"] = []
+    live = [idx for idx, n in enumerate(remaining) if n > 0]  # items with seats left, in order
+    for room in rooms:
+        if not live:
+            break
+        col_idx = 0
+        last_slot_base = None
+        while room["occupied"] < room["usable"] and live and col_idx < room["cols"]:
+            chosen = next((idx for idx in live if active_items[idx]["base"] != last_slot_base), live[0])
+            n = min(room["rows"], room["usable"] - room["occupied"], remaining[chosen])
+            place(room, slice(0, n), col_idx, chosen, n)
+            left -= n
+            if remaining[chosen] == 0:
+                live.remove(chosen)
+            last_slot_base = active_items[chosen]["base"]
+            col_idx += 1
 
-    free_invigs.extend(inv_pool)
+    # Fallback fill for leftover: the first free seats column by column, items in order
+    for room in rooms:
+        free = min(room["usable"] - room["occupied"], left)
+        if free <= 0:
+            continue
+        empty = np.flatnonzero(room["seat_ids"].T.ravel() < 0)[:free]
+        rr, cc = empty % room["rows"], empty // room["rows"]
+        start = 0
+        for idx in range(len(active_items)):
+            if start >= len(empty):
+                break
+            if remaining[idx] <= 0:
+                continue
+            n = min(remaining[idx], len(empty) - start)
+            place(room, rr[start:start + n], cc[start:start + n], idx, n)
+            start += n
+        left -= start
+
+    for it, n in zip(active_items, remaining):
+        it["remaining"] = n
+
+SEATING_ENGINES = {"numpy": _fill_seat_arrays, "strings": _fill_string_grids}
+
+def allocate_seating_for_session(placed_slots, rooms_df, engine="numpy"):
+    # engine "numpy" (default) keeps integer seat grids, labelled only when written (seat_grid_labels);
+    # "strings" is the original fill into nested lists of labels (room["grid"])
+    active_items = seating_items(placed_slots)
+    rooms = session_rooms(rooms_df)
+    SEATING_ENGINES[engine](rooms, active_items)
+    return rooms
 
-    for room in rooms_with_students:
-        if len(room["invigilators"]) > 2:
-            extra = room["invigilators"][2:]
-            free_invigs.extend(extra)
-            room["invigilators"] = room["invigilators"][:2]
+def seat_grid_labels(room):
+    # "<prefix>-<n>" per seat ("" when empty), rows x cols; integer grids are labelled here, at write time
+    if "grid" in room:
+        return room["grid"]
+    labels = room["labels"]
+    return [[f"{labels[i]}-{n}" if i >= 0 else "" for i, n in zip(ids, numbers)]
+            for ids, numbers in zip(room["seat_ids"].tolist(), room["seat_numbers"].tolist())]
+
+def occupied_seats(room):
+    # (row, col, label prefix, number) of every occupied seat, row by row
+    if "grid" in room:
+        for r, row in enumerate(room["grid"]):
+            for c, label in enumerate(row):
+                if label:
+                    prefix, _, number = label.rpartition("-")
+                    yield r, c, prefix, safe_int(number)
+        return
+    labels = room["labels"]
+    rr, cc = np.nonzero(room["seat_ids"] >= 0)
+    for r, c, i, n in zip(rr.tolist(), cc.tolist(), room["seat_ids"][rr, cc].tolist(), room["seat_numbers"][rr, cc].tolist()):
+        yield r, c, labels[i], n
 
-    for room in rooms_with_students:
-        if len(room["invigilators"]) == 0 and free_invigs:
-            room["invigilators"].append(free_invigs.pop(0))
+# -------------------------
+# Invigilator assignment: least-loaded first, duties counted across both halves
+# -------------------------
+EXAM_SESSIONS = ("FN", "AN")
 
-    rooms_sorted_cap_desc = sorted(rooms_with_students, key=lambda x: x["capacity"], reverse=True)
+def invigilator_keys(inv_copy_df):
+    # inv_key per row of the invigilators file, in file order, without duplicates
+    invig_list = []
+    invig_seen = set()
+    for _, r in inv_copy_df.iterrows():
+        num = str(r.iloc[0]).strip()
+        name = str(r.iloc[1]).strip() if len(r) > 1 else ""
+        if not num:
+            continue
+        key = inv_key(num, name)
+        if key in invig_seen:
+            continue
+        invig_seen.add(key)
+        invig_list.append(key)
+    return invig_list
 
-    for room in rooms_sorted_cap_desc:
-        if not free_invigs:
-            break
-        if len(room["invigilators"]) == 1:
-            room["invigilators"].append(free_invigs.pop(0))
+def read_unavailability(path, keys):
+    """{inv_key: {(half, day, session)}} from a table with INVIGILATOR and DAY columns (SESSION and HALF optional).
 
-    for room in rooms_sorted_cap_desc:
-        if not free_invigs:
-            break
-        if len(room["invigilators"]) < 2:
-            room["invigilators"].append(free_invigs.pop(0))
+    INVIGILATOR matches the first column of the invigilators file; a blank SESSION or HALF means both.
+    """
+    if str(path).lower().endswith((".xlsx", ".xls")):
+        df = pd.read_excel(path, engine="openpyxl", dtype=str)
+    else:
+        df = pd.DataFrame(read_table(path))
+    df.columns = [str(c).strip().upper() for c in df.columns]
+    missing = [c for c in ("INVIGILATOR", "DAY") if c not in df.columns]
+    if missing:
+        raise ValueError(f"Unavailability file {path} must contain INVIGILATOR and DAY columns (missing {', '.join(missing)})")
+    by_num = {key.partition("|")[0].upper(): key for key in keys}
+    out = defaultdict(set)
+    for _, r in df.iterrows():
+        key = by_num.get(safe_str(r["INVIGILATOR"]).upper())
+        if key is None:
+            print(f"  WARNING: unavailability for unknown invigilator '{safe_str(r['INVIGILATOR'])}' ignored")
+            continue
+        half = safe_str(r.get("HALF", "")).upper() or None
+        session = safe_str(r.get("SESSION", "")).upper() or None
+        out[key].add((half, safe_int(r["DAY"]), session))
+    return dict(out)
+
+class InvigilatorScheduler:
+    """Invigilator picks from a min-heap keyed by (duties so far, file order), shared by both halves.
+
+    An invigilator is eligible for (half, day, session) unless unavailable then, already on duty in that
+    session, at max_per_day duties that day, or (no_back_to_back) on duty in the day's other session;
+    overnight=True also keeps an AN duty and the next day's FN apart.
+    Entries found ineligible are parked for the rest of the day instead of being popped again, so every
+    pick is O(log n) amortized.
+    """
 
-    return rooms
+    def __init__(self, keys, max_per_day=1, no_back_to_back=True, unavailable=None, overnight=False):
+        self.max_per_day = max_per_day
+        self.no_back_to_back = no_back_to_back
+        self.overnight = overnight
+        self.unavailable = unavailable or {}
+        self.duties = {key: 0 for key in keys}
+        self.on_duty = defaultdict(set)  # key -> {(half, session index)}
+        self.heap = [(0, i, key) for i, key in enumerate(self.duties)]
+        heapq.heapify(self.heap)
+
+    def eligible(self, key, half, day, session):
+        blocked = self.unavailable.get(key)
+        if blocked and any((h, day, s) in blocked for h in (half, None) for s in (session, None)):
+            return False
+        idx = 2 * (day - 1) + EXAM_SESSIONS.index(session)
+        taken = self.on_duty[key]
+        if (half, idx) in taken:
+            return False
+        if sum((half, 2 * (day - 1) + i) in taken for i in range(len(EXAM_SESSIONS))) >= self.max_per_day:
+            return False
+        if not self.no_back_to_back:
+            return True
+        # a neighbouring index on another day is across a night, only checked with overnight
+        neighbours = [n for n in (idx - 1, idx + 1) if self.overnight or n // 2 == day - 1]
+        return not any((half, n) in taken for n in neighbours)
+
+    def _pick(self, half, day, session, parked):
+        # parked[s]: entries known ineligible for session s today; they are still candidates for the other session
+        others = [parked[s] for s in EXAM_SESSIONS if s != session]
+        while True:
+            sources = [h for h in [self.heap] + others if h]
+            if not sources:
+                return None
+            source = min(sources, key=lambda h: h[0])
+            entry = heapq.heappop(source)
+            key = entry[2]
+            if self.eligible(key, half, day, session):
+                self.duties[key] += 1
+                self.on_duty[key].add((half, 2 * (day - 1) + EXAM_SESSIONS.index(session)))
+                heapq.heappush(parked[session], (self.duties[key], entry[1], key))
+                return key
+            # from the main heap it may still suit another session; from another session's list it suits neither
+            heapq.heappush(parked[session] if source is self.heap else parked["day"], entry)
+
+    def assign_day(self, half, day, rooms_by_session):
+        """Fill room["invigilators"] for one exam day ({"FN": rooms, "AN": rooms}); returns rooms left without one.
+
+        Every occupied room gets one invigilator, then a second goes to the largest rooms first (FN and AN
+        interleaved by capacity), while eligible invigilators last.
+        """
+        parked = {s: [] for s in (*EXAM_SESSIONS, "day")}
+        demand = [(s, room) for s in EXAM_SESSIONS for room in rooms_by_session.get(s, []) if room["occupied"] > 0]
+        seconds = sorted(demand, key=lambda x: -x[1]["capacity"])
+        uncovered = 0
+        for s, room in demand + seconds:
+            key = self._pick(half, day, s, parked)
+            if key is not None:
+                room["invigilators"].append(key)
+            elif not room["invigilators"]:
+                uncovered += 1
+        for entries in parked.values():
+            for entry in entries:
+                heapq.heappush(self.heap, entry)
+        return uncovered
+
+    def summary(self):
+        counts = list(self.duties.values())
+        return {"invigilators": len(counts), "duties": sum(counts), "min": min(counts, default=0), "max": max(counts, default=0)}
 
 # -------------------------
 # Write seating Excel (per-day) - will be called for each half saving into given out_dir
@@ -373,9 +893,10 @@ def write_seating_excel(day_idx, rooms_alloc_fn, rooms_alloc_an, day_slots_fn, d
             inv_display = ", ".join([inv_display_from_key(k) for k in room.get('invigilators', [])])
             ws.cell(row=row_cursor, column=3, value=f"Invigilators: {inv_display}")
             row_cursor += 1
+            grid = seat_grid_labels(room)
             for r in range(room["rows"]):
                 for c in range(room["cols"]):
-                    val = room["grid"][r][c] or ""
+                    val = grid[r][c] or ""
                     cell = ws.cell(row=row_cursor + r, column=c + 1, value=val)
                     cell.alignment = Alignment(horizontal="center", vertical="center", wrap_text=True)
                     cell.border = border
@@ -550,99 +1071,163 @@ def write_invigilator_schedules(invigilator_df, invig_assignments, outpath):
     print(f"Wrote invigilator schedules: {outpath}")
 
 # -------------------------
-# Run full generation for a half (keeps algorithm exactly as original)
+# Structured export (json / csv / parquet): exam slots, seats and invigilator duties per half
+# -------------------------
+EXAM_SLOT_COLUMNS = ["half", "day", "session", "slot", "division", "course_code", "course_title", "students"]
+SEAT_COLUMNS = ["half", "day", "session", "room", "row", "col", "seat", "number", "slot", "division", "course_code"]
+# invigilator_id / invigilator_name: first and second column of the invigilators file (the name may be empty)
+DUTY_COLUMNS = ["half", "day", "session", "room", "invigilator_id", "invigilator_name"]
+
+def exam_slot_rows(half_name, assignments):
+    rows = []
+    for alloc in assignments:
+        for slot in alloc["slots"]:
+            for c in sorted(slot["courses"], key=lambda x: x["DIVISION"]):
+                rows.append({"half": half_name, "day": alloc["day"], "session": alloc["session"], "slot": slot["slot_key"], "division": c["DIVISION"],
+                             "course_code": safe_str(c.get("COURSE_CODE", "")), "course_title": safe_str(c.get("COURSE_TITLE", "")), "students": safe_int(c.get("NO_STUDENTS", 0))})
+    return rows
+
+def seat_label_owners(placed_slots):
+    # seat label prefix -> (slot, division(s), course code(s)), the same prefixes allocate_seating_for_session uses
+    owners = {}
+    for slot in placed_slots:
+        parent = slot["slot_key"]
+        courses = sorted(slot["courses"], key=lambda x: x["DIVISION"])
+        if slot.get("merged_flag", False):
+            owners[parent] = (parent, ", ".join(sorted(slot["divisions"])), ", ".join(dict.fromkeys(safe_str(c.get("COURSE_CODE", "")) for c in courses if safe_str(c.get("COURSE_CODE", "")))))
+        else:
+            for c in courses:
+                owners[f"{parent}_{c['DIVISION']}"] = (parent, c["DIVISION"], safe_str(c.get("COURSE_CODE", "")))
+    return owners
+
+def seat_rows(half_name, day_idx, session, rooms_alloc, placed_slots):
+    owners = seat_label_owners(placed_slots)
+    rows = []
+    for room in rooms_alloc:
+        for r, c, prefix, number in occupied_seats(room):
+            slot, division, code = owners.get(prefix, (prefix, "", ""))
+            rows.append({"half": half_name, "day": day_idx, "session": session, "room": room["name"], "row": r + 1, "col": c + 1,
+                         "seat": f"{prefix}-{number}", "number": number, "slot": slot, "division": division, "course_code": code})
+    return rows
+
+def duty_rows(half_name, invig_assignments):
+    rows = []
+    for key, duties in invig_assignments.items():
+        num, _, name = key.partition("|")
+        for d in sorted(duties, key=lambda x: (x["day"], 0 if x["session"] == "FN" else 1)):
+            rows.append({"half": half_name, "day": d["day"], "session": d["session"], "room": d["room"], "invigilator_id": num, "invigilator_name": name})
+    rows.sort(key=lambda x: (x["day"], 0 if x["session"] == "FN" else 1, x["room"], x["invigilator_id"]))
+    return rows
+
+def export_half(root_out, half_name, assignments, seats, invig_assignments, formats):
+    # exam_slots.<fmt>, seats.<fmt> and invigilator_duties.<fmt> in the half's output folder
+    paths = []
+    paths += write_tables(exam_slot_rows(half_name, assignments), str(Path(root_out) / "exam_slots"), formats, EXAM_SLOT_COLUMNS)
+    paths += write_tables(seats, str(Path(root_out) / "seats"), formats, SEAT_COLUMNS)
+    paths += write_tables(duty_rows(half_name, invig_assignments), str(Path(root_out) / "invigilator_duties"), formats, DUTY_COLUMNS)
+    for p in paths:
+        print(f"Wrote export: {p}")
+
+def write_seating_day(half_name, day_idx, rooms_alloc_fn, rooms_alloc_an, day_slots_fn, day_slots_an, df_day, out_dir, with_seats=False):
+    # one day of a half (a process pool job): Day_N.xlsx, the day's invigilator duty map and, if asked, its seat rows
+    duties = defaultdict(list)
+    for sess, rooms_alloc in (("FN", rooms_alloc_fn), ("AN", rooms_alloc_an)):
+        for room in rooms_alloc:
+            for ik in room.get("invigilators", []):
+                duties[ik].append({"day": day_idx, "session": sess, "room": room["name"]})
+    seats = []
+    if with_seats:
+        seats += seat_rows(half_name, day_idx, "FN", rooms_alloc_fn, day_slots_fn)
+        seats += seat_rows(half_name, day_idx, "AN", rooms_alloc_an, day_slots_an)
+    write_seating_excel(day_idx, rooms_alloc_fn, rooms_alloc_an, day_slots_fn, day_slots_an, df_day, out_dir)
+    return dict(duties), seats
+
 # -------------------------
-def run_half(half_name, courses_df_half, rooms_df, inv_copy_df):
+# Run full generation for a half: slot packing, seating, invigilators and per-day files
+# -------------------------
+def run_half(half_name, courses_df_half, rooms_df, inv_copy_df, export_formats=(), enrollments=None, invigilators=None, workers=8):
     """
     half_name: "FIRSTHALF" or "SECONDHALF"
     courses_df_half: DataFrame of courses for that half only
     rooms_df: rooms DataFrame
     inv_copy_df: DataFrame (first two columns) from invigilators input
+    export_formats: optional "json" / "csv" / "parquet" exports of slots, seats and duties
+    enrollments: optional enrollment_matrix for student-level clashes between slots
+    invigilators: InvigilatorScheduler shared across halves (a fresh one from inv_copy_df if None)
+    workers: processes writing the Day_N.xlsx files (1 writes them one after another)
     """
     root_out = Path("EXAM_OUTPUT") / half_name
     seating_out_dir = root_out / "seating_arrangements"
     Path(seating_out_dir).mkdir(parents=True, exist_ok=True)
 
-    # Build invigilator list (preserve order, unique)
-    invig_list = []
-    invig_seen = set()
-    for _, r in inv_copy_df.iterrows():
-        num = str(r.iloc[0]).strip()
-        name = str(r.iloc[1]).strip() if len(r) > 1 else ""
-        if not num:
-            continue
-        key = inv_key(num, name)
-        if key in invig_seen:
-            continue
-        invig_seen.add(key)
-        invig_list.append(key)
+    if invigilators is None:
+        invigilators = InvigilatorScheduler(invigilator_keys(inv_copy_df), max_duties_per_day, no_back_to_back, overnight=no_back_to_back_overnight)
 
     # 1) Slot allocation -> assignments for this half
-    assignments = allocate_slots_by_seating_capacity(courses_df_half.copy(), rooms_df)
+    assignments = allocate_slots_by_seating_capacity(courses_df_half.copy(), rooms_df, enrollments=enrollments)
 
     # 2) Build timetable file for this half
     timetable_path = root_out / f"{half_name.lower()}_timetable.xlsx"
     build_timetable_from_assignments(courses_df_half, assignments, str(timetable_path))
 
-    # 3) Prepare invigilator assignment mapping for this half
-    invig_assignments = defaultdict(list)
-
     # Calculate total days for this half only (some assign entries may have empty slots)
     total_days = max([alloc["day"] for alloc in assignments]) if assignments else 0
 
+    # 3) Day plans, in day order: seating for FN and AN, then the day's invigilators (least duties first).
+    # The scheduler is shared across days and halves, so this pass stays sequential and deterministic.
+    plans = []
     for day_idx in range(1, total_days + 1):
-        # Random split invigilators each day (same logic as original: random shuffle, half/half, extra to AN)
-        invig_random = invig_list.copy()
-        random.shuffle(invig_random)
-        half_invig = len(invig_random) // 2
-        invig_fn = invig_random[:half_invig]
-        invig_an = invig_random[half_invig:]
-
         # Extract slots for this half/day/session explicitly from assignments (this half's assignments)
         day_slots_fn = [s for alloc in assignments if alloc["day"] == day_idx and alloc["session"] == "FN" for s in alloc["slots"]]
         day_slots_an = [s for alloc in assignments if alloc["day"] == day_idx and alloc["session"] == "AN" for s in alloc["slots"]]
 
-        # Allocate seating and invigilators for FN and AN
-        rooms_alloc_fn = allocate_seating_for_session(day_slots_fn, rooms_df, invig_fn)
-        rooms_alloc_an = allocate_seating_for_session(day_slots_an, rooms_df, invig_an)
-
-        # Record invigilator duties
-        for room in rooms_alloc_fn:
-            for ik in room.get("invigilators", []):
-                invig_assignments[ik].append({"day": day_idx, "session": "FN", "room": room["name"]})
-        for room in rooms_alloc_an:
-            for ik in room.get("invigilators", []):
-                invig_assignments[ik].append({"day": day_idx, "session": "AN", "room": room["name"]})
-
-        # Write per-day seating file into this half's folder
-        write_seating_excel(day_idx, rooms_alloc_fn, rooms_alloc_an, day_slots_fn, day_slots_an, courses_df_half, seating_out_dir)
+        rooms_alloc_fn = allocate_seating_for_session(day_slots_fn, rooms_df)
+        rooms_alloc_an = allocate_seating_for_session(day_slots_an, rooms_df)
+        uncovered = invigilators.assign_day(half_name, day_idx, {"FN": rooms_alloc_fn, "AN": rooms_alloc_an})
+        if uncovered:
+            print(f"  WARNING: day {day_idx}: {uncovered} occupied rooms without an eligible invigilator")
+        day_keys = {s["slot_key"] for s in day_slots_fn + day_slots_an}
+        plans.append((half_name, day_idx, rooms_alloc_fn, rooms_alloc_an, day_slots_fn, day_slots_an,
+                      courses_df_half[courses_df_half["SLOT"].isin(day_keys)], seating_out_dir, bool(export_formats)))
+
+    # 4) Day_N.xlsx files written concurrently; per-day duty maps and seat rows merged in day order
+    if workers and workers > 1 and len(plans) > 1:
+        with ProcessPoolExecutor(max_workers=min(workers, len(plans))) as pool:
+            results = list(pool.map(write_seating_day, *zip(*plans)))
+    else:
+        results = [write_seating_day(*plan) for plan in plans]
+    invig_assignments = defaultdict(list)
+    seats = []
+    for day_duties, day_seats in results:
+        for ik, duties in day_duties.items():
+            invig_assignments[ik].extend(duties)
+        seats += day_seats
 
     # After all days, write invigilator schedules into this half folder
     inv_sched_path = root_out / "Invigilator_Schedules.xlsx"
     write_invigilator_schedules(inv_copy_df, invig_assignments, str(inv_sched_path))
+    if export_formats:
+        export_half(root_out, half_name, assignments, seats, invig_assignments, export_formats)
 
     print(f"Completed generation for {half_name}. Outputs in: {root_out}")
 
 # -------------------------
 # Main
 # -------------------------
-def main():
-    # Load master courses from hardcoded divisions
-    df_courses = load_courses(divisions)
+def main(export_formats=(), enrollments_file=None, unavailability_file=None, max_per_day=None, back_to_back=None, workers=8, overnight=None):
+    # Load master courses from hardcoded divisions, plus rooms and invigilators (concurrently)
+    df_courses, rooms_df, inv_df = load_inputs(divisions, rooms_path, invig_path, workers)
     if df_courses.empty:
         print("No courses found. Exiting.")
         return
+    enrollments_file = enrollments_file or enrollments_path
+    enrollments = enrollment_matrix(read_enrollments(enrollments_file)) if enrollments_file else None
 
     first_half_df, second_half_df = split_half(df_courses)
 
-    # Load rooms and invigilators
-    rooms_df = pd.read_excel(rooms_path, engine="openpyxl")
-    rooms_df.columns = [str(c).strip() for c in rooms_df.columns]
     if "Room" not in rooms_df.columns or "Seating Capacity" not in rooms_df.columns:
         raise ValueError("Rooms file must contain 'Room' and 'Seating Capacity' columns")
 
-    inv_df = pd.read_excel(invig_path, engine="openpyxl", dtype=str)
-    inv_df.columns = [str(c).strip() for c in inv_df.columns]
     if inv_df.shape[1] < 1:
         raise ValueError("Invigilator file must have at least one column (NUMBER). Preferably two: NUMBER and NAME.")
     # Keep first two columns as provided
@@ -653,18 +1238,41 @@ def main():
     else:
         inv_copy_df.columns = [inv_copy_df.columns[0], inv_copy_df.columns[1]]
 
+    # One invigilator scheduler for both halves, so duties balance over the whole exam period
+    keys = invigilator_keys(inv_copy_df)
+    unavailability_file = unavailability_file or unavailability_path
+    invigilators = InvigilatorScheduler(keys, max_duties_per_day if max_per_day is None else max_per_day,
+                                        no_back_to_back if back_to_back is None else not back_to_back,
+                                        read_unavailability(unavailability_file, keys) if unavailability_file else None,
+                                        no_back_to_back_overnight if overnight is None else overnight)
+
     # Create EXAM_OUTPUT root
     Path("EXAM_OUTPUT").mkdir(exist_ok=True)
 
     # Run FIRSTHALF
     print("\n=== Generating FIRSTHALF ===")
-    run_half("FIRSTHALF", first_half_df, rooms_df, inv_copy_df)
+    run_half("FIRSTHALF", first_half_df, rooms_df, inv_copy_df, export_formats, enrollments, invigilators, workers)
 
     # Run SECONDHALF
     print("\n=== Generating SECONDHALF ===")
-    run_half("SECONDHALF", second_half_df, rooms_df, inv_copy_df)
+    run_half("SECONDHALF", second_half_df, rooms_df, inv_copy_df, export_formats, enrollments, invigilators, workers)
 
+    duty = invigilators.summary()
+    print(f"\nInvigilator duties: {duty['duties']} over {duty['invigilators']} invigilators, {duty['min']}-{duty['max']} each")
     print("\nAll done. Check EXAM_OUTPUT/FIRSTHALF and EXAM_OUTPUT/SECONDHALF for results.")
 
 if __name__ == "__main__":
-    main()
+    import argparse
+    ap = argparse.ArgumentParser(description="Exam timetable, seating and invigilator generator")
+    ap.add_argument("--export", nargs="+", default=[], choices=["json", "csv", "parquet"],
+                    help="also write exam slots, seats and invigilator duties as tables in each half's folder")
+    ap.add_argument("--enrollments", default=None,
+                    help="roll-number enrollments (ROLL NUMBER, COURSE CODE columns; .xlsx, .csv, .json or .parquet) for student-level clashes")
+    ap.add_argument("--unavailability", default=None,
+                    help="invigilator unavailability (INVIGILATOR, DAY, optional SESSION and HALF columns)")
+    ap.add_argument("--max-duties-per-day", type=int, default=None, help=f"invigilator duties per exam day (default {max_duties_per_day})")
+    ap.add_argument("--allow-back-to-back", action="store_true", default=None, help="allow duties in consecutive sessions")
+    ap.add_argument("--no-back-to-back-overnight", action="store_true", default=None, help="also keep an AN duty and the next day's FN apart")
+    ap.add_argument("--workers", type=int, default=8, help="processes for reading inputs and writing the Day_N.xlsx files (1 = none)")
+    args = ap.parse_args()
+    main(args.export, args.enrollments, args.unavailability, args.max_duties_per_day, args.allow_back_to_back, args.workers, args.no_back_to_back_overnight)
@@ -0,0 +1,66 @@
+# Parsed-input cache shared by main.py and exam.py
+import os
+import json
+import pickle
+import hashlib
+
+# bump when the parsing code changes shape, so old entries are rebuilt
+CACHE_VERSION = 1
+CACHE_DIR = ".input_cache"
+
+# -------------------------
+# Keys
+# -------------------------
+def file_digest(path, chunk_size=1 << 20):
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+def cache_key(kind, digest, params):
+    # params: the settings fields / arguments the parser reads (must be JSON-serializable)
+    raw = json.dumps([CACHE_VERSION, kind, digest, params], sort_keys=True, default=str)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+def entry_path(kind, path, cache_dir):
+    # one entry per (kind, source file): a rebuild overwrites it, so stale entries never pile up
+    name = hashlib.md5(os.path.abspath(path).encode("utf-8")).hexdigest()[:16]
+    return os.path.join(cache_dir, f"{kind}_{name}.pkl")
+
+# -------------------------
+# Load / store
+# -------------------------
+def cache_lookup(kind, path, params, cache_dir=None):
+    # stored value for an unchanged file & params, else None (lets callers send only misses to a pool).
+    # Entries are unpickled, which can run code: the cache directory must only hold files this tool wrote.
+    try:
+        key = cache_key(kind, file_digest(path), params)
+        with open(entry_path(kind, path, cache_dir or CACHE_DIR), "rb") as f:
+            entry = pickle.load(f)
+    except Exception:
+        return None
+    if isinstance(entry, dict) and entry.get("key") == key:
+        return entry["value"]
+    return None
+
+def cached_parse(kind, path, params, build, cache_dir=None, enabled=True):
+    # build() parses the file; its result is reused while the file bytes and params are unchanged
+    if not enabled:
+        return build()
+    cache_dir = cache_dir or CACHE_DIR
+    value = cache_lookup(kind, path, params, cache_dir)
+    if value is not None:
+        return value
+    value = build()
+    try:
+        key = cache_key(kind, file_digest(path), params)
+        fpath = entry_path(kind, path, cache_dir)
+        os.makedirs(cache_dir, exist_ok=True)
+        tmp = f"{fpath}.{os.getpid()}.tmp"
+        with open(tmp, "wb") as f:
+            pickle.dump({"key": key, "value": value}, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, fpath)
+    except Exception:
+        pass
+    return value
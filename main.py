@@ -1,14 +1,27 @@
 import os
+import sys
+import glob
 import math
 import json
 import random
-import copy
+import time
+import bisect
+import heapq
+import hashlib
+import multiprocessing
+from contextlib import contextmanager, nullcontext
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor, as_completed, wait, FIRST_COMPLETED
 import pandas as pd
-from collections import defaultdict
+from collections import defaultdict, namedtuple
 from math import gcd
-from openpyxl import Workbook
+from openpyxl import Workbook, load_workbook
 from openpyxl.styles import PatternFill, Alignment, Font
 from openpyxl.utils import get_column_letter
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.worksheet.cell_range import CellRange
+from table_export import write_tables, read_table
+from input_cache import cached_parse, cache_lookup
 
 # ----------------------------
 # Settings loader
@@ -28,6 +41,10 @@ def load_settings(path="settings.json"):
             data = DEFAULT
     else:
         data = DEFAULT
+    return normalize_settings(data)
+
+def normalize_settings(data):
+    # "HH:MM-HH:MM" break strings -> (start, end) pairs; shared by settings.json and sweep variants
     breaks = []
     for b in data.get("break_slots", []):
         if isinstance(b, str) and "-" in b:
@@ -192,10 +209,655 @@ def build_slot_requests_for_division(df, div_fullname, settings):
 def kind_upper(x):
     return x.upper()
 
+# ----------------------------
+# Interval helpers (integer minutes, half-open [start, end) intervals)
+# ----------------------------
+def union_intervals(intervals):
+    merged = []
+    for s, e in sorted(intervals):
+        if e <= s:
+            continue
+        if merged and s <= merged[-1][1]:
+            if e > merged[-1][1]:
+                merged[-1][1] = e
+        else:
+            merged.append([s, e])
+    return [(s, e) for s, e in merged]
+
+def complement_intervals(blocked, lo, hi):
+    # blocked must be sorted & merged (output of union_intervals)
+    free = []
+    cur = lo
+    for s, e in blocked:
+        if e <= cur:
+            continue
+        if s >= hi:
+            break
+        if s > cur:
+            free.append((cur, s))
+        cur = max(cur, e)
+    if cur < hi:
+        free.append((cur, hi))
+    return free
+
+def intersect_intervals(a, b):
+    out = []
+    i = j = 0
+    while i < len(a) and j < len(b):
+        s = max(a[i][0], b[j][0]); e = min(a[i][1], b[j][1])
+        if s < e:
+            out.append((s, e))
+        if a[i][1] < b[j][1]:
+            i += 1
+        else:
+            j += 1
+    return out
+
+def count_grid_points(intervals, origin, step):
+    # number of origin + k*step (k >= 0) inside the sorted, disjoint intervals
+    total = 0
+    for s, e in intervals:
+        k0 = max(0, -(-(s - origin) // step))
+        k1 = -(-(e - origin) // step)
+        total += max(0, k1 - k0)
+    return total
+
+def first_grid_point(intervals, origin, step):
+    # smallest origin + k*step (k >= 0) lying inside any of the sorted intervals
+    for s, e in intervals:
+        k = max(0, -(-(s - origin) // step))
+        g = origin + k * step
+        if g < e:
+            return g
+    return None
+
+# ----------------------------
+# Occupancy index: sorted busy lists per (day, division / person / room)
+# ----------------------------
+class OccupancyIndex:
+    def __init__(self, days, interval_times, base_interval, wh_end, break_ranges, min_gap_minutes, faculty_gap_minutes):
+        self.days = days
+        self.origin = interval_times[0] if interval_times else 0
+        self.grid_end = (interval_times[-1] + 1) if interval_times else 0
+        self.step = base_interval
+        self.wh_end = wh_end
+        self.break_ranges = break_ranges
+        self.min_gap = min_gap_minutes
+        self.faculty_gap = faculty_gap_minutes
+        self.div_busy = defaultdict(list)     # (day, div) -> sorted [(start, end)]
+        self.person_busy = defaultdict(list)  # (day, person) -> sorted [(start, end)]
+        self.room_busy = defaultdict(list)    # (day, room) -> sorted [(start, end)]
+        self.course_days = defaultdict(list)  # (day, div, group_id) -> [(kind, start)]
+        self.interval_times = interval_times
+        self.profile = None  # ScheduleProfile when instrumentation is on
+
+    def busy_intervals(self, table, entity, day):
+        busy = {"div": self.div_busy, "person": self.person_busy, "room": self.room_busy}[table]
+        return busy.get((day, entity), ())
+
+    def add(self, divs, people, rooms, day, start, end, group_id=None, kind=None):
+        for d in divs:
+            bisect.insort(self.div_busy[(day, d)], (start, end))
+            if group_id is not None:
+                self.course_days[(day, d, group_id)].append((kind, start))
+        for p in people:
+            bisect.insort(self.person_busy[(day, p)], (start, end))
+        for r in rooms:
+            bisect.insort(self.room_busy[(day, r)], (start, end))
+
+    def remove(self, divs, people, rooms, day, start, end, group_id=None, kind=None):
+        for d in divs:
+            self.div_busy[(day, d)].remove((start, end))
+            if group_id is not None:
+                self.course_days[(day, d, group_id)].remove((kind, start))
+        for p in people:
+            self.person_busy[(day, p)].remove((start, end))
+        for r in rooms:
+            self.room_busy[(day, r)].remove((start, end))
+
+    def course_bounds(self, divs, day, group_id, kind):
+        # same-course/day rules as start bounds: (blocked, lowest start, start must be below)
+        lo = None; hi = None
+        if group_id is None:
+            return False, lo, hi
+        for d in divs:
+            for ex_kind, ex_start in self.course_days.get((day, d, group_id), []):
+                if ex_kind == kind or "tut" in (ex_kind, kind):
+                    return True, lo, hi
+                if kind == "lab" and ex_kind == "lec":
+                    lo = ex_start + 1 if lo is None else max(lo, ex_start + 1)
+                elif kind == "lec" and ex_kind == "lab":
+                    hi = ex_start if hi is None else min(hi, ex_start)
+        return False, lo, hi
+
+    def is_free(self, divs, people, rooms, day, start_min, duration_min, group_id=None, kind=None):
+        # exact check of one start time (no grid alignment / shift), e.g. a remembered placement
+        if self.profile is not None:
+            self.profile.count("exact_checks")
+        end_min = start_min + duration_min
+        if start_min < self.origin or end_min > self.wh_end:
+            return False
+        for bs, be in self.break_ranges:
+            if start_min < be and end_min > bs:
+                return False
+        blocked, lo, hi = self.course_bounds(divs, day, group_id, kind)
+        if blocked or (lo is not None and start_min < lo) or (hi is not None and start_min >= hi):
+            return False
+        for d in divs:
+            for s, e in self.div_busy.get((day, d), ()):
+                if start_min < e and end_min > s:
+                    return False
+        for r in rooms:
+            for s, e in self.room_busy.get((day, r), ()):
+                if start_min < e and end_min > s:
+                    return False
+        for p in people:
+            for s, e in self.person_busy.get((day, p), ()):
+                if not (end_min + self.faculty_gap <= s or start_min >= e + self.faculty_gap):
+                    return False
+        return True
+
+    def _start_windows(self, divs, people, rooms, day, duration_min, group_id=None, kind=None):
+        # (direct, shifted) interval lists holding the accepted grid candidates, None when blocked
+        profile = self.profile
+        blocked, lo, hi = self.course_bounds(divs, day, group_id, kind)
+        D = duration_min
+        g = self.faculty_gap
+        hours = (self.origin, min(self.grid_end, self.wh_end - D + 1))
+        if blocked or hours[1] <= hours[0]:
+            if profile is not None:
+                self._count_rejections(D, hours, None, blocked, lo, hi, [], [], [], None)
+            return None
+        break_block = [(bs - D + 1, be) for bs, be in self.break_ranges]
+        base_free = complement_intervals(union_intervals(break_block), hours[0], hours[1])
+        if not base_free:
+            if profile is not None:
+                self._count_rejections(D, hours, base_free, blocked, lo, hi, [], [], [], None)
+            return None
+        busy_block = list(break_block)
+        shift_zones = []
+        zone_len = max(self.min_gap, 1)
+        for d in divs:
+            for s, e in self.div_busy.get((day, d), ()):
+                busy_block.append((s - D + 1, e))
+                shift_zones.append((e, e + zone_len))
+        n_div = len(busy_block)
+        for r in rooms:
+            for s, e in self.room_busy.get((day, r), ()):
+                busy_block.append((s - D + 1, e))
+        n_room = len(busy_block)
+        for p in people:
+            for s, e in self.person_busy.get((day, p), ()):
+                busy_block.append((s - D - g + 1, e + g))
+        free = complement_intervals(union_intervals(busy_block), hours[0], self.wh_end - D + 1)
+        break_free = base_free
+        if hi is not None:
+            free = intersect_intervals(free, [(hours[0], hi)])
+        if lo is not None:
+            base_free = intersect_intervals(base_free, [(lo, hours[1])])
+        zones = union_intervals(shift_zones)
+        # unshifted: cand itself is free and no division block ends within min_gap before it
+        direct = intersect_intervals(intersect_intervals(free, base_free), complement_intervals(zones, hours[0], hours[1]))
+        # shifted: cand sits in a shift zone, cand + min_gap must be free
+        free_back = [(s - self.min_gap, e - self.min_gap) for s, e in free]
+        shifted = intersect_intervals(intersect_intervals(zones, base_free), free_back)
+        if profile is not None:
+            k = len(break_block)
+            self._count_rejections(D, hours, break_free, blocked, lo, hi, busy_block[k:n_div], busy_block[n_div:n_room], busy_block[n_room:], (direct, shifted))
+        return direct, shifted
+
+    def _count_rejections(self, D, hours, base_free, blocked, lo, hi, div_block, room_block, person_block, windows):
+        # Profiling only: fold the blocked intervals of one window query back in check order and
+        # charge each grid candidate to the first check that removes it.
+        profile = self.profile
+        t0 = time.perf_counter()
+        g = self.faculty_gap
+        profile.count("feasibility_queries")
+        profile.count("candidates_evaluated", len(self.interval_times))
+        profile.count("conflict_checks", len(div_block) + len(room_block) + len(person_block))
+        avail = [hours] if hours[1] > hours[0] else []
+        left = count_grid_points(avail, self.origin, self.step)
+        profile.rejections["working_hours"] += len(self.interval_times) - left
+        if base_free is None:
+            base_free = complement_intervals(union_intervals([(bs - D + 1, be) for bs, be in self.break_ranges]), hours[0], hours[1])
+        stages = [("break", base_free)]
+        if blocked:
+            stages.append(("same_course", []))
+        elif lo is not None or hi is not None:
+            stages.append(("same_course", [(hours[0] if lo is None else lo, hours[1] if hi is None else hi)]))
+        for reason, block in (("division_overlap", div_block), ("room_overlap", room_block),
+                              ("person_overlap", [(s + g, e - g) for s, e in person_block]), ("faculty_gap", person_block)):
+            if block:
+                stages.append((reason, complement_intervals(union_intervals(block), hours[0], hours[1])))
+        for reason, allowed in stages:
+            if not left:
+                break
+            avail = intersect_intervals(avail, allowed)
+            n = count_grid_points(avail, self.origin, self.step)
+            profile.rejections[reason] += left - n
+            left = n
+        if windows is not None:
+            profile.count("starts_accepted", sum(count_grid_points(w, self.origin, self.step) for w in windows))
+        profile.overhead(time.perf_counter() - t0)
+
+    def earliest_start(self, divs, people, rooms, day, duration_min, group_id=None, kind=None):
+        # Earliest grid start (with the min-gap shift rule applied) that clears breaks, divisions,
+        # rooms and the faculty gap; None when the day has no room for the block.
+        windows = self._start_windows(divs, people, rooms, day, duration_min, group_id, kind)
+        if windows is None:
+            return None
+        direct, shifted = windows
+        best = first_grid_point(direct, self.origin, self.step)
+        cand = first_grid_point(shifted, self.origin, self.step)
+        if cand is not None and (best is None or cand < best):
+            return cand + self.min_gap
+        return best
+
+    def count_starts(self, divs, people, rooms, days, duration_min, group_id=None, kind=None):
+        # number of grid candidates over the given days that earliest_start would accept
+        total = 0
+        for day in days:
+            windows = self._start_windows(divs, people, rooms, day, duration_min, group_id, kind)
+            if windows is not None:
+                total += sum(count_grid_points(w, self.origin, self.step) for w in windows)
+        return total
+
+    def first_start(self, divs, people, rooms, days, duration_min, group_id=None, kind=None):
+        # first (day, start) over days in the given order; None when no day has room
+        for day in days:
+            start_min = self.earliest_start(divs, people, rooms, day, duration_min, group_id, kind)
+            if start_min is not None:
+                return day, start_min
+        return None
+
+# ----------------------------
+# Bitmask occupancy (NumPy): entity x day x minute-bucket arrays, every day evaluated at once
+# (slower than OccupancyIndex at every benchmarked size; kept as a cross-check of its answers)
+# ----------------------------
+class BitmaskOccupancy:
+    # Same rules and answers as OccupancyIndex. Busy time is kept as per-bucket occupancy counts
+    # (a count rather than a bool so overlapping removes stay exact); a bucket is the gcd of every
+    # duration, gap, break and grid time, so bucket arithmetic is exact for aligned placements.
+    def __init__(self, days, interval_times, base_interval, wh_end, break_ranges, min_gap_minutes, faculty_gap_minutes,
+                 bucket_minutes, n_divs, n_people, n_rooms):
+        self.days = days
+        self.day_pos = {d: i for i, d in enumerate(days)}
+        self.origin = interval_times[0] if interval_times else 0
+        self.bucket = bucket_minutes
+        self.wh_end = wh_end
+        self.break_ranges = break_ranges
+        self.min_gap = min_gap_minutes
+        self.faculty_gap = faculty_gap_minutes
+        b = bucket_minutes
+        self.n_buckets = max(0, (wh_end - self.origin) // b)
+        self.step_b = max(1, base_interval // b)
+        # last grid start (interval_times[-1]) in buckets
+        self.grid_last = ((interval_times[-1] - self.origin) // b) if interval_times else -1
+        self.gap_b = -(-faculty_gap_minutes // b)
+        self.shift_b = min_gap_minutes // b
+        self.zone_b = max(-(-min_gap_minutes // b), 1)
+        shape = (len(days), self.n_buckets)
+        self.div_busy = np.zeros((n_divs,) + shape, dtype=np.int16)
+        self.person_busy = np.zeros((n_people,) + shape, dtype=np.int16)
+        self.room_busy = np.zeros((n_rooms,) + shape, dtype=np.int16)
+        # division block ends (bucket of end_min) for the min-gap shift zones
+        self.div_ends = np.zeros((n_divs, len(days), self.n_buckets + 1), dtype=np.int16)
+        self.course_days = defaultdict(list)  # (day, div, group_id) -> [(kind, start)]
+        self.interval_times = interval_times
+        self.profile = None  # ScheduleProfile when instrumentation is on
+        breaks = np.zeros(self.n_buckets, dtype=np.int16)
+        for bs, be in break_ranges:
+            i0, i1 = self._span(bs, be)
+            breaks[i0:i1] = 1
+        self.break_cs = np.concatenate(([0], np.cumsum(breaks)))
+
+    def _span(self, start, end):
+        # covering bucket range [i0, i1), clamped to the working day
+        i0 = (start - self.origin) // self.bucket
+        i1 = -(-(end - self.origin) // self.bucket)
+        return min(max(i0, 0), self.n_buckets), min(max(i1, 0), self.n_buckets)
+
+    def _mark(self, divs, people, rooms, day, start, end, delta):
+        t = self.day_pos[day]
+        i0, i1 = self._span(start, end)
+        for d in divs:
+            self.div_busy[d, t, i0:i1] += delta
+            self.div_ends[d, t, i1] += delta
+        for p in people:
+            self.person_busy[p, t, i0:i1] += delta
+        for r in rooms:
+            self.room_busy[r, t, i0:i1] += delta
+
+    def add(self, divs, people, rooms, day, start, end, group_id=None, kind=None):
+        self._mark(divs, people, rooms, day, start, end, 1)
+        if group_id is not None:
+            for d in divs:
+                self.course_days[(day, d, group_id)].append((kind, start))
+
+    def remove(self, divs, people, rooms, day, start, end, group_id=None, kind=None):
+        self._mark(divs, people, rooms, day, start, end, -1)
+        if group_id is not None:
+            for d in divs:
+                self.course_days[(day, d, group_id)].remove((kind, start))
+
+    course_bounds = OccupancyIndex.course_bounds
+
+    def busy_intervals(self, table, entity, day):
+        # runs of occupied buckets as (start, end) minutes (touching blocks come back as one run)
+        busy = {"div": self.div_busy, "person": self.person_busy, "room": self.room_busy}[table]
+        if entity >= busy.shape[0]:
+            return ()
+        edges = np.diff(np.concatenate(([0], (busy[entity, self.day_pos[day]] > 0).astype(np.int8), [0])))
+        starts = np.flatnonzero(edges == 1); ends = np.flatnonzero(edges == -1)
+        return [(self.origin + int(a) * self.bucket, self.origin + int(b) * self.bucket) for a, b in zip(starts, ends)]
+
+    def _windows(self, divs, people, rooms, duration_b):
+        # busy-bucket counts over each start's window, all days at once: (division/room, person+gap, break)
+        n = self.n_buckets
+        days = len(self.days)
+        hard = np.zeros((days, n), dtype=np.int32)
+        if len(divs):
+            hard += self.div_busy[list(divs)].sum(axis=0)
+        if len(rooms):
+            hard += self.room_busy[list(rooms)].sum(axis=0)
+        person = self.person_busy[list(people)].sum(axis=0, dtype=np.int32) if len(people) else np.zeros((days, n), dtype=np.int32)
+        zero = np.zeros((days, 1), dtype=np.int32)
+        hard_cs = np.concatenate((zero, np.cumsum(hard, axis=1)), axis=1)
+        person_cs = np.concatenate((zero, np.cumsum(person, axis=1)), axis=1)
+        starts = np.arange(n - duration_b + 1)
+        ends = starts + duration_b
+        hard_win = hard_cs[:, ends] - hard_cs[:, starts]
+        g = self.gap_b
+        person_win = person_cs[:, np.minimum(ends + g, n)] - person_cs[:, np.maximum(starts - g, 0)]
+        break_win = self.break_cs[ends] - self.break_cs[starts]
+        return hard_win, person_win, break_win
+
+    def _start_masks(self, divs, people, rooms, duration_min, group_id, kind, day_list):
+        # (grid bucket offsets, direct, shifted): boolean (day, grid candidate) masks of accepted starts, or None
+        b = self.bucket
+        duration_b = -(-duration_min // b)
+        if duration_b > self.n_buckets or self.grid_last < 0:
+            if self.profile is not None:
+                self._count_rejections(divs, people, rooms, duration_b, group_id, kind, day_list, None, None)
+            return None
+        hard_win, person_win, break_win = self._windows(divs, people, rooms, duration_b)
+        n_starts = hard_win.shape[1]
+        rows = [self.day_pos[d] for d in day_list]
+        free = (hard_win[rows] == 0) & (person_win[rows] == 0) & (break_win == 0)
+        base = np.broadcast_to(break_win == 0, free.shape).copy()
+        base[:, min(self.grid_last, n_starts - 1) + 1:] = False
+        for k, day in enumerate(day_list):
+            blocked, lo, hi = self.course_bounds(divs, day, group_id, kind)
+            if blocked:
+                free[k] = False; base[k] = False
+                continue
+            if hi is not None:
+                free[k, max(0, -(-(hi - self.origin) // b)):] = False
+            if lo is not None:
+                base[k, :max(0, -(-(lo - self.origin) // b))] = False
+        # zone: a division block ends within min_gap before the start (start is pushed past the gap)
+        if len(divs):
+            ends = self.div_ends[list(divs)][:, rows].sum(axis=0, dtype=np.int32)
+            ends_cs = np.concatenate((np.zeros((len(rows), 1), dtype=np.int32), np.cumsum(ends, axis=1)), axis=1)
+            idx = np.arange(n_starts)
+            zone = (ends_cs[:, idx + 1] - ends_cs[:, np.maximum(idx + 1 - self.zone_b, 0)]) > 0
+        else:
+            zone = np.zeros(free.shape, dtype=bool)
+        grid = np.arange(0, n_starts, self.step_b)
+        direct = free[:, grid] & base[:, grid] & ~zone[:, grid]
+        shifted_pos = grid + self.shift_b
+        ok = shifted_pos < n_starts
+        shifted = np.zeros_like(direct)
+        shifted[:, ok] = zone[:, grid[ok]] & base[:, grid[ok]] & free[:, shifted_pos[ok]]
+        if self.profile is not None:
+            self._count_rejections(divs, people, rooms, duration_b, group_id, kind, day_list, (hard_win[rows], person_win[rows], break_win), (grid, direct, shifted))
+        return grid, direct, shifted
+
+    def _count_rejections(self, divs, people, rooms, duration_b, group_id, kind, day_list, windows, masks):
+        # Profiling only: apply the window masks of one query in check order and charge each
+        # grid candidate to the first mask that clears it.
+        profile = self.profile
+        t0 = time.perf_counter()
+        rows = [self.day_pos[d] for d in day_list]
+        total = len(self.interval_times) * len(rows)
+        profile.count("feasibility_queries", len(rows))
+        profile.count("candidates_evaluated", total)
+        profile.count("conflict_checks", (len(divs) + len(rooms) + len(people)) * len(rows))
+        if masks is None:
+            profile.rejections["working_hours"] += total
+            profile.overhead(time.perf_counter() - t0)
+            return
+        hard_win, person_win, break_win = windows
+        grid, direct, shifted = masks
+        zero = np.zeros((len(rows), 1), dtype=np.int32)
+
+        def overlap(busy, ids):
+            if not len(ids):
+                return np.zeros((len(rows), len(grid)), dtype=np.int32)
+            cs = np.concatenate((zero, np.cumsum(busy[list(ids)][:, rows].sum(axis=0, dtype=np.int32), axis=1)), axis=1)
+            return cs[:, grid + duration_b] - cs[:, grid]
+
+        avail = np.broadcast_to(grid <= self.grid_last, direct.shape).copy()
+        left = int(avail.sum())
+        profile.rejections["working_hours"] += total - left
+        course = np.ones(direct.shape, dtype=bool)
+        starts = self.origin + grid * self.bucket
+        for k, day in enumerate(day_list):
+            blocked, lo, hi = self.course_bounds(divs, day, group_id, kind)
+            if blocked:
+                course[k] = False
+                continue
+            if lo is not None:
+                course[k] &= starts >= lo
+            if hi is not None:
+                course[k] &= starts < hi
+        stages = [
+            ("break", break_win[grid] == 0),
+            ("same_course", course),
+            ("division_overlap", overlap(self.div_busy, divs) == 0),
+            ("room_overlap", hard_win[:, grid] == 0),
+            ("person_overlap", overlap(self.person_busy, people) == 0),
+            ("faculty_gap", person_win[:, grid] == 0),
+        ]
+        for reason, ok in stages:
+            avail &= ok
+            n = int(avail.sum())
+            profile.rejections[reason] += left - n
+            left = n
+        profile.count("starts_accepted", int(direct.sum()) + int(shifted.sum()))
+        profile.overhead(time.perf_counter() - t0)
+
+    def _starts(self, divs, people, rooms, duration_min, group_id, kind, day_list):
+        # per requested day: earliest effective start in minutes, or None
+        b = self.bucket
+        out = [None] * len(day_list)
+        masks = self._start_masks(divs, people, rooms, duration_min, group_id, kind, day_list)
+        if masks is None:
+            return out
+        grid, direct, shifted = masks
+        for k in range(len(day_list)):
+            d_hits = np.flatnonzero(direct[k])
+            s_hits = np.flatnonzero(shifted[k])
+            if len(s_hits) and (not len(d_hits) or s_hits[0] < d_hits[0]):
+                out[k] = self.origin + int(grid[s_hits[0]]) * b + self.min_gap
+            elif len(d_hits):
+                out[k] = self.origin + int(grid[d_hits[0]]) * b
+        return out
+
+    def earliest_start(self, divs, people, rooms, day, duration_min, group_id=None, kind=None):
+        return self._starts(divs, people, rooms, duration_min, group_id, kind, [day])[0]
+
+    def count_starts(self, divs, people, rooms, days, duration_min, group_id=None, kind=None):
+        masks = self._start_masks(divs, people, rooms, duration_min, group_id, kind, list(days))
+        if masks is None:
+            return 0
+        return int(masks[1].sum()) + int(masks[2].sum())
+
+    def first_start(self, divs, people, rooms, days, duration_min, group_id=None, kind=None):
+        for day, start_min in zip(days, self._starts(divs, people, rooms, duration_min, group_id, kind, list(days))):
+            if start_min is not None:
+                return day, start_min
+        return None
+
+    def is_free(self, divs, people, rooms, day, start_min, duration_min, group_id=None, kind=None):
+        if self.profile is not None:
+            self.profile.count("exact_checks")
+        end_min = start_min + duration_min
+        if start_min < self.origin or end_min > self.wh_end:
+            return False
+        for bs, be in self.break_ranges:
+            if start_min < be and end_min > bs:
+                return False
+        blocked, lo, hi = self.course_bounds(divs, day, group_id, kind)
+        if blocked or (lo is not None and start_min < lo) or (hi is not None and start_min >= hi):
+            return False
+        t = self.day_pos[day]
+        i0, i1 = self._span(start_min, end_min)
+        if len(divs) and self.div_busy[list(divs), t, i0:i1].any():
+            return False
+        if len(rooms) and self.room_busy[list(rooms), t, i0:i1].any():
+            return False
+        g0, g1 = self._span(start_min - self.faculty_gap, end_min + self.faculty_gap)
+        if len(people) and self.person_busy[list(people), t, g0:g1].any():
+            return False
+        return True
+
+# ----------------------------
+# Instrumentation (opt-in): phase timers, feasibility counters, rejection reasons
+# ----------------------------
+REJECTION_REASONS = ["working_hours", "break", "same_course", "division_overlap", "room_overlap", "person_overlap", "faculty_gap"]
+PROFILE_COUNTERS = ["feasibility_queries", "candidates_evaluated", "conflict_checks", "starts_accepted", "exact_checks"]
+
+def start_conflicts(occ, divs, people, rooms, day, cand, duration_min, group_id=None, kind=None, first_only=False):
+    # (effective start, [(reason, blocking entity or None)]) for grid start cand; the list is empty when it fits.
+    # Mirrors earliest_start: a division block ending within min_gap before cand pushes the start past the gap.
+    # Working-hours / break / same-course conflicts end the list (no entity could free that start).
+    zone_len = max(occ.min_gap, 1)
+    start = cand
+    for d in divs:
+        if any(e <= cand < e + zone_len for _, e in occ.busy_intervals("div", d, day)):
+            start = cand + occ.min_gap
+            break
+    end = start + duration_min
+    if cand < occ.origin or end > occ.wh_end:
+        return start, [("working_hours", None)]
+    for bs, be in occ.break_ranges:
+        if (cand < be and cand + duration_min > bs) or (start < be and end > bs):
+            return start, [("break", None)]
+    blocked, lo, hi = occ.course_bounds(divs, day, group_id, kind)
+    if blocked or (lo is not None and cand < lo) or (hi is not None and start >= hi):
+        return start, [("same_course", group_id)]
+    conflicts = []
+    for d in divs:
+        if any(start < e and end > s for s, e in occ.busy_intervals("div", d, day)):
+            conflicts.append(("division_overlap", d))
+            if first_only:
+                return start, conflicts
+    for r in rooms:
+        if any(start < e and end > s for s, e in occ.busy_intervals("room", r, day)):
+            conflicts.append(("room_overlap", r))
+            if first_only:
+                return start, conflicts
+    gap = occ.faculty_gap
+    for p in people:
+        busy = occ.busy_intervals("person", p, day)
+        if any(start < e and end > s for s, e in busy):
+            conflicts.append(("person_overlap", p))
+        elif any(not (end + gap <= s or start >= e + gap) for s, e in busy):
+            conflicts.append(("faculty_gap", p))
+        else:
+            continue
+        if first_only:
+            return start, conflicts
+    return start, conflicts
+
+class ScheduleProfile:
+    # Wall time per phase plus counters, fed from the occupancy backends' own window queries
+    def __init__(self):
+        self.phases = defaultdict(list)    # phase -> [seconds]
+        self.counters = defaultdict(int)
+        self.rejections = defaultdict(int)
+        self.attempts = []                 # [{"run", "attempt", "seconds", "unscheduled"}]
+        self.runs = 0                      # schedule_globally calls seen so far
+        self.overhead_seconds = 0.0        # counting time, kept out of the enclosing phases
+
+    @contextmanager
+    def phase(self, name):
+        t0 = time.perf_counter()
+        o0 = self.overhead_seconds
+        try:
+            yield
+        finally:
+            self.phases[name].append(time.perf_counter() - t0 - (self.overhead_seconds - o0))
+
+    def overhead(self, seconds):
+        # time spent counting inside a feasibility query, reported as its own "instrumentation" phase
+        self.overhead_seconds += seconds
+        self.phases["instrumentation"].append(seconds)
+
+    def count(self, name, n=1):
+        self.counters[name] += n
+
+    def end_run(self):
+        # tag the attempts recorded since the last call with this schedule_globally run number
+        self.runs += 1
+        for a in self.attempts:
+            a.setdefault("run", self.runs)
+
+    def merge(self, data):
+        # fold in to_dict() output from a worker process
+        for name, samples in data.get("samples", {}).items():
+            self.phases[name].extend(samples)
+        for name, n in data.get("counters", {}).items():
+            self.counters[name] += n
+        for reason, n in data.get("rejections", {}).items():
+            self.rejections[reason] += n
+        self.attempts.extend(data.get("attempts", []))
+
+    def to_dict(self):
+        return {
+            "phases": {name: {"calls": len(v), "total_seconds": round(sum(v), 6), "max_seconds": round(max(v), 6)} for name, v in self.phases.items() if v},
+            "samples": {name: list(v) for name, v in self.phases.items()},
+            "attempts": sorted(self.attempts, key=lambda a: (a.get("run", 0), a["attempt"])),
+            "counters": {**{name: 0 for name in PROFILE_COUNTERS}, **self.counters},
+            "rejections": {reason: self.rejections.get(reason, 0) for reason in REJECTION_REASONS},
+        }
+
+    def write(self, path):
+        report = self.to_dict()
+        report.pop("samples")
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with open(path, "w") as f:
+            json.dump(report, f, indent=2)
+
+def profile_phase(profile, name):
+    return profile.phase(name) if profile is not None else nullcontext()
+
 # ----------------------------
 # Scheduling engine (minute-accurate; dynamic gap insertion)
 # ----------------------------
-def schedule_globally(all_normals_per_div, all_baskets, settings, min_gap_minutes, faculty_gap_minutes, max_attempts=20):
+# Slot requests are interned once per run into compact records: divisions, people, rooms and
+# course groups become small integer ids, and merge groups / resources are resolved up front.
+# Attempts only shuffle lists of these records; placements point at them instead of copying dicts.
+SlotRecord = namedtuple("SlotRecord", [
+    "rid", "group_id", "gid", "div_id", "kind", "duration_min", "label", "slot_base",
+    "merge_ids", "people", "rooms", "source",
+])
+BasketRecord = namedtuple("BasketRecord", [
+    "key", "gid", "kind", "duration_min", "label", "slot_base",
+    "div_ids", "people", "rooms", "members",
+])
+# placements[division][day] = [Placement]; meta is the SlotRecord / BasketRecord that was placed
+Placement = namedtuple("Placement", ["start_min", "end_min", "label", "kind", "meta"])
+
+def intern_name(table, names, name):
+    idx = table.get(name)
+    if idx is None:
+        idx = table[name] = len(names)
+        names.append(name)
+    return idx
+
+def build_schedule_context(all_normals_per_div, all_baskets, settings, min_gap_minutes, faculty_gap_minutes):
     days = settings["working_days"]
     wh_start = time_to_minutes(settings["working_hours"][0])
     wh_end = time_to_minutes(settings["working_hours"][1])
@@ -217,9 +879,16 @@ def schedule_globally(all_normals_per_div, all_baskets, settings, min_gap_minute
         bs = time_to_minutes(bstart); be = time_to_minutes(bend)
         break_ranges.append((bs, be))
 
-    # Build master normal list and required counts per (group_id, division)
+    div_names = [safe_upper(div) for div in all_normals_per_div.keys()]
+    div_index = {name: i for i, name in enumerate(div_names)}
+    person_names, person_index = [], {}
+    room_names, room_index = [], {}
+    group_names, group_index = [], {}
+
+    # Build master normal list and required counts per (group, division)
     normal_list_master = []
-    required_per_div = defaultdict(int)
+    records = []
+    required = defaultdict(int)
     for div, slots in all_normals_per_div.items():
         div_up = safe_upper(div)
         for s in slots:
@@ -228,401 +897,1399 @@ def schedule_globally(all_normals_per_div, all_baskets, settings, min_gap_minute
             duration_hours = entry.get("_duration_hours", settings["slot_durations"].get(entry.get("kind"), 1.0))
             entry["_duration_min"] = max(1, int(round(duration_hours * 60)))
             normal_list_master.append(entry)
-            gid = entry.get("group_id")
-            required_per_div[(gid, div_up)] += 1
+            gid = intern_name(group_index, group_names, entry.get("group_id"))
+            required[(gid, div_index[div_up])] += 1
+            busy_people, rooms = slot_resources(entry)
+            records.append(SlotRecord(
+                rid=len(records),
+                group_id=entry.get("group_id"),
+                gid=gid,
+                div_id=div_index[div_up],
+                kind=entry.get("kind"),
+                duration_min=entry["_duration_min"],
+                label=entry.get("slot_label"),
+                slot_base=entry.get("slot_base"),
+                merge_ids=tuple(div_index[m] for m in resolve_merge_group(entry, div_names)),
+                people=frozenset(intern_name(person_index, person_names, p) for p in busy_people),
+                rooms=frozenset(intern_name(room_index, room_names, r) for r in rooms),
+                source=entry,
+            ))
 
     # Baskets -> synthetic gid
     baskets_master = {}
+    basket_records = []
     for b_key, members in all_baskets.items():
         if not members:
             continue
-        gid = f"BASKET__{b_key}"
+        key = f"BASKET__{b_key}"
+        gid = intern_name(group_index, group_names, key)
         processed_members = []
         for m in members:
             mcopy = m.copy()
             mcopy["division"] = safe_upper(mcopy.get("division", ""))
             mcopy["_duration_min"] = max(1, int(round(mcopy.get("_duration_hours", 1.0) * 60)))
             processed_members.append(mcopy)
-            required_per_div[(gid, mcopy["division"])] += 1
-        baskets_master[gid] = processed_members
+            if mcopy["division"] in div_index:
+                required[(gid, div_index[mcopy["division"]])] += 1
+        baskets_master[key] = processed_members
+        basket_divs, people, rooms, duration_min, kind, slot_base = basket_resources(dur_minutes, processed_members)
+        basket_records.append(BasketRecord(
+            key=key,
+            gid=gid,
+            kind=kind,
+            duration_min=duration_min,
+            label=f"{slot_base}-{kind.upper()}",
+            slot_base=slot_base,
+            div_ids=tuple(div_index[d] for d in basket_divs if d in div_index),
+            people=frozenset(intern_name(person_index, person_names, p) for p in people),
+            rooms=frozenset(intern_name(room_index, room_names, r) for r in rooms),
+            members=processed_members,
+        ))
+
+    # minute bucket for the bitmask backend: every start, end, gap and break lands on a bucket edge
+    origin = interval_times[0] if interval_times else wh_start
+    bucket_minutes = gcd_list([base_interval, wh_end - origin, min_gap_minutes, faculty_gap_minutes]
+                              + [abs(t - origin) for br in break_ranges for t in br]
+                              + [r.duration_min for r in records] + [r.duration_min for r in basket_records])
+
+    return {
+        "settings": settings,
+        "days": days,
+        "div_names": div_names,
+        "div_index": div_index,
+        "person_names": person_names,
+        "room_names": room_names,
+        "group_names": group_names,
+        "wh_end": wh_end,
+        "dur_minutes": dur_minutes,
+        "base_interval": base_interval,
+        "interval_times": interval_times,
+        "break_ranges": break_ranges,
+        "bucket_minutes": bucket_minutes,
+        "normal_list_master": normal_list_master,
+        "baskets_master": baskets_master,
+        "records": records,
+        "basket_records": basket_records,
+        "required": required,
+        "min_gap_minutes": min_gap_minutes,
+        "faculty_gap_minutes": faculty_gap_minutes,
+    }
 
-    # initialize best result
+def new_occupancy(ctx):
+    # settings "feasibility_backend": "intervals" (sorted busy lists, default) or "bitmask" (NumPy arrays)
+    args = (ctx["days"], ctx["interval_times"], ctx["base_interval"], ctx["wh_end"], ctx["break_ranges"], ctx["min_gap_minutes"], ctx["faculty_gap_minutes"])
+    if str(ctx["settings"].get("feasibility_backend", "intervals")).lower() == "bitmask":
+        occupancy = BitmaskOccupancy(*args, ctx["bucket_minutes"], len(ctx["div_names"]), len(ctx["person_names"]), len(ctx["room_names"]))
+    else:
+        occupancy = OccupancyIndex(*args)
+    occupancy.profile = ctx.get("profile")
+    return occupancy
+
+# Mutable per-attempt state: placements plus the occupancy index and placed counters behind them
+def new_schedule_state(ctx):
+    return {
+        "placements": {div: {d: [] for d in ctx["days"]} for div in ctx["div_names"]},
+        # busy time per division / person / room id for each day (conflict & faculty-gap checks)
+        "occupancy": new_occupancy(ctx),
+        "placed_counts": defaultdict(int),
+        "placed_baskets": set(),
+        # (division id, day) -> number of placements, for least-loaded-day ordering
+        "day_load": defaultdict(int),
+        # day -> placed blocks (one per placement call), so a block can be moved as a unit
+        "blocks_by_day": defaultdict(list),
+    }
+
+def resolve_merge_group(slot, div_names):
+    merge_group_raw = slot.get("merge_with", []) or []
+    if isinstance(merge_group_raw, str):
+        merge_group_raw = [m.strip() for m in merge_group_raw.split(",") if m.strip()]
+    merge_group = [safe_upper(m) for m in merge_group_raw if m]
+    if not merge_group:
+        merge_group = [slot["_division"]]
+    # resolve names (preserve placements keys)
+    resolved_merge = []
+    for m in merge_group:
+        if m in div_names:
+            resolved_merge.append(m)
+        else:
+            for pk in div_names:
+                if pk.replace(" ", "").upper() == m.replace(" ", "").upper():
+                    resolved_merge.append(pk)
+                    break
+    if not resolved_merge:
+        resolved_merge = [slot["_division"]]
+    return resolved_merge
+
+def slot_resources(slot):
+    busy_people = set(slot.get("faculty", []) or [])
+    if slot.get("kind") in ("lec", "tut"):
+        busy_people.update(slot.get("class_asst", []) or [])
+        rooms = set(slot.get("ROOM.NO", []) or [])
+    else:
+        busy_people.update(slot.get("lab_asst", []) or [])
+        rooms = set(slot.get("LAB ROOM.NO", []) or [])
+    return busy_people, rooms
+
+def basket_resources(dur_minutes, members):
+    # group members per division
+    div_to_members = defaultdict(list)
+    for m in members:
+        merge_group = m.get("merge_with", []) or [m.get("division", "")]
+        for div in merge_group:
+            div_up = safe_upper(div)
+            div_to_members[div_up].append(m)
+    basket_divs = list(div_to_members.keys())
+
+    combined_people = set()
+    combined_rooms = set()
+    max_duration_min = 0
+    kind = members[0].get("kind", "lec")
+    slot_base = members[0].get("slot_base", "")
+    for m in members:
+        combined_people.update(m.get("faculty", []) or [])
+        if kind in ("lec", "tut"):
+            combined_people.update(m.get("class_asst", []) or [])
+            combined_rooms.update(m.get("ROOM.NO", []) or [])
+        else:
+            combined_people.update(m.get("lab_asst", []) or [])
+            combined_rooms.update(m.get("LAB ROOM.NO", []) or [])
+        duration_min = m.get("_duration_min", dur_minutes.get(kind, 60))
+        max_duration_min = max(max_duration_min, duration_min)
+    return basket_divs, combined_people, combined_rooms, max_duration_min, kind, slot_base
+
+def _add_block(ctx, state, block, record, divs, day, start_min, end_min):
+    required = ctx["required"]
+    placed_counts = state["placed_counts"]
+    entry = Placement(start_min, end_min, record.label, record.kind, record)
+    for div_id in divs:
+        state["placements"][ctx["div_names"][div_id]][day].append(entry)
+        state["day_load"][(div_id, day)] += 1
+        key = (record.gid, div_id)
+        if placed_counts.get(key, 0) < required.get(key, 0):
+            placed_counts[key] += 1
+            block["counted"].append(key)
+    state["blocks_by_day"][day].append(block)
+    return block
+
+def mark_normal_placement(ctx, state, record, day, start_min, end_min, divs=None):
+    divs = tuple(divs) if divs is not None else record.merge_ids
+    block = {"basket": False, "record": record, "group_id": record.gid, "kind": record.kind, "divs": divs, "people": record.people, "rooms": record.rooms,
+             "day": day, "start_min": start_min, "end_min": end_min, "counted": []}
+    # mark division / person / room times
+    state["occupancy"].add(divs, record.people, record.rooms, day, start_min, end_min, record.gid, record.kind)
+    return _add_block(ctx, state, block, record, divs, day, start_min, end_min)
+
+def mark_basket_placement(ctx, state, record, day, start_min, end_min):
+    block = {"basket": True, "record": record, "group_id": record.gid, "kind": record.kind, "divs": record.div_ids, "people": record.people, "rooms": record.rooms,
+             "day": day, "start_min": start_min, "end_min": end_min, "counted": []}
+    state["occupancy"].add(record.div_ids, record.people, record.rooms, day, start_min, end_min)
+    state["placed_baskets"].add(record.key)
+    return _add_block(ctx, state, block, record, record.div_ids, day, start_min, end_min)
+
+def take_hint(hints, key, fits):
+    # first remembered (day, start) for key that still fits; it is consumed when used
+    options = hints.get(key) if hints else None
+    if not options:
+        return None
+    for i, (day, start_min) in enumerate(options):
+        if fits(day, start_min):
+            return options.pop(i)
+    return None
+
+def days_by_load(ctx, state, divs):
+    # least-loaded day first, ties broken randomly
+    day_load = state["day_load"]
+    day_scores = [(sum(day_load[(div_id, d)] for div_id in divs), d) for d in ctx["days"]]
+    random.shuffle(day_scores)
+    day_scores.sort(key=lambda x: x[0])
+    return [d for _, d in day_scores]
+
+def slot_satisfied(ctx, state, record):
+    # every division of the merge group already has its required count of this group
+    for div_id in record.merge_ids:
+        if state["placed_counts"].get((record.gid, div_id), 0) < ctx["required"].get((record.gid, div_id), 0):
+            return False
+    return True
+
+# Place one normal slot (greedy, least-loaded day first); True when placed or already satisfied
+def place_normal_slot(ctx, state, record, hints=None):
+    occupancy = state["occupancy"]
+    merge_group = record.merge_ids
+
+    # skip if already placed required count
+    if slot_satisfied(ctx, state, record):
+        return True
+
+    duration_min = record.duration_min
+    hint = take_hint(hints, record.group_id, lambda d, s: occupancy.is_free(merge_group, record.people, record.rooms, d, s, duration_min, record.gid, record.kind))
+    if hint is not None:
+        mark_normal_placement(ctx, state, record, hint[0], hint[1], hint[1] + duration_min)
+        return True
+
+    # earliest start from the free gaps of every merged division, person and room, least-loaded day first
+    found = occupancy.first_start(merge_group, record.people, record.rooms, days_by_load(ctx, state, merge_group), duration_min, record.gid, record.kind)
+    if found is None:
+        return False
+    mark_normal_placement(ctx, state, record, found[0], found[1], found[1] + duration_min)
+    return True
+
+# Place one elective basket across all its divisions; True when placed
+def place_basket(ctx, state, record, hints=None):
+    occupancy = state["occupancy"]
+    duration_min = record.duration_min
+
+    hint = take_hint(hints, record.key, lambda d, s: occupancy.is_free(record.div_ids, record.people, record.rooms, d, s, duration_min))
+    if hint is not None:
+        mark_basket_placement(ctx, state, record, hint[0], hint[1], hint[1] + duration_min)
+        return True
+
+    found = occupancy.first_start(record.div_ids, record.people, record.rooms, days_by_load(ctx, state, record.div_ids), duration_min)
+    if found is None:
+        return False
+    mark_basket_placement(ctx, state, record, found[0], found[1], found[1] + duration_min)
+    return True
+
+def unscheduled_report(item):
+    # records left unplaced -> the slot request dicts / basket labels the Unallotted sheet reads
+    if isinstance(item, SlotRecord):
+        return item.source
+    if isinstance(item, BasketRecord):
+        return {"basket_label": item.key}
+    return item
+
+# ----------------------------
+# Most-constrained-first ordering (settings "ordering": "mrv")
+# ----------------------------
+def item_resources(record):
+    # ("div" | "person" | "room", id) keys whose calendars an item's placement changes
+    divs = record.div_ids if isinstance(record, BasketRecord) else record.merge_ids
+    return [("div", d) for d in divs] + [("person", p) for p in record.people] + [("room", r) for r in record.rooms]
+
+def option_count(ctx, state, record):
+    # feasible (day, start) candidates left for a slot / basket
+    occupancy = state["occupancy"]
+    if isinstance(record, BasketRecord):
+        return occupancy.count_starts(record.div_ids, record.people, record.rooms, ctx["days"], record.duration_min)
+    return occupancy.count_starts(record.merge_ids, record.people, record.rooms, ctx["days"], record.duration_min, record.gid, record.kind)
+
+def place_most_constrained_first(ctx, state, hints=None, should_stop=None):
+    # DSatur/MRV-style: slots and baskets share one priority queue keyed by their remaining feasible
+    # options; after each placement only items sharing a division, person or room are re-counted
+    # (stale heap entries are skipped by version). Returns unscheduled records, or None on should_stop().
+    kind_priority = {"lec": 0, "tut": 1, "lab": 2}
+    items = [r for r in ctx["records"] if not slot_satisfied(ctx, state, r)]
+    items += [r for r in ctx["basket_records"] if r.key not in state["placed_baskets"]]
+    by_resource = defaultdict(list)
+    for i, record in enumerate(items):
+        for res in item_resources(record):
+            by_resource[res].append(i)
+    tiebreak = [random.random() for _ in items]
+    version = [0] * len(items)
+    done = [False] * len(items)
+
+    def entry(i):
+        record = items[i]
+        return (option_count(ctx, state, record), kind_priority.get(record.kind, 3), -record.duration_min, tiebreak[i], i, version[i])
+
+    heap = [entry(i) for i in range(len(items))]
+    heapq.heapify(heap)
+    unscheduled = []
+    while heap:
+        if should_stop is not None and should_stop():
+            return None
+        _, _, _, _, i, v = heapq.heappop(heap)
+        if done[i] or v != version[i]:
+            continue
+        done[i] = True
+        record = items[i]
+        if isinstance(record, BasketRecord):
+            placed = place_basket(ctx, state, record, hints)
+        elif slot_satisfied(ctx, state, record):
+            continue  # a merge partner's copy already placed this group
+        else:
+            placed = place_normal_slot(ctx, state, record, hints)
+        if not placed:
+            unscheduled.append(record)
+            continue
+        touched = {j for res in item_resources(record) for j in by_resource[res] if not done[j]}
+        for j in touched:
+            version[j] += 1
+            heapq.heappush(heap, entry(j))
+    return unscheduled
+
+def place_warm_hints(ctx, state, hints):
+    # warm start: every slot that fits at its own division's previous start, and every basket at its
+    # previous start, is placed before any search, so items without a hint cannot take those places
+    occupancy = state["occupancy"]
+    for record in ctx["records"]:
+        if slot_satisfied(ctx, state, record):
+            continue
+        fits = lambda d, s: occupancy.is_free(record.merge_ids, record.people, record.rooms, d, s, record.duration_min, record.gid, record.kind)
+        hint = take_hint(hints, (record.group_id, record.div_id, record.duration_min), fits)
+        if hint is not None:
+            mark_normal_placement(ctx, state, record, hint[0], hint[1], hint[1] + record.duration_min)
+    for record in ctx["basket_records"]:
+        hint = take_hint(hints, record.key, lambda d, s: occupancy.is_free(record.div_ids, record.people, record.rooms, d, s, record.duration_min))
+        if hint is not None:
+            mark_basket_placement(ctx, state, record, hint[0], hint[1], hint[1] + record.duration_min)
+
+# One randomized greedy attempt; returns (placements, unscheduled records), or None when should_stop() fires.
+# state may be pre-seeded with fixed placements; hints maps group_id / basket key -> [(day, start_min)]
+# (default: the warm-start hints of ctx, if any).
+def run_schedule_attempt(ctx, attempt, should_stop=None, state=None, hints=None):
+    kind_priority = {"lec": 0, "tut": 1, "lab": 2}
+    profile = ctx.get("profile")
+    t0 = time.perf_counter()
+    o0 = profile.overhead_seconds if profile is not None else 0.0
+
+    random.seed(2000 + attempt)
+    if state is None:
+        state = new_schedule_state(ctx)
+    warm = hints is None and bool(ctx.get("warm_hints"))
+    if warm:
+        hints = ctx["warm_hints"]
+    if hints:
+        hints = {k: list(v) for k, v in hints.items()}
+    if warm:
+        place_warm_hints(ctx, state, hints)
+
+    if str(ctx["settings"].get("ordering", "kind")).lower() == "mrv":
+        unscheduled = place_most_constrained_first(ctx, state, hints, should_stop)
+        if unscheduled is None:
+            return None
+    else:
+        normal_list = list(ctx["records"])
+        random.shuffle(normal_list)
+        normal_list.sort(key=lambda r: (kind_priority.get(r.kind, 3), -r.duration_min, random.random()))
+
+        unscheduled = []
+
+        # Place normal slots (minute-aware)
+        for record in normal_list:
+            if should_stop is not None and should_stop():
+                return None
+            if not place_normal_slot(ctx, state, record, hints):
+                unscheduled.append(record)
+
+        # Place baskets (electives grouped) — simplified minute-aware placement
+        with profile_phase(profile, "basket_placement"):
+            for record in ctx["basket_records"]:
+                if record.key in state["placed_baskets"]:
+                    continue
+                if not place_basket(ctx, state, record, hints):
+                    unscheduled.append(record)
+    if profile is not None:
+        seconds = time.perf_counter() - t0 - (profile.overhead_seconds - o0)
+        profile.phases["attempt"].append(seconds)
+        profile.attempts.append({"attempt": attempt, "seconds": round(seconds, 6), "unscheduled": len(unscheduled)})
+    return state["placements"], unscheduled
+
+# ----------------------------
+# Parallel restarts (process pool; same seeds and same winner as the serial loop)
+# ----------------------------
+_POOL_CTX = None
+_POOL_STOP_AT = None
+_POOL_DEADLINE = None
+
+def _init_attempt_worker(ctx, stop_at, deadline=None):
+    global _POOL_CTX, _POOL_STOP_AT, _POOL_DEADLINE
+    _POOL_CTX = ctx
+    _POOL_STOP_AT = stop_at
+    _POOL_DEADLINE = deadline
+
+def _past_deadline(attempt):
+    # attempt 0 always runs to the end, so a time-boxed run has at least one full solution
+    return _POOL_DEADLINE is not None and attempt > 0 and time.time() >= _POOL_DEADLINE
+
+def _run_attempt_in_worker(attempt):
+    # give up once an earlier attempt already reached zero unscheduled, or the time budget is spent
+    should_stop = lambda: _POOL_STOP_AT.value <= attempt or _past_deadline(attempt)
+    if should_stop():
+        return attempt, None, None
+    if _POOL_CTX.get("profile") is not None:
+        # fresh profile per attempt; the parent merges what comes back
+        _POOL_CTX["profile"] = ScheduleProfile()
+    res = run_schedule_attempt(_POOL_CTX, attempt, should_stop)
+    if res is not None and not res[1]:
+        with _POOL_STOP_AT.get_lock():
+            if attempt < _POOL_STOP_AT.value:
+                _POOL_STOP_AT.value = attempt
+    profile = _POOL_CTX.get("profile")
+    return attempt, res, profile.to_dict() if profile is not None else None
+
+def schedule_attempts_parallel(ctx, max_attempts, workers, deadline=None, progress=None, t0=None):
+    # The serial loop keeps the first attempt with the fewest unscheduled items and stops at the
+    # first zero; attempts after the earliest zero are dropped, everything before it is kept.
+    # Attempts are submitted as workers free up; with a deadline (time.time() value) there is no
+    # attempt limit and submission stops once the deadline passes.
+    limit = max_attempts if deadline is None else 2 ** 31 - 1
+    stop_at = multiprocessing.Value("i", limit)
+    results = {}
+    best_count = None
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_attempt_worker, initargs=(ctx, stop_at, deadline)) as pool:
+        in_flight = {}
+        next_attempt = 0
+        while True:
+            while len(in_flight) < workers and next_attempt < stop_at.value and not (deadline is not None and next_attempt > 0 and time.time() >= deadline):
+                in_flight[pool.submit(_run_attempt_in_worker, next_attempt)] = next_attempt
+                next_attempt += 1
+            if not in_flight:
+                break
+            done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+            for fut in done:
+                del in_flight[fut]
+                attempt, res, profile_data = fut.result()
+                if profile_data is not None:
+                    ctx["profile"].merge(profile_data)
+                if res is not None:
+                    results[attempt] = res
+                    best_count = len(res[1]) if best_count is None else min(best_count, len(res[1]))
+                    emit_progress(progress, t0, event="attempt", attempt=attempt, unscheduled=len(res[1]), best_unscheduled=best_count)
     best_result = None
     best_uns_count = None
-    kind_priority = {"lec": 0, "tut": 1, "lab": 2}
+    for attempt in sorted(results):
+        if attempt > stop_at.value:
+            break
+        placements, unscheduled = results[attempt]
+        if best_uns_count is None or len(unscheduled) < best_uns_count:
+            best_uns_count = len(unscheduled)
+            best_result = (placements, list(unscheduled), ctx["interval_times"], ctx["base_interval"], ctx["break_ranges"])
+    return best_result
 
-    # We'll store placements now as minute-based entries:
-    # placements[division][day] = list of dicts: {start_min, end_min, label, kind, meta}
-    for attempt in range(max_attempts):
-        random.seed(2000 + attempt)
-        placements = {safe_upper(div): {d: [] for d in days} for div in all_normals_per_div.keys()}
+# ----------------------------
+# Progress events for time-boxed runs: progress(event_dict) after every finished attempt
+# ----------------------------
+def emit_progress(progress, t0, **event):
+    if progress is not None:
+        event["elapsed"] = round(time.time() - t0, 3)
+        progress(event)
+
+def jsonl_progress(stream, **tags):
+    # progress callback writing one JSON object per line to an open text stream (log file, sys.stdout)
+    def emit(event):
+        stream.write(json.dumps(dict(tags, **event)) + "\n")
+        stream.flush()
+    return emit
 
-        # per-person scheduled times (for faculty gap checks): person -> list of (day, start_min, end_min)
-        occ_person_times = defaultdict(list)
-        # per-division/day list of existing placements for overlap/room/person checks (we will use placements dict)
-        placed_counts = defaultdict(int)
+# ----------------------------
+# Interaction components: divisions linked by merge groups, shared people / rooms and baskets
+# ----------------------------
+def interaction_components(ctx):
+    # [(records, basket_records)] of independent sub-problems, largest first; items in different
+    # components share no division, person or room, so they can be scheduled on separate calendars
+    n_divs = len(ctx["div_names"]); n_people = len(ctx["person_names"])
+    parent = list(range(n_divs + n_people + len(ctx["room_names"])))
+
+    def find(x):
+        while parent[x] != x:
+            parent[x] = parent[parent[x]]
+            x = parent[x]
+        return x
+
+    def item_nodes(divs, people, rooms):
+        return list(divs) + [n_divs + p for p in people] + [n_divs + n_people + r for r in rooms]
+
+    items = [(r, item_nodes((r.div_id,) + tuple(r.merge_ids), r.people, r.rooms)) for r in ctx["records"]]
+    items += [(b, item_nodes(b.div_ids, b.people, b.rooms)) for b in ctx["basket_records"]]
+    for _, nodes in items:
+        for x in nodes[1:]:
+            parent[find(x)] = find(nodes[0])
+    comps = {}
+    for item, nodes in items:
+        key = find(nodes[0]) if nodes else ("basket", item.key)
+        records, baskets = comps.setdefault(key, ([], []))
+        (baskets if isinstance(item, BasketRecord) else records).append(item)
+    return sorted(comps.values(), key=lambda c: -(len(c[0]) + len(c[1])))
+
+def component_divisions(ctx, records, basket_records):
+    div_ids = {d for r in records for d in (r.div_id,) + tuple(r.merge_ids)} | {d for b in basket_records for d in b.div_ids}
+    return [ctx["div_names"][d] for d in sorted(div_ids)]
+
+def best_of_attempts(ctx, max_attempts, deadline=None, progress=None, t0=None):
+    # serial restarts: first attempt with the fewest unscheduled items, stopping at the first zero.
+    # With a deadline (time.time() value) attempts run until it passes instead of max_attempts;
+    # attempt 0 always completes, a later attempt still running at the deadline is abandoned.
+    best = None
+    attempt = 0
+    while attempt < max_attempts or deadline is not None:
+        timed = deadline is not None and best is not None
+        if timed and time.time() >= deadline:
+            break
+        res = run_schedule_attempt(ctx, attempt, (lambda: time.time() >= deadline) if timed else None)
+        if res is None:
+            break
+        placements, unscheduled = res
+        if best is None or len(unscheduled) < len(best[1]):
+            best = (placements, unscheduled)
+        emit_progress(progress, t0, event="attempt", attempt=attempt, unscheduled=len(unscheduled), best_unscheduled=len(best[1]))
+        if not unscheduled:
+            break
+        attempt += 1
+    return best
+
+def _run_component_in_worker(rids, basket_positions, max_attempts):
+    ctx = _POOL_CTX
+    if ctx.get("profile") is not None:
+        ctx["profile"] = ScheduleProfile()
+    records = [ctx["records"][i] for i in rids]
+    baskets = [ctx["basket_records"][i] for i in basket_positions]
+    placements, unscheduled = best_of_attempts(dict(ctx, records=records, basket_records=baskets), max_attempts, _POOL_DEADLINE)
+    divs = component_divisions(ctx, records, baskets)
+    profile = ctx.get("profile")
+    return {div: placements[div] for div in divs}, unscheduled, profile.to_dict() if profile is not None else None
+
+def schedule_components(ctx, components, max_attempts, workers=1, deadline=None, progress=None, t0=None):
+    # each component gets its own restarts (best attempt per component, not per whole problem);
+    # placements of different components touch disjoint divisions, so they merge by division.
+    # With a deadline, components run one after another split the remaining time by item count.
+    placements = {div: {d: [] for d in ctx["days"]} for div in ctx["div_names"]}
+    unscheduled = []
+    if workers and workers > 1:
+        positions = {b.key: i for i, b in enumerate(ctx["basket_records"])}
+        with ProcessPoolExecutor(max_workers=min(workers, len(components)), initializer=_init_attempt_worker, initargs=(ctx, None, deadline)) as pool:
+            futures = [pool.submit(_run_component_in_worker, [r.rid for r in records], [positions[b.key] for b in baskets], max_attempts)
+                       for records, baskets in components]
+            for i, fut in enumerate(futures):
+                comp_placements, comp_unscheduled, profile_data = fut.result()
+                if profile_data is not None:
+                    ctx["profile"].merge(profile_data)
+                placements.update(comp_placements)
+                unscheduled.extend(comp_unscheduled)
+                emit_progress(progress, t0, event="component", component=i, unscheduled=len(comp_unscheduled))
+    else:
+        items_left = sum(len(r) + len(b) for r, b in components)
+        for i, (records, baskets) in enumerate(components):
+            comp_deadline = None
+            if deadline is not None:
+                size = len(records) + len(baskets)
+                comp_deadline = time.time() + max(0.0, deadline - time.time()) * size / max(items_left, 1)
+                items_left -= size
+            comp_progress = (lambda event, i=i: progress(dict(event, component=i))) if progress is not None else None
+            comp_placements, comp_unscheduled = best_of_attempts(dict(ctx, records=records, basket_records=baskets), max_attempts, comp_deadline, comp_progress, t0)
+            for div in component_divisions(ctx, records, baskets):
+                placements[div] = comp_placements[div]
+            unscheduled.extend(comp_unscheduled)
+    return placements, unscheduled
 
-        normal_list = copy.deepcopy(normal_list_master)
-        random.shuffle(normal_list)
-        normal_list.sort(key=lambda x: (kind_priority.get(x["kind"], 3), -x["_duration_min"], random.random()))
-
-        def overlaps(a_start, a_end, b_start, b_end):
-            return not (a_end <= b_start or b_end <= a_start)
-
-        def any_conflict_with_existing(merge_group, day, cand_start_min, cand_end_min, busy_people, rooms_set):
-            # check breaks
-            for bs, be in break_ranges:
-                if not (cand_end_min <= bs or cand_start_min >= be):
-                    return True
-            # for each merged division, check existing placements
-            for mdiv in merge_group:
-                for ex in placements.get(mdiv, {}).get(day, []):
-                    ex_s = ex["start_min"]; ex_e = ex["end_min"]
-                    # if overlap, conflict
-                    if overlaps(cand_start_min, cand_end_min, ex_s, ex_e):
-                        return True
-                    # enforce min_gap between placements of same course in same division
-                    # note: we will check course slot min_gap rule separately where relevant
-                    # but also ensure min_gap_minutes between unrelated placements is not mandatory (only for same course)
-                # same-course min_gap: ensure new block is at least min_gap away from existing placements
-                for ex in placements.get(mdiv, {}).get(day, []):
-                    ex_s = ex["start_min"]; ex_e = ex["end_min"]
-                    if not (cand_end_min + min_gap_minutes <= ex_s or cand_start_min >= ex_e + min_gap_minutes):
-                        # This enforces the course min_gap rule across placements in same division
-                        # but only if they are the same group_id we'll treat later; to be conservative we apply for same course/group
-                        # We'll check same-course separately
-                        pass
-            # check rooms and people overlapping using placements entries
-            for mdiv in merge_group:
-                for ex in placements.get(mdiv, {}).get(day, []):
-                    ex_meta = ex.get("meta", {})
-                    ex_people = set()
-                    ex_rooms = set()
-                    if ex_meta:
-                        if ex_meta.get("kind") in ("lec", "tut"):
-                            ex_people.update(ex_meta.get("faculty", []) or [])
-                            ex_people.update(ex_meta.get("class_asst", []) or [])
-                            ex_rooms.update(ex_meta.get("ROOM.NO", []) or [])
-                        else:
-                            ex_people.update(ex_meta.get("faculty", []) or [])
-                            ex_people.update(ex_meta.get("lab_asst", []) or [])
-                            ex_rooms.update(ex_meta.get("LAB ROOM.NO", []) or [])
-                    if busy_people & ex_people:
-                        if overlaps(cand_start_min, cand_end_min, ex["start_min"], ex["end_min"]):
-                            return True
-                    if rooms_set and (rooms_set & ex_rooms):
-                        if overlaps(cand_start_min, cand_end_min, ex["start_min"], ex["end_min"]):
-                            return True
-            # faculty gap global check
-            for person in busy_people:
-                for (pday, pstart, pend) in occ_person_times.get(person, []):
-                    if pday != day:
-                        continue
-                    if not (cand_end_min + faculty_gap_minutes <= pstart or cand_start_min >= pend + faculty_gap_minutes):
-                        return True
-            return False
+# ----------------------------
+# Capacity pre-check: demand that provably cannot fit, found before any attempt runs
+# ----------------------------
+def free_windows(ctx):
+    # break-free stretches of one working day, [(start, end)] in minutes
+    origin = ctx["interval_times"][0] if ctx["interval_times"] else ctx["wh_end"]
+    return complement_intervals(union_intervals(list(ctx["break_ranges"])), origin, ctx["wh_end"])
+
+def demand_by_entity(ctx):
+    # {("div" | "person" | "room", id): [block durations]} as a lower bound on the blocks each entity must host.
+    # Copies of a merged slot collapse to one block: per group, divisions linked through merge groups form a
+    # component, and an entity needs at least the largest count any one division of the component asks it for.
+    demand = defaultdict(list)
+    by_gid = defaultdict(list)
+    for r in ctx["records"]:
+        by_gid[r.gid].append(r)
+        demand[("div", r.div_id)].append(r.duration_min)
+    for recs in by_gid.values():
+        parent = {}
+        def find(x):
+            while parent.setdefault(x, x) != x:
+                parent[x] = parent[parent[x]]
+                x = parent[x]
+            return x
+        for r in recs:
+            for d in r.merge_ids:
+                parent[find(d)] = find(r.div_id)
+        per_entity = defaultdict(lambda: defaultdict(list))  # (entity, component) -> div -> durations
+        for r in recs:
+            comp = find(r.div_id)
+            for res in [("person", p) for p in r.people] + [("room", x) for x in r.rooms]:
+                per_entity[(res, comp)][r.div_id].append(r.duration_min)
+        for (res, _), per_div in per_entity.items():
+            demand[res].extend(max(per_div.values(), key=len))
+    for b in ctx["basket_records"]:
+        for res in [("div", d) for d in b.div_ids] + [("person", p) for p in b.people] + [("room", x) for x in b.rooms]:
+            demand[res].append(b.duration_min)
+    return demand
+
+def capacity_issues(ctx):
+    # Necessary conditions only (every issue is a real infeasibility; passing does not promise a fit):
+    # - a block longer than the longest break-free window
+    # - division: block minutes + min gaps between blocks sharing a window > days x (working day - breaks)
+    # - person: block minutes > days x (working day - breaks), or with the faculty gap between
+    #   same-day blocks > days x working day
+    # - room: block minutes > days x (working day - breaks)
+    # - course: more lec (or lab) blocks than days, or tut + lec/lab days > days (same-day rules)
+    n_days = len(ctx["days"])
+    windows = free_windows(ctx)
+    usable = sum(e - s for s, e in windows)
+    longest = max((e - s for s, e in windows), default=0)
+    span = (ctx["wh_end"] - ctx["interval_times"][0]) if ctx["interval_times"] else 0
+    min_gap = ctx["min_gap_minutes"]; faculty_gap = ctx["faculty_gap_minutes"]
+    names = {"div": ctx["div_names"], "person": ctx["person_names"], "room": ctx["room_names"]}
+    entity_label = {"div": "division", "person": "person", "room": "room"}
+    issues = []
+
+    def issue(entity, name, demand_min, capacity_min, reason):
+        issues.append({"entity": entity, "name": name, "demand_min": demand_min, "capacity_min": capacity_min, "reason": reason})
+
+    for r in list(ctx["records"]) + list(ctx["basket_records"]):
+        if r.duration_min > longest:
+            name = r.key if isinstance(r, BasketRecord) else f"{r.group_id} ({ctx['div_names'][r.div_id]})"
+            issue("slot", name, r.duration_min, longest, "block is longer than the longest break-free window")
+
+    for (table, ent), durations in sorted(demand_by_entity(ctx).items()):
+        total = sum(durations)
+        n = len(durations)
+        capacity = n_days * usable
+        if total > capacity:
+            issue(entity_label[table], names[table][ent], total, capacity, f"{n} blocks need more than {n_days} day(s) x {usable} free minutes")
+        elif table == "div" and min_gap > 0 and total + max(0, n - n_days * len(windows)) * min_gap > capacity:
+            needed = total + max(0, n - n_days * len(windows)) * min_gap
+            issue("division", names[table][ent], needed, capacity, f"{n} blocks plus {min_gap}-minute gaps between them exceed the free minutes")
+        elif table == "person" and faculty_gap > 0 and total + max(0, n - n_days) * faculty_gap > n_days * span:
+            needed = total + max(0, n - n_days) * faculty_gap
+            issue("person", names[table][ent], needed, n_days * span, f"{n} blocks plus the {faculty_gap}-minute faculty gap between same-day blocks exceed {n_days} working day(s)")
+
+    # same-course/day rules: one lec and one lab per day, a tut day holds nothing else of the course
+    kinds = defaultdict(lambda: defaultdict(int))
+    for r in ctx["records"]:
+        kinds[(r.gid, r.div_id)][r.kind] += 1
+    for (gid, div_id), count in kinds.items():
+        lec, lab, tut = count.get("lec", 0), count.get("lab", 0), count.get("tut", 0)
+        if max(lec, lab) + tut > n_days:
+            issue("course", f"{ctx['group_names'][gid]} ({ctx['div_names'][div_id]})", max(lec, lab) + tut, n_days,
+                  f"{lec} lec / {lab} lab / {tut} tut block(s) need more distinct days than the {n_days} working day(s)")
+    return issues
+
+def report_capacity_issues(issues, limit=50):
+    print(f" Capacity check: {len(issues)} provably infeasible item(s) — these cannot all be scheduled:")
+    for it in issues[:limit]:
+        print(f"   {it['entity']} {it['name']}: {it['reason']} (needs {it['demand_min']}, has {it['capacity_min']})")
+    if len(issues) > limit:
+        print(f"   ... {len(issues) - limit} more not shown ...")
 
-        def violates_same_course_day_rules(mdiv, day, group_id, kind, cand_start_min):
-            # Prevent same course same kind twice a day etc (preserve original behaviour)
-            for ex in placements.get(mdiv, {}).get(day, []):
-                ex_kind = ex.get("kind")
-                ex_meta = ex.get("meta", {})
-                existing_gid = None
-                if isinstance(ex_meta, dict):
-                    existing_gid = ex_meta.get("group_id") or ex_meta.get("code")
-                if not existing_gid:
-                    continue
-                if existing_gid == group_id:
-                    # same kind twice
-                    if ex_kind == kind:
-                        return True
-                    if set([ex_kind, kind]) == set(["lec", "lab"]):
-                        ex_start_min = ex["start_min"]
-                        # preserve previous logic: lab after lec ordering
-                        if kind == "lab":
-                            if ex_kind == "lec":
-                                if cand_start_min <= ex_start_min:
-                                    return True
-                        elif ex_kind == "lab":
-                            if cand_start_min >= ex_start_min:
-                                return True
-                    if "tut" in (ex_kind, kind):
-                        return True
-            return False
+# ----------------------------
+# Incremental re-scheduling (saved placements + per-group input fingerprints)
+# ----------------------------
+def schedule_config_key(ctx):
+    settings = ctx["settings"]
+    key = {
+        "working_days": list(settings["working_days"]),
+        "working_hours": list(settings["working_hours"]),
+        "break_slots": [list(b) for b in settings.get("break_slots", [])],
+        "slot_durations": settings["slot_durations"],
+        "min_gap_minutes": ctx["min_gap_minutes"],
+        "faculty_gap_minutes": ctx["faculty_gap_minutes"],
+    }
+    return json.loads(json.dumps(key))
 
-        def mark_placement_across_merged(merge_group, day, cand_start_min, cand_end_min, busy_people, rooms_set, meta, group_id, label, kind):
-            # store placement dicts for each division in merge_group
-            for mdiv in merge_group:
-                placements[mdiv][day].append({
-                    "start_min": cand_start_min,
-                    "end_min": cand_end_min,
-                    "label": label,
-                    "kind": kind,
-                    "meta": meta
-                })
-                if required_per_div.get((group_id, mdiv), 0) > 0:
-                    if placed_counts.get((group_id, mdiv), 0) < required_per_div.get((group_id, mdiv), 0):
-                        placed_counts[(group_id, mdiv)] += 1
-            # mark person times
-            for p in busy_people:
-                occ_person_times[p].append((day, cand_start_min, cand_end_min))
+def _fingerprint(obj):
+    return hashlib.md5(json.dumps(obj, sort_keys=True, default=str).encode("utf-8")).hexdigest()
 
-        unscheduled = []
+def schedule_fingerprints(ctx):
+    # one hash per (group_id, division) for normal slots and per basket key, over the fields the scheduler reads
+    normals = defaultdict(list)
+    for e in ctx["normal_list_master"]:
+        busy_people, rooms = slot_resources(e)
+        normals[f"{e.get('group_id')}|{e['_division']}"].append([e.get("kind"), e["_duration_min"], sorted(busy_people), sorted(rooms), sorted(e.get("merge_with") or []), e.get("slot_label")])
+    baskets = {}
+    for b_key, members in ctx["baskets_master"].items():
+        basket_divs, people, rooms, duration_min, kind, slot_base = basket_resources(ctx["dur_minutes"], members)
+        baskets[b_key] = _fingerprint([sorted(basket_divs), sorted(people), sorted(rooms), duration_min, kind, slot_base, sorted(m.get("code", "") for m in members)])
+    return {
+        "normals": {k: _fingerprint(sorted(v, key=json.dumps)) for k, v in normals.items()},
+        "baskets": baskets,
+    }
 
-        # Place normal slots (minute-aware)
-        for slot in normal_list:
-            group_id = slot.get("group_id")
-            merge_group_raw = slot.get("merge_with", []) or []
-            if isinstance(merge_group_raw, str):
-                merge_group_raw = [m.strip() for m in merge_group_raw.split(",") if m.strip()]
-            merge_group = [safe_upper(m) for m in merge_group_raw if m]
-            if not merge_group:
-                merge_group = [slot["_division"]]
-            # resolve names (preserve placements keys)
-            resolved_merge = []
-            for m in merge_group:
-                if m in placements:
-                    resolved_merge.append(m)
-                else:
-                    for pk in placements.keys():
-                        if pk.replace(" ", "").upper() == m.replace(" ", "").upper():
-                            resolved_merge.append(pk)
-                            break
-            if not resolved_merge:
-                resolved_merge = [slot["_division"]]
-            merge_group = resolved_merge
-
-            # skip if already placed required count
-            skip_flag = True
-            for div in merge_group:
-                if placed_counts.get((group_id, div), 0) < required_per_div.get((group_id, div), 0):
-                    skip_flag = False; break
-            if skip_flag:
-                continue
+def placement_rows(placements, detail=False):
+    # one row per (division, placement); "block" numbers one placement call (merged divisions share the
+    # slot record, baskets their key). detail adds the readable columns of the exported schedule.
+    rows = []
+    block_ids = {}
+    for div, day_map in placements.items():
+        for day, plist in day_map.items():
+            for p in plist:
+                record = p.meta
+                is_basket = isinstance(record, BasketRecord)
+                block_key = (record.key if is_basket else record.rid, day, p.start_min)
+                row = {
+                    "block": block_ids.setdefault(block_key, len(block_ids)),
+                    "division": div,
+                    "day": day,
+                    "start_min": p.start_min,
+                    "end_min": p.end_min,
+                    "kind": p.kind,
+                    "group_id": record.key if is_basket else record.group_id,
+                    "source": None if is_basket else record.source["_division"],
+                    "basket": is_basket,
+                }
+                if detail:
+                    row.update(placement_details(div, p))
+                rows.append(row)
+    return rows
 
-            duration_min = slot.get("_duration_min", max(1, int(round(settings["slot_durations"].get(slot.get("kind"), 1.0) * 60))))
-            busy_people = set(slot.get("faculty", []) or [])
-            if slot.get("kind") in ("lec", "tut"):
-                busy_people.update(slot.get("class_asst", []) or [])
-                rooms = set(slot.get("ROOM.NO", []) or [])
-            else:
-                busy_people.update(slot.get("lab_asst", []) or [])
-                rooms = set(slot.get("LAB ROOM.NO", []) or [])
-
-            placed = False
-            # days scored by current load
-            day_scores = []
-            for d in days:
-                score = sum(len(placements.get(div, {}).get(d, [])) for div in merge_group)
-                day_scores.append((score, d))
-            random.shuffle(day_scores)
-            day_scores.sort(key=lambda x: x[0])
-
-            for _, day in day_scores:
-                # candidate start times: original interval_times (minute aligned)
-                start_candidates = list(interval_times)
-                random.shuffle(start_candidates)
-                start_candidates.sort()
-                for cand in start_candidates:
-                    # initial candidate start and end
-                    cand_start_min = cand
-                    cand_end_min = cand_start_min + duration_min
-                    # ensure block fits within working hours
-                    if cand_end_min > wh_end:
-                        continue
-                    # skip if overlaps break
-                    bad = False
-                    for bs, be in break_ranges:
-                        if not (cand_end_min <= bs or cand_start_min >= be):
-                            bad = True; break
-                    if bad:
-                        continue
-                    # same-course/day rules
-                    violated = False
-                    for mdiv in merge_group:
-                        if violates_same_course_day_rules(mdiv, day, group_id, slot.get("kind"), cand_start_min):
-                            violated = True; break
-                    if violated:
-                        continue
-
-                    # Now check if there's a placement immediately before cand_start_min in any merged division
-                    # If previous placement ends exactly at cand_start_min (or ends within min_gap), we attempt to shift the candidate forward by min_gap_minutes
-                    need_shift = False
-                    for mdiv in merge_group:
-                        for ex in placements.get(mdiv, {}).get(day, []):
-                            ex_end = ex["end_min"]
-                            # if ex_end == cand_start_min OR ex_end + min_gap_minutes > cand_start_min (i.e. too close), we prefer shifting
-                            if ex_end == cand_start_min or (0 <= (cand_start_min - ex_end) < min_gap_minutes):
-                                need_shift = True
-                                break
-                        if need_shift:
-                            break
+def placement_details(div, p):
+    # readable columns of one placement: times, slot, course codes, faculty / assistants and rooms
+    record = p.meta
+    if isinstance(record, BasketRecord):
+        # the basket courses this division takes part in
+        courses = [m for m in record.members if div in ([safe_upper(d) for d in m.get("merge_with") or []] or [m.get("division")])]
+    else:
+        courses = [record.source]
+    faculty, assistants, rooms = [], [], []
+    for c in courses:
+        people, course_rooms = slot_resources(c)
+        faculty += [f for f in c.get("faculty", []) or [] if f not in faculty]
+        assistants += [a for a in sorted(people) if a not in faculty and a not in assistants]
+        rooms += [r for r in sorted(course_rooms) if r not in rooms]
+    return {
+        "start": minutes_to_time(p.start_min),
+        "end": minutes_to_time(p.end_min),
+        "slot_base": record.slot_base,
+        "label": p.label,
+        "course_code": ", ".join(dict.fromkeys(c.get("code", "") for c in courses if c.get("code"))),
+        "faculty": ", ".join(faculty),
+        "assistants": ", ".join(assistants),
+        "rooms": ", ".join(rooms),
+    }
 
-                    if need_shift:
-                        shifted_start = cand_start_min + min_gap_minutes
-                        shifted_end = shifted_start + duration_min
-                        # ensure shifted fits
-                        if shifted_end > wh_end:
-                            continue
-                        # ensure not overlapping break
-                        bad2 = False
-                        for bs, be in break_ranges:
-                            if not (shifted_end <= bs or shifted_start >= be):
-                                bad2 = True; break
-                        if bad2:
-                            continue
-                        # check conflicts with existing placements (rooms/people/faculty gap) on shifted interval
-                        if any_conflict_with_existing(merge_group, day, shifted_start, shifted_end, busy_people, rooms):
-                            continue
-                        # also check same-course/day rules for shifted start
-                        violated2 = False
-                        for mdiv in merge_group:
-                            if violates_same_course_day_rules(mdiv, day, group_id, slot.get("kind"), shifted_start):
-                                violated2 = True; break
-                        if violated2:
-                            continue
-                        # OK — mark placement at shifted times
-                        label = slot.get("slot_label")
-                        mark_placement_across_merged(merge_group, day, shifted_start, shifted_end, busy_people, rooms, slot, group_id, label, slot.get("kind"))
-                        placed = True
-                        break
+def save_schedule_state(path, ctx, placements):
+    state = {"config": schedule_config_key(ctx), "fingerprints": schedule_fingerprints(ctx), "placements": placement_rows(placements)}
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path, "w") as f:
+        json.dump(state, f)
 
-                    else:
-                        # no need to shift — check conflicts at original cand times
-                        if any_conflict_with_existing(merge_group, day, cand_start_min, cand_end_min, busy_people, rooms):
-                            continue
-                        # OK mark placement
-                        label = slot.get("slot_label")
-                        mark_placement_across_merged(merge_group, day, cand_start_min, cand_end_min, busy_people, rooms, slot, group_id, label, slot.get("kind"))
-                        placed = True
-                        break
-                if placed:
-                    break
-            if not placed:
-                unscheduled.append(slot)
+def load_schedule_state(path):
+    if not path or not os.path.exists(path):
+        return None
+    try:
+        with open(path, "r") as f:
+            state = json.load(f)
+    except Exception:
+        return None
+    if not isinstance(state, dict) or "placements" not in state or "fingerprints" not in state:
+        return None
+    return state
+
+def diff_schedule_state(ctx, prev_state):
+    # split the saved placement blocks into ones to keep and (group -> old starts) to place again
+    fps = schedule_fingerprints(ctx)
+    old = prev_state["fingerprints"]
+    old_normals = old.get("normals", {})
+    old_baskets = old.get("baskets", {})
+    changed_normals = {k for k in set(fps["normals"]) | set(old_normals) if fps["normals"].get(k) != old_normals.get(k)}
+    changed_baskets = {k for k in set(fps["baskets"]) | set(old_baskets) if fps["baskets"].get(k) != old_baskets.get(k)}
+
+    blocks = defaultdict(list)
+    for row in prev_state["placements"]:
+        if row.get("day") not in ctx["days"] or not row.get("group_id"):
+            continue
+        blocks[(row["group_id"], bool(row.get("basket")), row["day"], row["start_min"], row["end_min"], row.get("block"), row.get("source"))].append(row["division"])
+
+    kept = []
+    hints = defaultdict(list)
+    for key in sorted(blocks, key=lambda k: (ctx["days"].index(k[2]), k[3], k[0])):
+        gid, is_basket, day, start_min = key[:4]
+        source = key[6]
+        if is_basket:
+            if gid not in ctx["baskets_master"]:
+                continue
+            changed = gid in changed_baskets
+        else:
+            if f"{gid}|{source}" not in fps["normals"] and not any(f"{gid}|{d}" in fps["normals"] for d in blocks[key]):
+                continue
+            changed = f"{gid}|{source}" in changed_normals or any(f"{gid}|{d}" in changed_normals for d in blocks[key])
+        if changed:
+            hints[gid].append((day, start_min))
+        else:
+            kept.append((key, blocks[key]))
+    return kept, hints, changed_normals, changed_baskets
+
+def replay_kept_blocks(ctx, kept, hints):
+    # seed a fresh state with the unchanged blocks; a block that now clashes is re-placed like a changed one
+    state = new_schedule_state(ctx)
+    occupancy = state["occupancy"]
+    div_index = ctx["div_index"]
+    records = defaultdict(list)
+    for r in ctx["records"]:
+        records[(r.group_id, r.div_id)].append(r)
+    basket_records = {r.key: r for r in ctx["basket_records"]}
+    hints = {k: list(v) for k, v in hints.items()}
+    evicted = 0
+    for (gid, is_basket, day, start_min, end_min, _, source), divs in kept:
+        div_ids = sorted(div_index[d] for d in divs if d in div_index)
+        if is_basket:
+            record = basket_records.get(gid)
+            if record is not None and gid not in state["placed_baskets"] and sorted(record.div_ids) == div_ids and record.duration_min == end_min - start_min \
+                    and occupancy.is_free(record.div_ids, record.people, record.rooms, day, start_min, record.duration_min):
+                mark_basket_placement(ctx, state, record, day, start_min, end_min)
+                continue
+        else:
+            # the division whose slot request was placed (merged divisions may list different rooms),
+            # and the occurrence with this block's length (an L/T/P total can split into unequal blocks)
+            candidates = records.get((gid, div_index.get(source))) or next((records[(gid, d)] for d in div_ids if records.get((gid, d))), [])
+            record = next((r for r in candidates if r.duration_min == end_min - start_min), None)
+            if record is not None:
+                room_left = any(state["placed_counts"].get((record.gid, d), 0) < ctx["required"].get((record.gid, d), 0) for d in record.merge_ids)
+                if room_left and sorted(record.merge_ids) == div_ids \
+                        and occupancy.is_free(record.merge_ids, record.people, record.rooms, day, start_min, record.duration_min, record.gid, record.kind):
+                    mark_normal_placement(ctx, state, record, day, start_min, end_min)
+                    continue
+        evicted += 1
+        hints.setdefault(gid, []).append((day, start_min))
+    return state, hints, evicted
 
-        # Place baskets (electives grouped) — simplified minute-aware placement
-        for b_key, members in baskets_master.items():
-            # group members per division
-            div_to_members = defaultdict(list)
-            for m in members:
-                merge_group = m.get("merge_with", []) or [m.get("division", "")]
-                for div in merge_group:
-                    div_up = safe_upper(div)
-                    div_to_members[div_up].append(m)
-            basket_divs = list(div_to_members.keys())
-
-            combined_people = set()
-            combined_rooms = set()
-            max_duration_min = 0
-            kind = members[0].get("kind", "lec")
-            slot_base = members[0].get("slot_base", "")
-            for m in members:
-                combined_people.update(m.get("faculty", []) or [])
-                if kind in ("lec", "tut"):
-                    combined_people.update(m.get("class_asst", []) or [])
-                    combined_rooms.update(m.get("ROOM.NO", []) or [])
+def reschedule_incremental(ctx, prev_state, max_attempts=20):
+    kept, hints, changed_normals, changed_baskets = diff_schedule_state(ctx, prev_state)
+    best_result = None
+    for attempt in range(max_attempts):
+        state, attempt_hints, evicted = replay_kept_blocks(ctx, kept, hints)
+        if attempt == 0:
+            print(f" Incremental: {len(changed_normals)} slot group(s) and {len(changed_baskets)} basket(s) changed; "
+                  f"kept {len(kept) - evicted} block(s), re-placing {sum(len(v) for v in attempt_hints.values())}")
+        placements, unscheduled = run_schedule_attempt(ctx, attempt, state=state, hints=attempt_hints)
+        if best_result is None or len(unscheduled) < len(best_result[1]):
+            best_result = (placements, list(unscheduled), ctx["interval_times"], ctx["base_interval"], ctx["break_ranges"])
+        if not unscheduled:
+            break
+    return best_result
+
+# ----------------------------
+# Warm start: a previous semester's timetable as placement hints
+# ----------------------------
+# A previous placement row: {division, day, start_min, end_min, kind, slot_base, group_id, basket}. Rows come
+# from our own Timetable_Year*_*.xlsx, a saved schedule state or an exported schedule (.json / .csv / .parquet).
+def _split_label(label):
+    # "ENG-LEC" -> ("ENG", "lec"); "ELECTIVE-1-LEC" -> ("ELECTIVE-1", "lec")
+    label = safe_upper(label)
+    if "-" not in label:
+        return label, ""
+    slot_base, kind = label.rsplit("-", 1)
+    return slot_base, kind.lower()
+
+def read_timetable_workbook(path):
+    # placement rows of a Timetable_Year*_*.xlsx written by write_year_excel(_streaming); course codes
+    # come from each sheet's reference table, so group_ids match build_slot_requests_for_division
+    wb = load_workbook(path)
+    rows = []
+    for ws in wb.worksheets:
+        title = str(ws.cell(1, 1).value or "")
+        if not title.startswith("Division:"):
+            continue
+        div = safe_upper(title[len("Division:"):].split("Year:")[0])
+        headers = []
+        for c in range(2, ws.max_column + 1):
+            value = ws.cell(3, c).value
+            if not value or " - " not in str(value):
+                break
+            start, end = str(value).split(" - ")
+            headers.append((time_to_minutes(start), time_to_minutes(end)))
+        merged_end = {(rng.min_row, rng.min_col): rng.max_col for rng in ws.merged_cells.ranges}
+        codes = defaultdict(list)
+        r = 4
+        while r <= ws.max_row and ws.cell(r, 1).value:
+            r += 1
+        last_day_row = r - 1
+        for rr in range(r, ws.max_row + 1):
+            if ws.cell(rr, 1).value == "Reference Table":
+                columns = [ws.cell(rr + 1, c).value for c in range(1, ws.max_column + 1)]
+                if "SLOT NAME" in columns and "COURSE CODE" in columns:
+                    slot_col = columns.index("SLOT NAME") + 1
+                    code_col = columns.index("COURSE CODE") + 1
+                    for ref in range(rr + 2, ws.max_row + 1):
+                        slot_base = safe_upper(ws.cell(ref, slot_col).value)
+                        code = safe_upper(ws.cell(ref, code_col).value)
+                        if slot_base and code and code not in codes[slot_base]:
+                            codes[slot_base].append(code)
+                break
+        for row in range(4, last_day_row + 1):
+            day = str(ws.cell(row, 1).value).strip()
+            for c in range(2, 2 + len(headers)):
+                label = ws.cell(row, c).value
+                if not label or label == "BREAK":
+                    continue
+                slot_base, kind = _split_label(label)
+                end_col = merged_end.get((row, c), c)
+                base = {"division": div, "day": day, "start_min": headers[c - 2][0], "end_min": headers[min(end_col, 1 + len(headers)) - 2][1],
+                        "kind": kind, "slot_base": slot_base}
+                if slot_base.lower().startswith("elective"):
+                    rows.append(dict(base, group_id=None, basket=True))
                 else:
-                    combined_people.update(m.get("lab_asst", []) or [])
-                    combined_rooms.update(m.get("LAB ROOM.NO", []) or [])
-                duration_min = m.get("_duration_min", dur_minutes.get(kind, 60))
-                max_duration_min = max(max_duration_min, duration_min)
-            duration_min = max_duration_min
-
-            placed = False
-            day_scores = []
-            for d in days:
-                score = sum(len(placements.get(div, {}).get(d, [])) for div in basket_divs)
-                day_scores.append((score, d))
-            random.shuffle(day_scores)
-            day_scores.sort(key=lambda x: x[0])
-
-            for _, day in day_scores:
-                for cand in interval_times:
-                    cand_start_min = cand
-                    cand_end_min = cand_start_min + duration_min
-                    if cand_end_min > wh_end:
-                        continue
-                    # skip if overlaps break
-                    bad = False
-                    for bs, be in break_ranges:
-                        if not (cand_end_min <= bs or cand_start_min >= be):
-                            bad = True; break
-                    if bad:
-                        continue
-                    # try shifting if immediate previous ends at cand_start_min
-                    need_shift = False
-                    for div in basket_divs:
-                        for ex in placements.get(div, {}).get(day, []):
-                            if ex["end_min"] == cand_start_min or (0 <= (cand_start_min - ex["end_min"]) < min_gap_minutes):
-                                need_shift = True
-                                break
-                        if need_shift:
-                            break
-                    if need_shift:
-                        shifted_start = cand_start_min + min_gap_minutes
-                        shifted_end = shifted_start + duration_min
-                        if shifted_end > wh_end:
-                            continue
-                        # skip breaks
-                        bad2 = False
-                        for bs, be in break_ranges:
-                            if not (shifted_end <= bs or shifted_start >= be):
-                                bad2 = True; break
-                        if bad2:
-                            continue
-                        if any_conflict_with_existing(basket_divs, day, shifted_start, shifted_end, combined_people, combined_rooms):
-                            continue
-                        # OK place
-                        for div in basket_divs:
-                            placements[div][day].append({
-                                "start_min": shifted_start,
-                                "end_min": shifted_end,
-                                "label": f"{slot_base}-{kind.upper()}",
-                                "kind": kind,
-                                "meta": {"basket_members": members, "slot_base": slot_base, "group_id": b_key, "faculty": list(combined_people), "ROOM.NO": list(combined_rooms)}
-                            })
-                            if placed_counts.get((b_key, div), 0) < required_per_div.get((b_key, div), 0):
-                                placed_counts[(b_key, div)] += 1
-                        for p in combined_people:
-                            occ_person_times[p].append((day, shifted_start, shifted_end))
-                        placed = True
-                        break
-                    else:
-                        if any_conflict_with_existing(basket_divs, day, cand_start_min, cand_end_min, combined_people, combined_rooms):
-                            continue
-                        # OK place
-                        for div in basket_divs:
-                            placements[div][day].append({
-                                "start_min": cand_start_min,
-                                "end_min": cand_end_min,
-                                "label": f"{slot_base}-{kind.upper()}",
-                                "kind": kind,
-                                "meta": {"basket_members": members, "slot_base": slot_base, "group_id": b_key, "faculty": list(combined_people), "ROOM.NO": list(combined_rooms)}
-                            })
-                            if placed_counts.get((b_key, div), 0) < required_per_div.get((b_key, div), 0):
-                                placed_counts[(b_key, div)] += 1
-                        for p in combined_people:
-                            occ_person_times[p].append((day, cand_start_min, cand_end_min))
-                        placed = True
+                    # a slot name shared by several courses of the division hints each of them
+                    for code in codes.get(slot_base) or [""]:
+                        rows.append(dict(base, group_id=f"{code}__{kind}__{slot_base}", basket=False))
+    return rows
+
+def normalize_previous_row(row):
+    # fill slot_base / kind / basket from whichever of label and group_id a row carries
+    out = {"division": safe_upper(row.get("division")), "day": str(row.get("day", "")).strip(),
+           "start_min": int(row["start_min"]), "end_min": int(row.get("end_min") or row["start_min"])}
+    group_id = row.get("group_id")
+    group_id = None if group_id is None or (isinstance(group_id, float) and math.isnan(group_id)) or group_id == "" else str(group_id)
+    basket = row.get("basket")
+    basket = bool(basket) and str(basket).lower() not in ("false", "0", "nan") if basket is not None else bool(group_id and group_id.startswith("BASKET__"))
+    kind = row.get("kind") if isinstance(row.get("kind"), str) else ""
+    slot_base = row.get("slot_base") if isinstance(row.get("slot_base"), str) else ""
+    if not slot_base and isinstance(row.get("label"), str):
+        slot_base, label_kind = _split_label(row["label"])
+        kind = kind or label_kind
+    if not slot_base and group_id:
+        parts = group_id[len("BASKET__"):].split("__") if basket else group_id.split("__")
+        if basket and len(parts) >= 2:
+            slot_base, kind = parts[0], kind or parts[1]
+        elif not basket and len(parts) >= 3:
+            slot_base, kind = parts[-1], kind or parts[-2]
+    out.update(kind=str(kind).lower(), slot_base=safe_upper(slot_base), group_id=None if basket else group_id, basket=basket)
+    return out
+
+def read_previous_schedule(path):
+    # placement rows from a workbook, a schedule state (.json with "placements") or an export (export_schedule)
+    if os.path.splitext(path)[1].lower() in (".xlsx", ".xlsm"):
+        rows = read_timetable_workbook(path)
+    else:
+        rows = read_table(path)
+    return [normalize_previous_row(r) for r in rows if r.get("division") and r.get("day") and r.get("start_min") is not None]
+
+def warm_start_files(spec, half):
+    # settings "warm_start": path / glob or a list of them; files naming the other half are skipped
+    patterns = [spec] if isinstance(spec, str) else list(spec or [])
+    other = "second_halfsem" if half == "first" else "first_halfsem"
+    files = []
+    for pattern in patterns:
+        for path in sorted(glob.glob(pattern)) or ([pattern] if os.path.exists(pattern) else []):
+            if other not in os.path.basename(path) and path not in files:
+                files.append(path)
+    return files
+
+def load_warm_start(spec, half):
+    rows = []
+    for path in warm_start_files(spec, half):
+        rows.extend(read_previous_schedule(path))
+    return rows
+
+def warm_start_hints(ctx, rows):
+    # normal slots: (group_id, div_id, duration) -> that division's previous blocks of this length (place_warm_hints),
+    # group_id -> every previous start of the group (tried before searching); baskets: key -> starts, most shared first
+    div_index = ctx["div_index"]
+    days = set(ctx["days"])
+    hints = defaultdict(list)
+    basket_votes = defaultdict(lambda: defaultdict(int))
+    baskets_by_slot = defaultdict(list)
+    for record in ctx["basket_records"]:
+        baskets_by_slot[(safe_upper(record.slot_base), record.kind)].append(record)
+    for row in rows:
+        div_id = div_index.get(row["division"])
+        if div_id is None or row["day"] not in days:
+            continue
+        start = (row["day"], row["start_min"])
+        if row["basket"]:
+            for record in baskets_by_slot.get((row["slot_base"], row["kind"]), []):
+                if div_id in record.div_ids:
+                    basket_votes[record.key][start] += 1
+        elif row["group_id"]:
+            for key in ((row["group_id"], div_id, row["end_min"] - row["start_min"]), row["group_id"]):
+                if start not in hints[key]:
+                    hints[key].append(start)
+    for key, votes in basket_votes.items():
+        hints[key] = sorted(votes, key=lambda s: -votes[s])
+    return dict(hints)
+
+def warm_start_kept(ctx, placements, rows):
+    # (previous blocks found again at the same division/day/start, previous blocks of divisions still scheduled)
+    now = {(div, day, p.start_min, safe_upper(p.meta.slot_base), p.kind) for div, day_map in placements.items() for day, plist in day_map.items() for p in plist}
+    previous = {(r["division"], r["day"], r["start_min"], r["slot_base"], r["kind"]) for r in rows if r["division"] in ctx["div_index"]}
+    return len(previous & now), len(previous)
+
+# ----------------------------
+# Structured schedule export (JSON / CSV / Parquet) and re-import
+# ----------------------------
+SCHEDULE_EXPORT_COLUMNS = ["division", "day", "start_min", "end_min", "start", "end", "kind", "group_id", "slot_base", "label",
+                           "course_code", "faculty", "assistants", "rooms", "basket", "block", "source"]
+
+def export_schedule(placements, base_path, formats):
+    # every placement as one row, written as base_path.<fmt> for each format (json / csv / parquet)
+    return write_tables(placement_rows(placements, detail=True), base_path, formats, SCHEDULE_EXPORT_COLUMNS)
+
+def placements_from_rows(ctx, rows):
+    # rebuild a placements dict (Placement.meta = the matching slot / basket record) from exported or saved
+    # rows; returns (placements, rows that match no current slot request). No conflict checks are made.
+    placements = {div: {d: [] for d in ctx["days"]} for div in ctx["div_names"]}
+    div_index = ctx["div_index"]
+    by_group = defaultdict(list)
+    by_slot = defaultdict(list)
+    for r in ctx["records"]:
+        by_group[(r.group_id, r.div_id)].append(r)
+        for div_id in r.merge_ids:
+            by_slot[(safe_upper(r.slot_base), r.kind, div_id)].append(r)
+    baskets_by_key = {r.key: r for r in ctx["basket_records"]}
+    baskets_by_slot = defaultdict(list)
+    for r in ctx["basket_records"]:
+        baskets_by_slot[(safe_upper(r.slot_base), r.kind)].append(r)
+    used = set()
+
+    def take_record(candidates, duration_min):
+        free = [r for r in candidates if r.rid not in used]
+        record = next((r for r in free if r.duration_min == duration_min), None) or (free[0] if free else None)
+        if record is not None:
+            used.add(record.rid)
+        return record
+
+    # one block per placement call; rows without a block id (a workbook) are grouped by slot and time
+    blocks = defaultdict(dict)
+    unmatched = []
+    for raw in rows:
+        row = normalize_previous_row(raw)
+        block = raw.get("block")
+        block = None if block is None or (isinstance(block, float) and math.isnan(block)) else int(block)
+        if row["division"] not in div_index or row["day"] not in ctx["days"]:
+            unmatched.append(raw)
+            continue
+        blocks[(row["basket"], row["slot_base"], row["kind"], row["day"], row["start_min"], row["end_min"], block)][row["division"]] = (row, raw)
+
+    for (is_basket, slot_base, kind, day, start_min, end_min, _), members in blocks.items():
+        left = list(members)
+        # several records can share a block (sections of one group meeting at the same time): take one
+        # record at a time and give it the divisions of its merge group
+        while left:
+            if is_basket:
+                record = baskets_by_key.get(members[left[0]][1].get("group_id")) or next(
+                    (b for b in baskets_by_slot.get((slot_base, kind), []) if div_index[left[0]] in b.div_ids), None)
+                covered = [d for d in left if record is not None and div_index[d] in record.div_ids]
+            else:
+                # the division whose request was placed, then each division's own group; merged copies listed
+                # under different course codes (a workbook cannot tell them apart) fall back to the slot name
+                source = safe_upper(members[left[0]][1].get("source") or "")
+                order = ([source] if source in left else []) + left
+                keys = [(by_group, (members[d][0]["group_id"], div_index[d])) for d in order] + [(by_slot, (slot_base, kind, div_index[d])) for d in order]
+                record = None
+                for table, key in keys:
+                    record = take_record(table.get(key, []), end_min - start_min)
+                    if record is not None:
                         break
-                if placed:
+                covered = [d for d in left if record is not None and div_index[d] in record.merge_ids]
+            if not covered:
+                break
+            for div in covered:
+                placements[div][day].append(Placement(start_min, end_min, record.label, record.kind, record))
+            left = [d for d in left if d not in covered]
+        unmatched.extend(members[d][1] for d in left)
+    for day_map in placements.values():
+        for plist in day_map.values():
+            plist.sort(key=lambda p: p.start_min)
+    return placements, unmatched
+
+def load_placements(path, ctx):
+    # placements of an exported schedule (or saved state / timetable workbook) for the requests in ctx
+    return placements_from_rows(ctx, read_previous_schedule(path) if path.lower().endswith((".xlsx", ".xlsm")) else read_table(path))
+
+# ----------------------------
+# Local-search repair of unscheduled items (min-conflicts moves on the best attempt)
+# ----------------------------
+def state_from_placements(ctx, placements):
+    # rebuild occupancy / counters / blocks from a placements dict (e.g. a stored best attempt)
+    state = new_schedule_state(ctx)
+    grouped = {}
+    for div, day_map in placements.items():
+        for day, plist in day_map.items():
+            for p in plist:
+                key = (id(p.meta), day, p.start_min)
+                grouped.setdefault(key, (p.meta, day, p.start_min, p.end_min, []))[4].append(ctx["div_index"][div])
+    for record, day, start_min, end_min, divs in grouped.values():
+        if isinstance(record, BasketRecord):
+            mark_basket_placement(ctx, state, record, day, start_min, end_min)
+        else:
+            mark_normal_placement(ctx, state, record, day, start_min, end_min, divs)
+    return state
+
+def unplace_block(ctx, state, block):
+    day = block["day"]
+    record = block["record"]
+    for div_id in block["divs"]:
+        plist = state["placements"][ctx["div_names"][div_id]][day]
+        for i, p in enumerate(plist):
+            if p.meta is record and p.start_min == block["start_min"]:
+                del plist[i]
+                break
+        state["day_load"][(div_id, day)] -= 1
+    for key in block["counted"]:
+        state["placed_counts"][key] -= 1
+    if block["basket"]:
+        state["occupancy"].remove(block["divs"], block["people"], block["rooms"], day, block["start_min"], block["end_min"])
+        state["placed_baskets"].discard(record.key)
+    else:
+        state["occupancy"].remove(block["divs"], block["people"], block["rooms"], day, block["start_min"], block["end_min"], block["group_id"], block["kind"])
+    state["blocks_by_day"][day].remove(block)
+
+def place_block_at(ctx, state, block, day, start_min):
+    end_min = start_min + (block["end_min"] - block["start_min"])
+    if block["basket"]:
+        return mark_basket_placement(ctx, state, block["record"], day, start_min, end_min)
+    return mark_normal_placement(ctx, state, block["record"], day, start_min, end_min, block["divs"])
+
+def place_block_anywhere(ctx, state, block):
+    duration_min = block["end_min"] - block["start_min"]
+    group_id = None if block["basket"] else block["group_id"]
+    found = state["occupancy"].first_start(block["divs"], block["people"], block["rooms"], days_by_load(ctx, state, block["divs"]), duration_min, group_id, block["kind"])
+    if found is None:
+        return None
+    return place_block_at(ctx, state, block, found[0], found[1])
+
+def blocking_blocks(ctx, state, item, day, start_min, end_min):
+    # placed blocks that stop item from sitting at [start_min, end_min) on day
+    mg = ctx["min_gap_minutes"]; fg = ctx["faculty_gap_minutes"]
+    divs = set(item["divs"])
+    found = []
+    for b in state["blocks_by_day"].get(day, ()):
+        overlap = start_min < b["end_min"] and end_min > b["start_min"]
+        if not divs.isdisjoint(b["divs"]):
+            if (start_min < b["end_min"] + mg and end_min + mg > b["start_min"]) or (item["group_id"] is not None and b["group_id"] == item["group_id"]):
+                found.append(b); continue
+        if overlap and not item["rooms"].isdisjoint(b["rooms"]):
+            found.append(b); continue
+        if not item["people"].isdisjoint(b["people"]) and not (end_min + fg <= b["start_min"] or start_min >= b["end_min"] + fg):
+            found.append(b)
+    return found
+
+def repair_item(ctx, state, item, deadline, max_candidates):
+    # min-conflicts move: clear the cheapest (day, start) window, place item there, re-place what was moved
+    duration_min = item["duration_min"]
+    candidates = []
+    for day in ctx["days"]:
+        for start_min in ctx["interval_times"]:
+            end_min = start_min + duration_min
+            if end_min > ctx["wh_end"]:
+                break
+            if any(start_min < be and end_min > bs for bs, be in ctx["break_ranges"]):
+                continue
+            blockers = blocking_blocks(ctx, state, item, day, start_min, end_min)
+            cost = (len(blockers), sum(b["end_min"] - b["start_min"] for b in blockers), random.random())
+            candidates.append((cost, day, start_min))
+    candidates.sort(key=lambda c: c[0])
+    for _, day, start_min in candidates[:max_candidates]:
+        if time.monotonic() >= deadline:
+            return False
+        # recomputed: blocks of an earlier, undone try are new objects now
+        blockers = blocking_blocks(ctx, state, item, day, start_min, start_min + duration_min)
+        for b in blockers:
+            unplace_block(ctx, state, b)
+        start_min = state["occupancy"].earliest_start(item["divs"], item["people"], item["rooms"], day, duration_min, item["group_id"], item["kind"])
+        if start_min is not None:
+            new_block = item["place"](day, start_min)
+            moved = []
+            for b in sorted(blockers, key=lambda b: b["start_min"] - b["end_min"]):
+                nb = place_block_anywhere(ctx, state, b)
+                if nb is None:
                     break
-            if not placed:
-                unscheduled.append({"basket_label": b_key})
-
-        uns_count = len(unscheduled)
-        if best_uns_count is None or uns_count < best_uns_count:
-            best_uns_count = uns_count
-            best_result = (copy.deepcopy(placements), [u for u in unscheduled], interval_times, base_interval, break_ranges)
-        if uns_count == 0:
-            break
+                moved.append(nb)
+            if len(moved) == len(blockers):
+                return True
+            # undo: drop the new placements, put the blockers back where they were
+            for nb in moved:
+                unplace_block(ctx, state, nb)
+            unplace_block(ctx, state, new_block)
+        for b in blockers:
+            place_block_at(ctx, state, b, b["day"], b["start_min"])
+    return False
+
+def repair_unscheduled(ctx, placements, unscheduled, time_budget_seconds, max_candidates=8):
+    deadline = time.monotonic() + time_budget_seconds
+    random.seed(3000)
+    state = state_from_placements(ctx, placements)
+    remaining = list(unscheduled)
+    progress = True
+    while remaining and time.monotonic() < deadline:
+        if not progress:
+            # nothing moved last round: widen the neighbourhood, give up once it covers every window
+            if max_candidates >= len(ctx["days"]) * len(ctx["interval_times"]):
+                break
+            max_candidates *= 2
+        progress = False
+        still = []
+        for u in remaining:
+            if time.monotonic() >= deadline or not isinstance(u, (SlotRecord, BasketRecord)):
+                still.append(u); continue
+            if isinstance(u, BasketRecord):
+                if place_basket(ctx, state, u):
+                    progress = True; continue
+                item = {"divs": u.div_ids, "people": u.people, "rooms": u.rooms, "duration_min": u.duration_min, "group_id": None, "kind": u.kind,
+                        "place": lambda day, start_min, u=u: mark_basket_placement(ctx, state, u, day, start_min, start_min + u.duration_min)}
+            else:
+                if place_normal_slot(ctx, state, u):
+                    progress = True; continue
+                item = {"divs": u.merge_ids, "people": u.people, "rooms": u.rooms, "duration_min": u.duration_min, "group_id": u.gid, "kind": u.kind,
+                        "place": lambda day, start_min, u=u: mark_normal_placement(ctx, state, u, day, start_min, start_min + u.duration_min)}
+            if repair_item(ctx, state, item, deadline, max_candidates):
+                progress = True
+            else:
+                still.append(u)
+        remaining = still
+    return state["placements"], remaining
+
+# ----------------------------
+# Unscheduled diagnostics: why each leftover slot / basket found no start in the final timetable
+# ----------------------------
+CONFLICT_ENTITY = {"division_overlap": "division", "room_overlap": "room", "person_overlap": "person", "faculty_gap": "person"}
+
+def diagnose_item(ctx, occupancy, record, top=5):
+    # every grid start on every day: rejection histogram (first reason, as in the profile report),
+    # entities blocking the most starts, and the start blocked by the fewest entities (near miss)
+    if isinstance(record, BasketRecord):
+        divs, group_id, kind = record.div_ids, None, None
+    else:
+        divs, group_id, kind = record.merge_ids, record.gid, record.kind
+    names = {"division": ctx["div_names"], "room": ctx["room_names"], "person": ctx["person_names"]}
+    rejections = defaultdict(int)
+    blocking = defaultdict(int)
+    near_miss = None
+    candidates = 0; free = 0
+    for day in ctx["days"]:
+        for cand in ctx["interval_times"]:
+            candidates += 1
+            start, conflicts = start_conflicts(occupancy, divs, record.people, record.rooms, day, cand, record.duration_min, group_id, kind)
+            if not conflicts:
+                free += 1
+                continue
+            rejections[conflicts[0][0]] += 1
+            if conflicts[0][0] not in CONFLICT_ENTITY:
+                continue
+            blocked_by = [{"entity": CONFLICT_ENTITY[reason], "name": names[CONFLICT_ENTITY[reason]][ent], "reason": reason} for reason, ent in conflicts]
+            for b in blocked_by:
+                blocking[(b["entity"], b["name"], b["reason"])] += 1
+            if near_miss is None or len(blocked_by) < len(near_miss["blocked_by"]):
+                near_miss = {"day": day, "start": minutes_to_time(start), "blocked_by": blocked_by}
+    top_blocking = sorted(blocking.items(), key=lambda kv: (-kv[1], kv[0]))[:top]
+    return {
+        "candidates": candidates,
+        "free_candidates": free,
+        "rejections": {r: rejections[r] for r in REJECTION_REASONS if rejections[r]},
+        "blocking": [{"entity": e, "name": n, "reason": r, "candidates": c} for (e, n, r), c in top_blocking],
+        "near_miss": near_miss,
+    }
+
+def diagnose_unscheduled(ctx, placements, unscheduled):
+    # diagnostics per unscheduled record (None for anything else), checked against the final placements
+    occupancy = state_from_placements(ctx, placements)["occupancy"]
+    return [diagnose_item(ctx, occupancy, u) if isinstance(u, (SlotRecord, BasketRecord)) else None for u in unscheduled]
+
+def schedule_globally(all_normals_per_div, all_baskets, settings, min_gap_minutes, faculty_gap_minutes, max_attempts=20, workers=1, state_path=None, incremental=False, repair_seconds=0, profile=None, time_budget=None, progress=None, warm_start=None):
+    # profile: optional ScheduleProfile collecting phase timings and feasibility counters
+    # warm_start: placement rows of a previous timetable (load_warm_start), tried first for matching groups
+    # time_budget: seconds of restarts (anytime mode) instead of max_attempts; the best attempt so far is
+    # returned when it runs out. progress: optional callback receiving event dicts (see jsonl_progress)
+    t0 = time.time()
+    deadline = t0 + time_budget if time_budget else None
+    with profile_phase(profile, "context_build"):
+        ctx = build_schedule_context(all_normals_per_div, all_baskets, settings, min_gap_minutes, faculty_gap_minutes)
+    ctx["profile"] = profile
+    interval_times = ctx["interval_times"]; base_interval = ctx["base_interval"]; break_ranges = ctx["break_ranges"]
+
+    # settings "capacity_check": "warn" (default) reports provably infeasible inputs, "fail" stops before searching, "off" skips
+    capacity_mode = str(settings.get("capacity_check", "warn")).lower()
+    if capacity_mode != "off":
+        with profile_phase(profile, "capacity_check"):
+            issues = capacity_issues(ctx)
+        if issues:
+            report_capacity_issues(issues)
+            if capacity_mode == "fail":
+                raise ValueError(f"Capacity check failed: {len(issues)} provably infeasible item(s)")
+
+    prev_state = load_schedule_state(state_path) if incremental else None
+    if prev_state is not None and prev_state.get("config") != schedule_config_key(ctx):
+        print(" Incremental: settings or gaps changed since the saved run — rescheduling from scratch")
+        prev_state = None
+
+    if prev_state is None and warm_start:
+        ctx["warm_hints"] = warm_start_hints(ctx, warm_start)
+        print(f" Warm start: {len(warm_start)} previous placement(s), hints for {sum(1 for k in ctx['warm_hints'] if isinstance(k, str))} group(s)/basket(s)")
+
+    # settings "decompose": schedule independent components (no shared division, person or room) separately
+    components = interaction_components(ctx) if prev_state is None and settings.get("decompose", False) else []
+
+    emit_progress(progress, t0, event="start", items=len(ctx["records"]) + len(ctx["basket_records"]), time_budget=time_budget)
+    if prev_state is not None:
+        with profile_phase(profile, "incremental"):
+            best_result = reschedule_incremental(ctx, prev_state, max_attempts)
+    elif len(components) > 1:
+        print(f" Decomposed into {len(components)} independent components")
+        best_result = schedule_components(ctx, components, max_attempts, workers, deadline, progress, t0) + (interval_times, base_interval, break_ranges)
+    elif workers and workers > 1 and (max_attempts > 1 or deadline is not None):
+        best_result = schedule_attempts_parallel(ctx, max_attempts, workers, deadline, progress, t0)
+    else:
+        # We'll store placements now as minute-based entries:
+        # placements[division][day] = [Placement(start_min, end_min, label, kind, meta)]
+        # (each attempt builds a fresh placements dict, so the best one is kept without copying)
+        best = best_of_attempts(ctx, max_attempts, deadline, progress, t0)
+        best_result = best + (interval_times, base_interval, break_ranges) if best is not None else None
+
+    if profile is not None:
+        profile.end_run()
 
     if best_result is None:
-        placements = {safe_upper(div): {d: [] for d in days} for div in all_normals_per_div.keys()}
+        emit_progress(progress, t0, event="done", best_unscheduled=None, timed_out=deadline is not None and time.time() >= deadline)
+        placements = {div: {d: [] for d in ctx["days"]} for div in ctx["div_names"]}
         return placements, ["Scheduling failed (no valid attempt)"], interval_times, base_interval, break_ranges
 
-    return best_result
+    if repair_seconds and repair_seconds > 0 and best_result[1]:
+        before = len(best_result[1])
+        with profile_phase(profile, "repair"):
+            placements, unscheduled = repair_unscheduled(ctx, best_result[0], best_result[1], repair_seconds)
+        print(f" Repair: {before} -> {len(unscheduled)} unscheduled item(s)")
+        best_result = (placements, unscheduled, interval_times, base_interval, break_ranges)
+        emit_progress(progress, t0, event="repair", unscheduled_before=before, best_unscheduled=len(unscheduled))
+    emit_progress(progress, t0, event="done", best_unscheduled=len(best_result[1]), timed_out=deadline is not None and time.time() >= deadline)
+
+    if ctx.get("warm_hints") is not None:
+        kept, previous = warm_start_kept(ctx, best_result[0], warm_start)
+        print(f" Warm start: {kept}/{previous} previous block(s) kept at the same day and time")
+    if state_path:
+        save_schedule_state(state_path, ctx, best_result[0])
+    reports = [unscheduled_report(u) for u in best_result[1]]
+    # settings "unscheduled_diagnostics": false skips the per-item rejection histograms
+    if best_result[1] and settings.get("unscheduled_diagnostics", True):
+        with profile_phase(profile, "diagnostics"):
+            diagnostics = diagnose_unscheduled(ctx, best_result[0], best_result[1])
+        reports = [dict(r, diagnostics=d) if d is not None else r for r, d in zip(reports, diagnostics)]
+    return (best_result[0], reports) + tuple(best_result[2:])
+# ----------------------------
+# Multi-year engine: every year of a half in one pass (shared person & room calendar)
+# ----------------------------
+def schedule_all_years(normals_per_year, baskets_per_year, settings, min_gap_minutes, faculty_gap_minutes, max_attempts=20, workers=1, state_path=None, incremental=False, repair_seconds=0, profile=None, time_budget=None, progress=None, warm_start=None):
+    # Division names carry the year (1CSEA, 3CSEA, ...) so they can share one placements dict;
+    # basket keys (ELECTIVE-1__lec, ...) repeat across years and are namespaced per year.
+    all_normals = {}
+    div_year = {}
+    for year, normals in normals_per_year.items():
+        for div, slots in normals.items():
+            div_up = safe_upper(div)
+            if div_up in div_year:
+                raise ValueError(f"Division {div_up} appears in both Year {div_year[div_up]} and Year {year}")
+            div_year[div_up] = year
+            all_normals[div] = slots
+    all_baskets = {}
+    basket_owner = {}
+    for year, baskets in baskets_per_year.items():
+        for b_key, members in baskets.items():
+            year_key = f"{b_key}__Y{year}"
+            all_baskets[year_key] = members
+            basket_owner[f"BASKET__{year_key}"] = (year, f"BASKET__{b_key}")
+
+    placements, unscheduled, interval_times, base_interval, break_ranges = schedule_globally(all_normals, all_baskets, settings, min_gap_minutes, faculty_gap_minutes, max_attempts=max_attempts, workers=workers, state_path=state_path, incremental=incremental, repair_seconds=repair_seconds, profile=profile,
+                                                                                         time_budget=time_budget, progress=progress, warm_start=warm_start)
+
+    # split the shared result back into the per-year shape schedule_globally returns
+    per_year = {}
+    for year, normals in normals_per_year.items():
+        year_placements = {safe_upper(div): placements[safe_upper(div)] for div in normals.keys()}
+        per_year[year] = (year_placements, [], interval_times, base_interval, break_ranges)
+    for u in unscheduled:
+        if isinstance(u, dict) and u.get("basket_label") in basket_owner:
+            year, gid = basket_owner[u["basket_label"]]
+            per_year[year][1].append(dict(u, basket_label=gid))
+        elif isinstance(u, dict) and safe_upper(u.get("_division", u.get("division", ""))) in div_year:
+            per_year[div_year[safe_upper(u.get("_division", u.get("division", "")))]][1].append(u)
+        else:
+            for year in per_year:
+                per_year[year][1].append(u)
+    return per_year
 # ----------------------------
 # Excel utilities (minute-aware)
 # ----------------------------
@@ -677,9 +2344,22 @@ def unmerge_ranges_overlapping(ws, row, col_start, col_end):
 # ----------------------------
 # Build unallotted rows helper
 # ----------------------------
+def diagnostic_columns(diag):
+    # Unallotted-sheet text for one item's diagnostics (see diagnose_item)
+    if not diag:
+        return {"REJECTIONS": "", "BLOCKED BY": "", "NEAREST START": ""}
+    rejections = ", ".join(f"{r} {n}" for r, n in sorted(diag["rejections"].items(), key=lambda kv: -kv[1]))
+    blocked = "; ".join(f"{b['entity']} {b['name']} ({b['reason']}) x{b['candidates']}" for b in diag["blocking"])
+    near = diag.get("near_miss")
+    nearest = ""
+    if near:
+        nearest = f"{near['day']} {near['start']} - blocked by " + ", ".join(f"{b['entity']} {b['name']} ({b['reason']})" for b in near["blocked_by"])
+    return {"REJECTIONS": f"{rejections} (of {diag['candidates']} starts)", "BLOCKED BY": blocked, "NEAREST START": nearest}
+
 def build_unallotted_rows(unscheduled_list, baskets_map):
     rows = []
     for u in unscheduled_list:
+        first_row = len(rows)
         if isinstance(u, dict) and "basket_label" in u:
             bkey = u["basket_label"]
             members = baskets_map.get(bkey, [])
@@ -766,23 +2446,45 @@ def build_unallotted_rows(unscheduled_list, baskets_map):
                 "MERGE": "",
                 "REASON": "NO VALID SLOT (UNKNOWN ITEM)"
             })
+        diag_cols = diagnostic_columns(u.get("diagnostics") if isinstance(u, dict) else None)
+        for row in rows[first_row:]:
+            row.update(diag_cols)
     return rows
 
-# ----------------------------
-# Write Excel (minute-aware header generation)
-# ----------------------------
-def write_year_excel(year, half_tag, placements, initial_interval_times, base_interval, break_ranges, colors, course_info_rows_per_div, settings, outdir=None, unallotted_rows=None):
+def write_year_export(year, half_tag, placements, formats, outdir=None):
+    # Timetable_Year<y>_<half>.<fmt> next to the workbook (export_schedule columns)
+    if outdir is None:
+        outdir = os.path.join("timetable_outputs", f"Year_{year}")
+    for path in export_schedule(placements, os.path.join(outdir, f"Timetable_Year{year}_{half_tag}"), formats):
+        print(f"Saved: {path}")
+
+def write_unallotted_sidecar(year, half_tag, unscheduled_list, outdir=None):
+    # JSON next to the workbook: every unscheduled slot / basket with its full diagnostics
     if outdir is None:
         outdir = os.path.join("timetable_outputs", f"Year_{year}")
     os.makedirs(outdir, exist_ok=True)
-    fname = os.path.join(outdir, f"Timetable_Year{year}_{half_tag}.xlsx")
-    wb = Workbook()
-    try:
-        wb.remove(wb.active)
-    except Exception:
-        pass
-    days = settings["working_days"]
+    fname = os.path.join(outdir, f"Timetable_Year{year}_{half_tag}_unallotted.json")
+    items = []
+    for u in unscheduled_list:
+        if isinstance(u, dict) and "basket_label" in u:
+            items.append({"basket": u["basket_label"], "diagnostics": u.get("diagnostics")})
+        elif isinstance(u, dict):
+            items.append({"division": safe_upper(u.get("division", u.get("_division", ""))), "slot": u.get("slot_label", ""), "code": u.get("code", ""),
+                          "kind": u.get("kind", ""), "faculty": u.get("faculty") or [], "duration_min": u.get("_duration_min"), "diagnostics": u.get("diagnostics")})
+        else:
+            items.append({"item": str(u), "diagnostics": None})
+    with open(fname, "w") as f:
+        json.dump(items, f, indent=2)
+    return fname
 
+# ----------------------------
+# Write Excel (minute-aware header generation)
+# ----------------------------
+REFERENCE_COLUMNS = ["SLOT NAME", "FULLSEM OR HALFSEM", "COURSE CODE", "COURSE TITLE", "FACULTY", "CLASS ASSISTANTS", "LAB ASSISTANTS", "L-T-P-S-C", "ROOM.NO", "LAB ROOM.NO"]
+UNALLOTTED_COLUMNS = ["DIVISION", "SLOT NAME", "COURSE CODE", "COURSE NAME", "KIND", "FACULTY", "CLASS ASSISTANTS", "LAB ASSISTANTS", "ROOM.NO", "LAB ROOM.NO", "MERGE", "REASON",
+                      "REJECTIONS", "BLOCKED BY", "NEAREST START"]
+
+def timetable_time_intervals(placements, initial_interval_times, base_interval, break_ranges, settings):
     # Build a set of boundaries: include original interval boundaries and all placement start/end and break boundaries
     boundaries = set()
     wh_start = time_to_minutes(settings["working_hours"][0])
@@ -798,8 +2500,8 @@ def write_year_excel(year, half_tag, placements, initial_interval_times, base_in
     for div, day_map in placements.items():
         for day, plist in day_map.items():
             for p in plist:
-                boundaries.add(p["start_min"])
-                boundaries.add(p["end_min"])
+                boundaries.add(p.start_min)
+                boundaries.add(p.end_min)
     # clamp boundaries to working hours and create sorted list
     boundaries = sorted([b for b in boundaries if b >= wh_start and b <= wh_end])
     # if boundaries does not include start or end, add them
@@ -813,21 +2515,58 @@ def write_year_excel(year, half_tag, placements, initial_interval_times, base_in
         s = boundaries[i]; e = boundaries[i+1]
         if e > s:
             time_intervals.append((s, e))
+    return time_intervals
+
+def placement_label_and_color(p, colors):
+    # cell label and fill colour (hex, no '#') of a placement; unknown slot bases get a random colour once
+    label = p.label or ((p.meta.slot_base or "") + "-" + (p.kind or "").upper())
+    slot_base = p.meta.slot_base
+    if not slot_base:
+        if isinstance(label, str) and "-" in label:
+            slot_base = "-".join(label.split("-")[:-1])
+        else:
+            slot_base = label
+    if slot_base in colors:
+        fill_color = colors[slot_base]
+    else:
+        fill_color = "#" + "".join(random.choices("0123456789ABCDEF", k=6))
+        colors[slot_base] = fill_color
+    color_code = fill_color[1:] if str(fill_color).startswith("#") else str(fill_color)
+    if not (isinstance(color_code, str) and len(color_code) in (6,8) and all(ch in "0123456789ABCDEFabcdef" for ch in color_code)):
+        color_code = "DDDDDD"
+    return label, color_code
+
+def division_sheet_title(wb, div, div_index):
+    title_candidate = safe_sheet_title(div)
+    if title_candidate is None:
+        title_candidate = f"Div_{div_index}"
+    base_title = title_candidate
+    suffix = 1
+    while title_candidate in wb.sheetnames:
+        title_candidate = f"{base_title[:28]}_{suffix}"
+        suffix += 1
+    return title_candidate
+
+def write_year_excel(year, half_tag, placements, initial_interval_times, base_interval, break_ranges, colors, course_info_rows_per_div, settings, outdir=None, unallotted_rows=None):
+    if outdir is None:
+        outdir = os.path.join("timetable_outputs", f"Year_{year}")
+    os.makedirs(outdir, exist_ok=True)
+    fname = os.path.join(outdir, f"Timetable_Year{year}_{half_tag}.xlsx")
+    wb = Workbook()
+    try:
+        wb.remove(wb.active)
+    except Exception:
+        pass
+    days = settings["working_days"]
+
+    time_intervals = timetable_time_intervals(placements, initial_interval_times, base_interval, break_ranges, settings)
 
     # Build header strings for each computed interval
     time_headers = [f"{minutes_to_time(s)} - {minutes_to_time(e)}" for s, e in time_intervals]
 
     # For each division, create sheet and fill the grid
     for div_index, (div, day_map) in enumerate(placements.items(), start=1):
-        title_candidate = safe_sheet_title(div)
-        if title_candidate is None:
-            title_candidate = f"Div_{div_index}"
-        base_title = title_candidate
-        suffix = 1
-        while title_candidate in wb.sheetnames:
-            title_candidate = f"{base_title[:28]}_{suffix}"
-            suffix += 1
-        ws = wb.create_sheet(title=title_candidate)
+        ws = wb.create_sheet(title=division_sheet_title(wb, div, div_index))
         ws.append([f"Division: {div}    Year: {year}    Half: {half_tag}"])
         ws.append([])
         header = ["Day/Time"] + time_headers
@@ -843,7 +2582,7 @@ def write_year_excel(year, half_tag, placements, initial_interval_times, base_in
         def find_placement_covering(plist, cell_start, cell_end):
             for p in plist:
                 # placement covers this cell if [cell_start, cell_end) is within [p.start, p.end)
-                if not (cell_end <= p["start_min"] or cell_start >= p["end_min"]):
+                if not (cell_end <= p.start_min or cell_start >= p.end_min):
                     # We want to assign label only if the cell is mostly within the placement
                     # We'll return the placement if overlap exists (this keeps cells representing parts of the class)
                     return p
@@ -861,7 +2600,7 @@ def write_year_excel(year, half_tag, placements, initial_interval_times, base_in
                     # But we want to show class cells: write label for part of class
                     # To avoid repeated writing many times, we'll write label at start boundary of that placement
                     # Find if this cell is the left-most cell inside that placement for this day/div
-                    is_leftmost = (cell_s == p["start_min"])
+                    is_leftmost = (cell_s == p.start_min)
                     if is_leftmost:
                         # compute how many consecutive interval cells belong to this same placement (for merging)
                         span = 0
@@ -869,33 +2608,16 @@ def write_year_excel(year, half_tag, placements, initial_interval_times, base_in
                         while cc < len(time_intervals):
                             cs, ce = time_intervals[cc]
                             # if this interval overlaps with p
-                            if not (ce <= p["start_min"] or cs >= p["end_min"]):
+                            if not (ce <= p.start_min or cs >= p.end_min):
                                 span += 1
                                 cc += 1
                             else:
                                 break
-                        label = p.get("label") or (p.get("meta", {}).get("slot_base","") + "-" + (p.get("kind","")).upper() if isinstance(p.get("meta",{}), dict) else "")
+                        label, color_code = placement_label_and_color(p, colors)
                         col_start = excel_col
                         col_end = excel_col + span - 1
                         set_value_in_merged_region(ws, excel_row, col_start, col_end, label)
                         # style cells
-                        slot_base = None
-                        meta = p.get("meta", {})
-                        if isinstance(meta, dict):
-                            slot_base = meta.get("slot_base")
-                        if not slot_base:
-                            if isinstance(label, str) and "-" in label:
-                                slot_base = "-".join(label.split("-")[:-1])
-                            else:
-                                slot_base = label
-                        if slot_base in colors:
-                            fill_color = colors[slot_base]
-                        else:
-                            fill_color = "#" + "".join(random.choices("0123456789ABCDEF", k=6))
-                            colors[slot_base] = fill_color
-                        color_code = fill_color[1:] if str(fill_color).startswith("#") else str(fill_color)
-                        if not (isinstance(color_code, str) and len(color_code) in (6,8) and all(ch in "0123456789ABCDEFabcdef" for ch in color_code)):
-                            color_code = "DDDDDD"
                         for cc in range(col_start, col_end + 1):
                             ccell = ws.cell(row=excel_row, column=cc)
                             ccell.fill = PatternFill(start_color=color_code, end_color=color_code, fill_type="solid")
@@ -925,18 +2647,9 @@ def write_year_excel(year, half_tag, placements, initial_interval_times, base_in
         # reference table
         ws.append([])
         ws.append(["Reference Table"])
-        ref_columns = ["SLOT NAME", "FULLSEM OR HALFSEM", "COURSE CODE", "COURSE TITLE", "FACULTY", "CLASS ASSISTANTS", "LAB ASSISTANTS", "L-T-P-S-C", "ROOM.NO", "LAB ROOM.NO"]
-        ws.append(ref_columns)
-        raw_rows = course_info_rows_per_div.get(div, [])
-        for r in raw_rows:
-            row_values = []
-            for col in ref_columns:
-                if col == "FULLSEM OR HALFSEM":
-                    val = r.get("FULLSEM OR HALFSEM", "")
-                else:
-                    val = r.get(col, "")
-                row_values.append(val)
-            ws.append(row_values)
+        ws.append(REFERENCE_COLUMNS)
+        for r in course_info_rows_per_div.get(div, []):
+            ws.append([r.get(col, "") for col in REFERENCE_COLUMNS])
 
     # Unallotted
     if unallotted_rows:
@@ -949,20 +2662,348 @@ def write_year_excel(year, half_tag, placements, initial_interval_times, base_in
                 name_try = f"Unallotted Slots_{suffix}"
                 suffix += 1
             ws_un = wb.create_sheet(title=name_try)
-        un_cols = ["DIVISION", "SLOT NAME", "COURSE CODE", "COURSE NAME", "KIND", "FACULTY", "CLASS ASSISTANTS", "LAB ASSISTANTS", "ROOM.NO", "LAB ROOM.NO", "MERGE", "REASON"]
-        ws_un.append(un_cols)
+        ws_un.append(UNALLOTTED_COLUMNS)
         for ur in unallotted_rows:
-            row_vals = [ur.get(c, "") for c in un_cols]
-            ws_un.append(row_vals)
+            ws_un.append([ur.get(c, "") for c in UNALLOTTED_COLUMNS])
+
+    if not wb.sheetnames:
+        wb.create_sheet(title="Timetable")
+    wb.save(fname)
+    print(f"Saved: {fname}")
+
+# Write-only variant of write_year_excel: same sheets, one sorted sweep per division/day, rows streamed
+# through openpyxl's write-only mode with style objects shared across cells.
+def write_year_excel_streaming(year, half_tag, placements, initial_interval_times, base_interval, break_ranges, colors, course_info_rows_per_div, settings, outdir=None, unallotted_rows=None):
+    if outdir is None:
+        outdir = os.path.join("timetable_outputs", f"Year_{year}")
+    os.makedirs(outdir, exist_ok=True)
+    fname = os.path.join(outdir, f"Timetable_Year{year}_{half_tag}.xlsx")
+    wb = Workbook(write_only=True)
+    days = settings["working_days"]
+
+    time_intervals = timetable_time_intervals(placements, initial_interval_times, base_interval, break_ranges, settings)
+    time_headers = [f"{minutes_to_time(s)} - {minutes_to_time(e)}" for s, e in time_intervals]
+    interval_starts = [s for s, _ in time_intervals]
+    # break cells are the same on every row
+    break_cols = {c for c, (cs, ce) in enumerate(time_intervals) if any(cs >= bs and ce <= be for bs, be in break_ranges)}
+
+    slot_font = Font(size=10, bold=True)
+    slot_alignment = Alignment(horizontal="center", vertical="center", wrap_text=True)
+    break_fill = PatternFill(start_color="EEEEEE", end_color="EEEEEE", fill_type="solid")
+    break_alignment = Alignment(horizontal="center", vertical="center")
+    fills = {}
+
+    def styled_cell(ws, value, fill, alignment, font=None):
+        cell = WriteOnlyCell(ws, value=value)
+        cell.fill = fill
+        cell.alignment = alignment
+        if font is not None:
+            cell.font = font
+        return cell
+
+    for div_index, (div, day_map) in enumerate(placements.items(), start=1):
+        ws = wb.create_sheet(title=division_sheet_title(wb, div, div_index))
+        # column widths go before the first row in write-only mode
+        ws.column_dimensions[get_column_letter(1)].width = 14
+        for ci in range(2, 2 + len(time_intervals)):
+            ws.column_dimensions[get_column_letter(ci)].width = 18
+        ws.append([f"Division: {div}    Year: {year}    Half: {half_tag}"])
+        ws.append([])
+        ws.append(["Day/Time"] + time_headers)
+        first_day_row = 4
+
+        for r_idx, day in enumerate(days):
+            excel_row = first_day_row + r_idx
+            row = [day] + [None] * len(time_intervals)
+            covered = set()
+            # placements of one division never overlap: each starts on a boundary and spans whole intervals
+            for p in sorted(day_map.get(day, []), key=lambda p: p.start_min):
+                c_start = bisect.bisect_left(interval_starts, p.start_min)
+                c_end = bisect.bisect_left(interval_starts, p.end_min)
+                if c_start >= c_end or interval_starts[c_start] != p.start_min:
+                    continue
+                label, color_code = placement_label_and_color(p, colors)
+                fill = fills.get(color_code)
+                if fill is None:
+                    fill = fills[color_code] = PatternFill(start_color=color_code, end_color=color_code, fill_type="solid")
+                for c in range(c_start, c_end):
+                    row[1 + c] = styled_cell(ws, label if c == c_start else None, fill, slot_alignment, slot_font)
+                    covered.add(c)
+                if c_end - c_start > 1:
+                    ws.merged_cells.add(CellRange(min_col=2 + c_start, min_row=excel_row, max_col=1 + c_end, max_row=excel_row))
+            for c in break_cols - covered:
+                row[1 + c] = styled_cell(ws, "BREAK", break_fill, break_alignment)
+            ws.append(row)
+
+        # reference table
+        ws.append([])
+        ws.append(["Reference Table"])
+        ws.append(REFERENCE_COLUMNS)
+        for r in course_info_rows_per_div.get(div, []):
+            ws.append([r.get(col, "") for col in REFERENCE_COLUMNS])
+
+    if unallotted_rows:
+        ws_un = wb.create_sheet(title="Unallotted Slots")
+        ws_un.append(UNALLOTTED_COLUMNS)
+        for ur in unallotted_rows:
+            ws_un.append([ur.get(c, "") for c in UNALLOTTED_COLUMNS])
 
     if not wb.sheetnames:
         wb.create_sheet(title="Timetable")
     wb.save(fname)
     print(f"Saved: {fname}")
 
+# ----------------------------
+# Per-year input loading
+# ----------------------------
+def parse_division_file(path, div_full, settings, profile=None):
+    # (reference rows, normal slot requests, baskets) for one division workbook, via the parsed-input cache
+    def build():
+        with profile_phase(profile, "load"):
+            df = read_input_file(path)
+        with profile_phase(profile, "slot_request_build"):
+            normals, baskets, _ = build_slot_requests_for_division(df, div_full, settings)
+            return df.to_dict(orient='records'), normals, baskets
+    return cached_parse("division", path, division_cache_params(div_full, settings), build, settings.get("input_cache_dir"), settings.get("input_cache", True))
+
+def division_cache_params(div_full, settings):
+    return {"division": div_full, "slot_durations": settings["slot_durations"]}
+
+def _parse_division_profiled(path, div_full, settings):
+    # pool worker: parse with a local profile and send its timings back to the parent
+    profile = ScheduleProfile()
+    return parse_division_file(path, div_full, settings, profile), profile.to_dict()
+
+def load_year_inputs(div_paths, settings, parsed=None, profile=None):
+    # parsed: optional {(path, division): parse_division_file(...)} already loaded (see load_all_year_inputs)
+    normals_first = {}
+    normals_second = {}
+    baskets_first = {}
+    baskets_second = {}
+    course_info_rows = {}
+    slot_bases_set = set()
+    for div_full, path in div_paths.items():
+        div_up = safe_upper(div_full)
+        if not os.path.exists(path):
+            print(f" File not found: {path} for {div_full} — skipping division")
+            normals_first[div_up] = []
+            normals_second[div_up] = []
+            course_info_rows[div_up] = []
+            continue
+        rows, normals, baskets = parsed[(path, div_full)] if parsed and (path, div_full) in parsed else parse_division_file(path, div_full, settings, profile)
+        course_info_rows[div_up] = rows
+        normals_f = [n for n in normals if safe_upper(n.get("sem_type", "FULLSEM")) in ("FULLSEM", "HALFSEM-1")]
+        normals_s = [n for n in normals if safe_upper(n.get("sem_type", "FULLSEM")) in ("FULLSEM", "HALFSEM-2")]
+        normals_first[div_up] = normals_f
+        normals_second[div_up] = normals_s
+        for b_key, members in baskets.items():
+            sems = [safe_upper(m.get("sem_type", "FULLSEM")) for m in members]
+            if any(s in ("FULLSEM", "HALFSEM-1") for s in sems):
+                baskets_first.setdefault(b_key, []).extend(members)
+            if any(s in ("FULLSEM", "HALFSEM-2") for s in sems):
+                baskets_second.setdefault(b_key, []).extend(members)
+        for n in normals:
+            sb = n.get("slot_base") or ""
+            if sb:
+                slot_bases_set.add(sb)
+    return {
+        "normals_first": normals_first,
+        "normals_second": normals_second,
+        "baskets_first": baskets_first,
+        "baskets_second": baskets_second,
+        "course_info_rows": course_info_rows,
+        "slot_bases": slot_bases_set,
+    }
+
+def load_all_year_inputs(inputs_per_year, settings, workers=1, profile=None):
+    # read & parse every division workbook on a process pool, then assemble each year as load_year_inputs does
+    parsed = {}
+    jobs = [(path, div_full) for div_paths in inputs_per_year.values() for div_full, path in div_paths.items() if os.path.exists(path)]
+    if settings.get("input_cache", True):
+        # cache hits are cheaper than a pool round-trip; only the misses are parsed by workers
+        for path, div_full in jobs:
+            with profile_phase(profile, "load"):
+                hit = cache_lookup("division", path, division_cache_params(div_full, settings), settings.get("input_cache_dir"))
+            if hit is not None:
+                parsed[(path, div_full)] = hit
+        jobs = [job for job in jobs if job not in parsed]
+    if workers and workers > 1 and len(jobs) > 1:
+        with ProcessPoolExecutor(max_workers=min(workers, len(jobs))) as pool:
+            if profile is not None:
+                futures = {pool.submit(_parse_division_profiled, path, div_full, settings): (path, div_full) for path, div_full in jobs}
+            else:
+                futures = {pool.submit(parse_division_file, path, div_full, settings): (path, div_full) for path, div_full in jobs}
+            for fut in as_completed(futures):
+                if profile is not None:
+                    parsed[futures[fut]], profile_data = fut.result()
+                    profile.merge(profile_data)
+                else:
+                    parsed[futures[fut]] = fut.result()
+    year_inputs = {}
+    for y, div_paths in inputs_per_year.items():
+        print(f"\nLoading Year {y} ...")
+        year_inputs[y] = load_year_inputs(div_paths, settings, parsed, profile)
+    return year_inputs
+
+def build_slot_colors(slot_bases_set):
+    # deterministic colors
+    colors = {}
+    palette = [
+        "FF5733", "FF8D1A", "FFC300", "FFEA00", "9AFB60", "2ECC71", "27AE60",
+        "00B2FF", "3498DB", "6C5CE7", "9B59B6", "F06292", "FFB6C1", "FF7F50",
+        "D35400", "E67E22", "F39C12", "F1C40F", "1ABC9C", "16A085"
+    ]
+    slot_bases_sorted = sorted(list(slot_bases_set))
+    for i, s in enumerate(slot_bases_sorted):
+        if i < len(palette):
+            colors[s] = "#" + palette[i]
+        else:
+            while True:
+                rnd_color = "#" + "".join(random.choices("0123456789ABCDEF", k=6))
+                if rnd_color not in colors.values():
+                    colors[s] = rnd_color
+                    break
+    return colors
+
 # ----------------------------
 # Main program
 # ----------------------------
+# saved placements for incremental runs (see settings.json "incremental")
+STATE_DIR = os.path.join("timetable_outputs", "schedule_state")
+
+# Hardcoded academic years and their division input paths
+INPUTS_PER_YEAR = {
+    1: {"1CSEA": r"data\1CSEA.xlsx",
+        "1CSEB": r"data\1CSEB.xlsx",
+        "1DSAI": r"data\1DSAI.xlsx",
+        "1ECE": r"data\1ECE.xlsx"},
+    2: {"2CSEA": r"data\2CSEA.xlsx",
+        "2CSEB": r"data\2CSEB.xlsx",
+        "2DSAI": r"data\2DSAI.xlsx",
+        "2ECE": r"data\2ECE.xlsx"},
+    3: {"3CSEA": r"data\3CSEA.xlsx",
+        "3CSEB": r"data\3CSEB.xlsx",
+        "3DSAI": r"data\3DSAI.xlsx",
+        "3ECE": r"data\3ECE.xlsx"},
+    4: {"4CSEA": r"data\4CSEA.xlsx",
+        "4CSEB": r"data\4CSEB.xlsx",
+        "4DSAI": r"data\4DSAI.xlsx",
+        "4ECE": r"data\4ECE.xlsx"}
+}
+
+def schedule_halves(year_inputs, settings, min_gap, faculty_gap, workers=1, incremental=False, repair_seconds=0, state_dir=None, profile=None, time_budget=None, progress=None):
+    # both halves of every year -> ({year: result}, {year: result}); state_dir=None skips the saved state.
+    # time_budget applies to each scheduling pass; progress events are tagged with the half (and year)
+    def state_path(name):
+        return os.path.join(state_dir, name) if state_dir else None
+    def tagged(**tags):
+        return (lambda event: progress(dict(tags, **event))) if progress is not None else None
+    # settings "warm_start": previous timetable file(s) (path / glob / list) whose placements are tried first
+    warm_first = load_warm_start(settings.get("warm_start"), "first") if settings.get("warm_start") else None
+    warm_second = load_warm_start(settings.get("warm_start"), "second") if settings.get("warm_start") else None
+    if settings.get("shared_calendar", True):
+        # one pass per half over every year: shared faculty/room calendar, setup done once
+        print("\nScheduling all years together (shared faculty & room calendar) ...")
+        results_first = schedule_all_years({y: yi["normals_first"] for y, yi in year_inputs.items()}, {y: yi["baskets_first"] for y, yi in year_inputs.items()}, settings, min_gap, faculty_gap, workers=workers,
+                                           state_path=state_path("schedule_state_first_halfsem.json"), incremental=incremental, repair_seconds=repair_seconds, profile=profile,
+                                           time_budget=time_budget, progress=tagged(half="first"), warm_start=warm_first)
+        results_second = schedule_all_years({y: yi["normals_second"] for y, yi in year_inputs.items()}, {y: yi["baskets_second"] for y, yi in year_inputs.items()}, settings, min_gap, faculty_gap, workers=workers,
+                                            state_path=state_path("schedule_state_second_halfsem.json"), incremental=incremental, repair_seconds=repair_seconds, profile=profile,
+                                            time_budget=time_budget, progress=tagged(half="second"), warm_start=warm_second)
+    else:
+        results_first = {}
+        results_second = {}
+        for y, yi in year_inputs.items():
+            results_first[y] = schedule_globally(yi["normals_first"], yi["baskets_first"], settings, min_gap, faculty_gap, workers=workers,
+                                                 state_path=state_path(f"schedule_state_Year{y}_first_halfsem.json"), incremental=incremental, repair_seconds=repair_seconds, profile=profile,
+                                                 time_budget=time_budget, progress=tagged(year=y, half="first"), warm_start=warm_first)
+            results_second[y] = schedule_globally(yi["normals_second"], yi["baskets_second"], settings, min_gap, faculty_gap, workers=workers,
+                                                  state_path=state_path(f"schedule_state_Year{y}_second_halfsem.json"), incremental=incremental, repair_seconds=repair_seconds, profile=profile,
+                                                  time_budget=time_budget, progress=tagged(year=y, half="second"), warm_start=warm_second)
+    return results_first, results_second
+
+# ----------------------------
+# Headless parameter sweep: python main.py --sweep sweep.json
+# ----------------------------
+SWEEP_SUMMARY = os.path.join("timetable_outputs", "sweep_summary.csv")
+
+def sweep_configs(grid, base_settings):
+    # grid: {"min_gap": [...], "faculty_gap": [...], "settings": {name: overrides dict | settings file path}}
+    variants = grid.get("settings") or {"settings.json": {}}
+    configs = []
+    for variant, spec in variants.items():
+        if isinstance(spec, str):
+            settings = load_settings(spec)
+        else:
+            settings = normalize_settings(dict(base_settings, **(spec or {})))
+        for min_gap in grid.get("min_gap", [5]):
+            for faculty_gap in grid.get("faculty_gap", [180]):
+                configs.append({"variant": variant, "settings": settings, "min_gap": int(min_gap), "faculty_gap": int(faculty_gap)})
+    return configs
+
+def _durations_key(settings):
+    # the parsed inputs only depend on the slot durations (see division_cache_params)
+    return json.dumps(settings["slot_durations"], sort_keys=True)
+
+_SWEEP_INPUTS = None
+
+def _init_sweep_worker(inputs):
+    global _SWEEP_INPUTS
+    _SWEEP_INPUTS = inputs
+
+def _run_sweep_config(config):
+    settings = config["settings"]
+    year_inputs = _SWEEP_INPUTS[_durations_key(settings)]
+    row = {"settings": config["variant"], "min_gap": config["min_gap"], "faculty_gap": config["faculty_gap"]}
+    t0 = time.perf_counter()
+    try:
+        # attempts run serially inside each sweep worker; no saved state, so normal runs are not disturbed
+        results_first, results_second = schedule_halves(year_inputs, settings, config["min_gap"], config["faculty_gap"],
+                                                        repair_seconds=float(settings.get("repair_time_budget", 0)),
+                                                        time_budget=float(settings.get("time_budget_seconds") or 0) or None)
+        row["unscheduled_first"] = sum(len(r[1]) for r in results_first.values())
+        row["unscheduled_second"] = sum(len(r[1]) for r in results_second.values())
+        row["unscheduled_total"] = row["unscheduled_first"] + row["unscheduled_second"]
+        row["error"] = ""
+    except Exception as e:
+        row["error"] = f"{type(e).__name__}: {e}"
+    row["seconds"] = round(time.perf_counter() - t0, 3)
+    return row
+
+def run_parameter_sweep(grid, base_settings, inputs_per_year, workers=1, load_workers=8):
+    # every (settings variant, min_gap, faculty_gap) combination; inputs are parsed once per distinct
+    # slot_durations and handed to each worker process once (pool initializer), not once per config
+    configs = sweep_configs(grid, base_settings)
+    inputs = {}
+    for config in configs:
+        key = _durations_key(config["settings"])
+        if key not in inputs:
+            inputs[key] = load_all_year_inputs(inputs_per_year, config["settings"], load_workers)
+    print(f"\nParameter sweep: {len(configs)} configuration(s) on {workers} worker process(es)")
+    if workers > 1 and len(configs) > 1:
+        with ProcessPoolExecutor(max_workers=min(workers, len(configs)), initializer=_init_sweep_worker, initargs=(inputs,)) as pool:
+            rows = list(pool.map(_run_sweep_config, configs))
+    else:
+        _init_sweep_worker(inputs)
+        rows = [_run_sweep_config(c) for c in configs]
+    return rows
+
+def write_sweep_summary(rows, path=SWEEP_SUMMARY):
+    df = pd.DataFrame(rows, columns=["settings", "min_gap", "faculty_gap", "unscheduled_first", "unscheduled_second", "unscheduled_total", "seconds", "error"])
+    print("\n" + df.to_string(index=False))
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    df.to_csv(path, index=False)
+    print(f"\nSweep summary: {path}")
+    return df
+
+def sweep_main(grid_path, workers=None):
+    with open(grid_path, "r") as f:
+        grid = json.load(f)
+    settings = load_settings("settings.json")
+    workers = int(workers or grid.get("workers") or os.cpu_count() or 1)
+    rows = run_parameter_sweep(grid, settings, INPUTS_PER_YEAR, workers, int(settings.get("load_workers", 8) or 1))
+    write_sweep_summary(rows, grid.get("output", SWEEP_SUMMARY))
+
 def main():
     settings = load_settings("settings.json")
     print("Timetable Generator (improved: multi-value & merge-aware, stricter conflict checks)")
@@ -980,6 +3021,17 @@ def main():
     print(f"  Lecture (lec): {sd.get('lec', 1.0)} hours")
     print(f"  Lab     (lab): {sd.get('lab', 1.0)} hours")
     print(f"  Tutorial(tut): {sd.get('tut', 1.0)} hours")
+    workers = int(settings.get("parallel_workers", 1) or 1)
+    if workers > 1:
+        print(f"Parallel attempts: {workers} worker processes")
+    incremental = bool(settings.get("incremental", False))
+    repair_seconds = float(settings.get("repair_time_budget", 0))
+    if incremental:
+        print("Incremental mode: only changed slot groups / baskets are re-placed")
+    # "time_budget_seconds": restart until this many seconds per half instead of a fixed attempt count
+    time_budget = float(settings.get("time_budget_seconds") or 0) or None
+    if time_budget:
+        print(f"Time budget: {time_budget:g} s per half (best attempt so far is kept)")
     print("-" * 70)
 
     DEFAULT_MIN_GAP = 5
@@ -1007,95 +3059,69 @@ def main():
     print("Minimum gap (faculty):", faculty_gap, "minutes")
     print("-" * 40)
 
-    # Hardcoded academic years and their division input paths
-    inputs_per_year = {
-        1: {"1CSEA": r"data\1CSEA.xlsx",
-            "1CSEB": r"data\1CSEB.xlsx",
-            "1DSAI": r"data\1DSAI.xlsx",
-            "1ECE": r"data\1ECE.xlsx"},
-        2: {"2CSEA": r"data\2CSEA.xlsx",
-            "2CSEB": r"data\2CSEB.xlsx",
-            "2DSAI": r"data\2DSAI.xlsx",
-            "2ECE": r"data\2ECE.xlsx"},
-        3: {"3CSEA": r"data\3CSEA.xlsx",
-            "3CSEB": r"data\3CSEB.xlsx",
-            "3DSAI": r"data\3DSAI.xlsx",
-            "3ECE": r"data\3ECE.xlsx"},
-        4: {"4CSEA": r"data\4CSEA.xlsx",
-            "4CSEB": r"data\4CSEB.xlsx",
-            "4DSAI": r"data\4DSAI.xlsx",
-            "4ECE": r"data\4ECE.xlsx"}
-    }
-
     n_years = 4
-    
-    for y in range(1, n_years + 1):
+
+    # "streaming" (default): write-only workbook; "classic": the in-memory openpyxl writer; "none": no workbooks
+    excel_writer = str(settings.get("excel_writer", "streaming")).lower()
+    write_excel = None if excel_writer == "none" else write_year_excel if excel_writer == "classic" else write_year_excel_streaming
+    # "schedule_export": "csv" or a list of json / csv / parquet — every placement as a table next to the workbooks
+    export_formats = settings.get("schedule_export") or []
+    if isinstance(export_formats, str):
+        export_formats = [export_formats]
+    load_workers = int(settings.get("load_workers", 8) or 1)
+    # "profile_report": path of a JSON report with phase timings and feasibility counters (off by default)
+    profile_path = settings.get("profile_report")
+    profile = ScheduleProfile() if profile_path else None
+    year_inputs = load_all_year_inputs({y: INPUTS_PER_YEAR[y] for y in range(1, n_years + 1)}, settings, load_workers, profile)
+
+    # "progress_log": JSON-lines file of scheduling progress events ("-" = stdout)
+    progress_path = settings.get("progress_log")
+    progress_stream = None
+    if progress_path:
+        progress_stream = sys.stdout if progress_path == "-" else open(progress_path, "w", encoding="utf-8")
+    try:
+        results_first, results_second = schedule_halves(year_inputs, settings, min_gap, faculty_gap, workers=workers, incremental=incremental,
+                                                        repair_seconds=repair_seconds, state_dir=STATE_DIR, profile=profile,
+                                                        time_budget=time_budget, progress=jsonl_progress(progress_stream) if progress_stream else None)
+    finally:
+        if progress_stream is not None and progress_stream is not sys.stdout:
+            progress_stream.close()
+
+    # the _unallotted.json sidecar: only for a half with unscheduled items, and not with "unscheduled_diagnostics": false
+    sidecars = settings.get("unscheduled_diagnostics", True)
+    for y, yi in year_inputs.items():
         print(f"\nProcessing Year {y} ...")
-        div_paths = inputs_per_year[y]
-        normals_first = {}
-        normals_second = {}
-        baskets_first = {}
-        baskets_second = {}
-        course_info_rows = {}
-        slot_bases_set = set()
-        for div_full, path in div_paths.items():
-            div_up = safe_upper(div_full)
-            if not os.path.exists(path):
-                print(f" File not found: {path} for {div_full} — skipping division")
-                normals_first[div_up] = []
-                normals_second[div_up] = []
-                course_info_rows[div_up] = []
-                continue
-            df = read_input_file(path)
-            rows = df.to_dict(orient='records')
-            course_info_rows[div_up] = rows
-            normals, baskets, _ = build_slot_requests_for_division(df, div_full, settings)
-            normals_f = [n for n in normals if safe_upper(n.get("sem_type", "FULLSEM")) in ("FULLSEM", "HALFSEM-1")]
-            normals_s = [n for n in normals if safe_upper(n.get("sem_type", "FULLSEM")) in ("FULLSEM", "HALFSEM-2")]
-            normals_first[div_up] = normals_f
-            normals_second[div_up] = normals_s
-            for b_key, members in baskets.items():
-                sems = [safe_upper(m.get("sem_type", "FULLSEM")) for m in members]
-                if any(s in ("FULLSEM", "HALFSEM-1") for s in sems):
-                    baskets_first.setdefault(b_key, []).extend(members)
-                if any(s in ("FULLSEM", "HALFSEM-2") for s in sems):
-                    baskets_second.setdefault(b_key, []).extend(members)
-            for n in normals:
-                sb = n.get("slot_base") or ""
-                if sb:
-                    slot_bases_set.add(sb)
-
-        # deterministic colors
-        colors = {}
-        palette = [
-            "FF5733", "FF8D1A", "FFC300", "FFEA00", "9AFB60", "2ECC71", "27AE60",
-            "00B2FF", "3498DB", "6C5CE7", "9B59B6", "F06292", "FFB6C1", "FF7F50",
-            "D35400", "E67E22", "F39C12", "F1C40F", "1ABC9C", "16A085"
-        ]
-        slot_bases_sorted = sorted(list(slot_bases_set))
-        for i, s in enumerate(slot_bases_sorted):
-            if i < len(palette):
-                colors[s] = "#" + palette[i]
-            else:
-                while True:
-                    rnd_color = "#" + "".join(random.choices("0123456789ABCDEF", k=6))
-                    if rnd_color not in colors.values():
-                        colors[s] = rnd_color
-                        break
+        colors = build_slot_colors(yi["slot_bases"])
+        course_info_rows = yi["course_info_rows"]
+        baskets_first = yi["baskets_first"]
+        baskets_second = yi["baskets_second"]
 
-        placements_first, uns_first, interval_times, base_interval, break_ranges = schedule_globally(normals_first, baskets_first, settings, min_gap, faculty_gap)
+        placements_first, uns_first, interval_times, base_interval, break_ranges = results_first[y]
         unallotted_rows_first = build_unallotted_rows(uns_first if isinstance(uns_first, list) else [], baskets_first)
-        write_year_excel(y, "first_halfsem", placements_first, interval_times, base_interval, break_ranges, colors, course_info_rows, settings, unallotted_rows=unallotted_rows_first)
-
-        placements_second, uns_second, interval_times2, base_interval2, break_ranges2 = schedule_globally(normals_second, baskets_second, settings, min_gap, faculty_gap)
+        if sidecars and isinstance(uns_first, list) and uns_first:
+            write_unallotted_sidecar(y, "first_halfsem", uns_first)
+        if write_excel is not None:
+            with profile_phase(profile, "excel_write"):
+                write_excel(y, "first_halfsem", placements_first, interval_times, base_interval, break_ranges, colors, course_info_rows, settings, unallotted_rows=unallotted_rows_first)
+        if export_formats:
+            write_year_export(y, "first_halfsem", placements_first, export_formats)
+
+        placements_second, uns_second, interval_times2, base_interval2, break_ranges2 = results_second[y]
         unallotted_rows_second = build_unallotted_rows(uns_second if isinstance(uns_second, list) else [], baskets_second)
-        write_year_excel(y, "second_halfsem", placements_second, interval_times2, base_interval2, break_ranges2, colors, course_info_rows, settings, unallotted_rows=unallotted_rows_second)
-
+        if sidecars and isinstance(uns_second, list) and uns_second:
+            write_unallotted_sidecar(y, "second_halfsem", uns_second)
+        if write_excel is not None:
+            with profile_phase(profile, "excel_write"):
+                write_excel(y, "second_halfsem", placements_second, interval_times2, base_interval2, break_ranges2, colors, course_info_rows, settings, unallotted_rows=unallotted_rows_second)
+        if export_formats:
+            write_year_export(y, "second_halfsem", placements_second, export_formats)
+
+        # console list without the diagnostics (they are in the Unallotted sheet and the JSON sidecar)
         uns_total = []
         if isinstance(uns_first, list):
-            uns_total.extend([str(u) for u in uns_first])
+            uns_total.extend([str({k: v for k, v in u.items() if k != "diagnostics"} if isinstance(u, dict) else u) for u in uns_first])
         if isinstance(uns_second, list):
-            uns_total.extend([str(u) for u in uns_second])
+            uns_total.extend([str({k: v for k, v in u.items() if k != "diagnostics"} if isinstance(u, dict) else u) for u in uns_second])
         if uns_total:
             print("\n Unscheduled items (may need input adjustments):")
             for u in uns_total[:200]:
@@ -1103,7 +3129,18 @@ def main():
             if len(uns_total) > 200:
                 print("   ...", len(uns_total) - 200, "more not shown ...")
 
+    if profile is not None:
+        profile.write(profile_path)
+        print(f"Profile report: {profile_path}")
     print("\nAll done. Timetables saved in ./timetable_outputs")
 
 if __name__ == "__main__":
-    main()
+    import argparse
+    ap = argparse.ArgumentParser(description="Timetable generator (interactive unless --sweep is given)")
+    ap.add_argument("--sweep", metavar="GRID_JSON", help="run a headless min_gap / faculty_gap / settings grid and write a summary table")
+    ap.add_argument("--workers", type=int, help="sweep worker processes (default: grid \"workers\" or CPU count)")
+    args = ap.parse_args()
+    if args.sweep:
+        sweep_main(args.sweep, args.workers)
+    else:
+        main()
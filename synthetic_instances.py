@@ -0,0 +1,189 @@
+# Synthetic division workbooks for scaling tests of main.py / exam.py
+#
+# Writes one workbook per division with the same headings as data/1CSEA.xlsx (the columns
+# build_slot_requests_for_division reads), plus Rooms.xlsx, invigilators_list.xlsx and an
+# instance.json manifest ({year: {division: workbook}}) that benchmark.py loads.
+#
+#   python synthetic_instances.py --out synthetic/scale_10 --departments 10
+#
+# The defaults match the sample data: 4 years x 1 department x 4 divisions (16 divisions),
+# 5 core courses and one 6-course elective basket per division.
+import os
+import json
+import math
+import random
+import argparse
+import pandas as pd
+
+DIVISION_COLUMNS = ["ELECTIVE OR NOT", "FULLSEM OR HALFSEM", "COURSE CODE", "COURSE TITLE", "FACULTY", "CLASS ASSISTANTS", "LAB ASSISTANTS",
+                    "L-T-P-S-C", "ROOM.NO", "LAB ROOM.NO", "SLOT NAME", "MERGE", "NO. OF STUDENTS"]
+
+# (L-T-P-S-C, weight) for core courses, roughly the mix found in data/
+CORE_LTPSC = [("3-0-0-0-3", 3), ("3-1-0-0-4", 3), ("3-0-2-0-4", 2), ("2-0-2-0-3", 1), ("3-1-0-0-2", 2), ("0-0-2-0-1", 1)]
+ELECTIVE_LTPSC = "3-1-0-0-2"
+SECTIONS = "ABCDEFGHJKLMNPQRSTUVWXYZ"
+MANIFEST = "instance.json"
+
+def _pick_ltpsc(rng):
+    choices, weights = zip(*CORE_LTPSC)
+    return rng.choices(choices, weights=weights)[0]
+
+def _has_lab(ltpsc):
+    parts = ltpsc.split("-")
+    return len(parts) >= 3 and int(parts[2]) > 0
+
+class _Pool:
+    # names handed out round-robin over a shuffled list, so load is spread evenly across the pool
+    def __init__(self, prefix, size, rng):
+        self.names = [f"{prefix} {i + 1:04d}" for i in range(max(1, size))]
+        rng.shuffle(self.names)
+        self.next = 0
+
+    def take(self, k=1):
+        out = []
+        for _ in range(k):
+            out.append(self.names[self.next % len(self.names)])
+            self.next += 1
+        return out
+
+def division_names(years, departments, divisions_per_department):
+    # {year: {department tag: [division names]}}; names start with the year like 1CSEA
+    width = max(2, len(str(departments - 1)))
+    out = {}
+    for y in range(1, years + 1):
+        out[y] = {}
+        for d in range(departments):
+            dept = f"D{d:0{width}d}"
+            out[y][dept] = [f"{y}{dept}{SECTIONS[s % len(SECTIONS)]}{'' if s < len(SECTIONS) else s // len(SECTIONS)}" for s in range(divisions_per_department)]
+    return out
+
+def plan_instance(years=4, departments=1, divisions_per_department=4, courses=5, baskets=1, electives=6,
+                  faculty_sharing=2.0, merge_density=0.5, halfsem_share=0.3, assistant_share=0.3,
+                  rooms_per_division=1.5, labs_per_division=0.6, seed=0):
+    """Rows per division (dicts keyed by DIVISION_COLUMNS) plus the room list.
+
+    faculty_sharing: average number of course offerings taught by one faculty member
+    merge_density: probability that a core course of a section pair (A/B, C/D, ...) is one merged offering
+    """
+    rng = random.Random(seed)
+    names = division_names(years, departments, divisions_per_department)
+    n_divs = years * departments * divisions_per_department
+
+    # offerings first (a merged course or an elective is one offering), people are assigned after
+    offerings = []  # (rows, needs_lab)
+    rows_per_div = {div: [] for y in names for dept in names[y] for div in names[y][dept]}
+    for y in names:
+        for dept, divs in names[y].items():
+            pairs = [divs[i:i + 2] for i in range(0, len(divs), 2)]
+            for c in range(courses):
+                ltpsc = _pick_ltpsc(rng)
+                sem = "FULLSEM" if rng.random() >= halfsem_share else rng.choice(["HALFSEM-1", "HALFSEM-2"])
+                code = f"{dept}{y}{c + 1:02d}"
+                base = dict.fromkeys(DIVISION_COLUMNS, "")
+                base.update({"ELECTIVE OR NOT": "NO", "FULLSEM OR HALFSEM": sem, "COURSE CODE": code,
+                             "COURSE TITLE": f"Core Course {code}", "L-T-P-S-C": ltpsc, "SLOT NAME": f"C{c + 1:02d}"})
+                for pair in pairs:
+                    if len(pair) == 2 and rng.random() < merge_density:
+                        group = []
+                        for div in pair:
+                            row = dict(base, MERGE=",".join(d for d in pair if d != div), **{"NO. OF STUDENTS": rng.randint(60, 120)})
+                            rows_per_div[div].append(row)
+                            group.append(row)
+                        offerings.append((group, _has_lab(ltpsc)))
+                    else:
+                        for div in pair:
+                            row = dict(base, **{"NO. OF STUDENTS": rng.randint(60, 120)})
+                            rows_per_div[div].append(row)
+                            offerings.append(([row], _has_lab(ltpsc)))
+            for b in range(baskets):
+                slot = f"ELECTIVE-{dept}-{b + 1}"
+                for e in range(electives):
+                    code = f"{dept}{y}E{b + 1}{e + 1:02d}"
+                    sem = "FULLSEM" if rng.random() >= halfsem_share else rng.choice(["HALFSEM-1", "HALFSEM-2"])
+                    students = rng.randint(30, 60)
+                    group = []
+                    # every division of the department lists the basket, merged with the others
+                    for div in divs:
+                        row = dict.fromkeys(DIVISION_COLUMNS, "")
+                        row.update({"ELECTIVE OR NOT": "YES", "FULLSEM OR HALFSEM": sem, "COURSE CODE": code,
+                                    "COURSE TITLE": f"Elective {code}", "L-T-P-S-C": ELECTIVE_LTPSC, "SLOT NAME": slot,
+                                    "MERGE": ",".join(d for d in divs if d != div), "NO. OF STUDENTS": students})
+                        rows_per_div[div].append(row)
+                        group.append(row)
+                    offerings.append((group, False))
+
+    # pools sized from the demand, so faculty_sharing is the average number of offerings per person
+    rng.shuffle(offerings)
+    needs = [(group, needs_lab, rng.random() < assistant_share) for group, needs_lab in offerings]
+    assistant_seats = sum(int(with_asst) + 2 * int(needs_lab) for _, needs_lab, with_asst in needs)
+    faculty = _Pool("Dr. Faculty", math.ceil(len(offerings) / max(faculty_sharing, 1e-9)), rng)
+    assistants = _Pool("Assistant", math.ceil(assistant_seats / max(faculty_sharing, 1e-9)), rng)
+    rooms = _Pool("R", math.ceil(n_divs * rooms_per_division), rng)
+    labs = _Pool("L", math.ceil(n_divs * labs_per_division), rng)
+    for group, needs_lab, with_asst in needs:
+        fields = {"FACULTY": ", ".join(faculty.take()), "ROOM.NO": rooms.take()[0]}
+        if with_asst:
+            fields["CLASS ASSISTANTS"] = ", ".join(assistants.take())
+        if needs_lab:
+            fields["LAB ROOM.NO"] = ",".join(labs.take(rng.randint(1, 2)))
+            fields["LAB ASSISTANTS"] = ", ".join(assistants.take(2))
+        for row in group:
+            row.update(fields)
+
+    room_names = sorted(set(rooms.names) | set(labs.names))
+    return names, rows_per_div, room_names, faculty.names
+
+def write_instance(outdir, **params):
+    """Write the division workbooks, Rooms.xlsx, invigilators_list.xlsx and instance.json; returns {year: {division: path}}."""
+    os.makedirs(outdir, exist_ok=True)
+    names, rows_per_div, room_names, faculty_names = plan_instance(**params)
+    inputs_per_year = {}
+    for y, depts in names.items():
+        inputs_per_year[y] = {}
+        for divs in depts.values():
+            for div in divs:
+                path = os.path.join(outdir, f"{div}.xlsx")
+                pd.DataFrame(rows_per_div[div], columns=DIVISION_COLUMNS).to_excel(path, index=False)
+                inputs_per_year[y][div] = path
+    rng = random.Random(params.get("seed", 0))
+    pd.DataFrame({"Room": room_names, "Seating Capacity": [rng.choice([60, 72, 96, 116, 135]) for _ in room_names]}).to_excel(os.path.join(outdir, "Rooms.xlsx"), index=False)
+    pd.DataFrame({"NUMBER": range(1, len(faculty_names) + 1), "NAME": sorted(faculty_names)}).to_excel(os.path.join(outdir, "invigilators_list.xlsx"), index=False)
+    with open(os.path.join(outdir, MANIFEST), "w") as f:
+        json.dump({"params": params, "divisions": {str(y): {div: os.path.basename(p) for div, p in divs.items()} for y, divs in inputs_per_year.items()}}, f, indent=2)
+    return inputs_per_year
+
+def read_manifest(outdir):
+    with open(os.path.join(outdir, MANIFEST)) as f:
+        return json.load(f)
+
+def manifest_params(outdir):
+    # generator parameters an instance was written with
+    return read_manifest(outdir)["params"]
+
+def load_manifest(outdir):
+    # {year: {division: path}} in the shape main.py's inputs_per_year uses
+    data = read_manifest(outdir)
+    return {int(y): {div: os.path.join(outdir, name) for div, name in divs.items()} for y, divs in data["divisions"].items()}
+
+def main():
+    ap = argparse.ArgumentParser(description="Write a synthetic timetable instance (division workbooks in the data/ format)")
+    ap.add_argument("--out", required=True, help="output directory")
+    ap.add_argument("--years", type=int, default=4)
+    ap.add_argument("--departments", type=int, default=1, help="departments per year (1 = the size of data/)")
+    ap.add_argument("--divisions-per-department", type=int, default=4)
+    ap.add_argument("--courses", type=int, default=5, help="core courses per division")
+    ap.add_argument("--baskets", type=int, default=1, help="elective baskets per department and year")
+    ap.add_argument("--electives", type=int, default=6, help="courses per elective basket")
+    ap.add_argument("--faculty-sharing", type=float, default=2.0, help="average offerings per faculty member")
+    ap.add_argument("--merge-density", type=float, default=0.5, help="share of core courses merged across a section pair")
+    ap.add_argument("--halfsem-share", type=float, default=0.3)
+    ap.add_argument("--seed", type=int, default=0)
+    args = ap.parse_args()
+    inputs_per_year = write_instance(args.out, years=args.years, departments=args.departments, divisions_per_department=args.divisions_per_department,
+                                     courses=args.courses, baskets=args.baskets, electives=args.electives, faculty_sharing=args.faculty_sharing,
+                                     merge_density=args.merge_density, halfsem_share=args.halfsem_share, seed=args.seed)
+    n = sum(len(d) for d in inputs_per_year.values())
+    print(f"Wrote {n} division workbooks to {args.out}")
+
+if __name__ == "__main__":
+    main()
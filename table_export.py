@@ -0,0 +1,48 @@
+# Columnar exports shared by main.py and exam.py: rows (dicts) <-> .json / .csv / .parquet
+import os
+import json
+import pandas as pd
+
+EXPORT_FORMATS = ("json", "csv", "parquet")
+
+def export_format(path):
+    fmt = os.path.splitext(path)[1].lower().lstrip(".")
+    if fmt not in EXPORT_FORMATS:
+        raise ValueError(f"Unsupported export format '{fmt}' ({path}); use one of {', '.join(EXPORT_FORMATS)}")
+    return fmt
+
+def write_table(rows, path, columns=None):
+    # one row per dict; columns fixes the order (and the header of an empty table)
+    fmt = export_format(path)
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    df = pd.DataFrame(rows, columns=columns)
+    if fmt == "json":
+        # records, not pandas' split/table layouts, so any JSON reader gets one object per row
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(json.loads(df.to_json(orient="records")), f, indent=1)
+    elif fmt == "csv":
+        df.to_csv(path, index=False)
+    else:
+        try:
+            df.to_parquet(path, index=False)
+        except ImportError as e:
+            raise ImportError(f"Parquet export needs pyarrow or fastparquet (pip install pyarrow): {e}") from e
+    return path
+
+def read_table(path):
+    # rows (dicts) of a table written by write_table; a JSON file may also hold {"placements": rows}
+    fmt = export_format(path)
+    if fmt == "json":
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        return data.get("placements", []) if isinstance(data, dict) else data
+    if fmt == "csv":
+        df = pd.read_csv(path)
+    else:
+        df = pd.read_parquet(path)
+    # NaN (empty CSV cells) -> None, like the JSON form
+    return df.astype(object).where(df.notna(), None).to_dict(orient="records")
+
+def write_tables(rows, base_path, formats, columns=None):
+    # the same rows as base_path.<fmt> for every requested format; returns the paths written
+    return [write_table(rows, f"{base_path}.{fmt}", columns) for fmt in formats]